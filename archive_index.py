@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Indici in memoria per ordinare e filtrare le schede di un archivio.
+
+ArchiveIndex calcola UNA volta per scheda le chiavi di ordinamento normalizzate
+(nome in minuscolo, annata e gradazione come numeri, qualità come posizione
+nella scala di giudizio) e le aggiorna solo per la scheda salvata o eliminata.
+Ordinare 10.000 schede ordina quindi solo numeri e tuple già pronte, senza
+rileggere né convertire i testi salvati nelle schede.
+
+PrefixIndex permette la ricerca "mentre si scrive" su nome e produttore: le
+parole sono tenute in una lista ordinata, quindi le parole che iniziano con un
+prefisso sono un intervallo contiguo trovato con due ricerche binarie.
+
+DescriptorIndex è un indice invertito "descrittore -> doc_id" per tutti i campi
+a selezione (limpidezza, colore, profumi, sapori, ...): le domande del tipo
+"profumo di ciliegia E di cuoio" sono intersezioni (O: unioni) di insiemi.
+
+L'indice restituisce liste ordinate di doc_id: le schede vere e proprie vengono
+lette a pagine dall'archivio (vedi repository.ArchiveCursor).
+"""
+import math
+import sys
+import unicodedata
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from record_format import SELECTION_FIELDS
+from repository import to_number
+from tasting_schema import GROUPS
+
+
+# Scala dei giudizi (bottoni qualita_* delle conclusioni, vedi tasting_schema), dal peggiore al migliore
+QUALITY_SCALE = tuple(GROUPS['qualita'].options)
+
+# Colonne ordinabili dell'archivio (None = ordine di inserimento)
+SORT_FIELDS = ('nome', 'annata', 'alcol', 'qualita')
+
+# Chiavi normalizzate di una scheda. 'nome' è la coppia (nome, produttore) in minuscolo,
+# le altre sono None quando il valore salvato non è valido (es. alcol 'Gradazione alcolica').
+SortKeys = namedtuple('SortKeys', ('nome', 'annata', 'alcol', 'qualita'))
+
+
+def sort_keys(record, wine_color):
+    """Calcola le chiavi di ordinamento di una scheda."""
+    def field(name):
+        return record.get(name + '_' + wine_color)
+
+    quality = field('qualita')
+    return SortKeys(
+        nome=(str(field('nome') or '').casefold(), str(field('produttore') or '').casefold()),
+        annata=to_number(field('annata'), int),
+        alcol=to_number(field('alcol'), float),
+        qualita=QUALITY_SCALE.index(quality) if quality in QUALITY_SCALE else None,
+    )
+
+
+def normalize_text(text):
+    """Testo per la ricerca: minuscolo e senza accenti ('Nebbiòlo' -> 'nebbiolo')."""
+    decomposed = unicodedata.normalize('NFKD', str(text or ''))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def prefix_successor(prefix):
+    """Stringa minima maggiore di ogni stringa che inizia con 'prefix' (None se non esiste)."""
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+
+
+class PrefixIndex:
+    """
+    Indice per prefisso delle parole di alcuni campi (nome e produttore).
+
+    Ogni parola di ogni scheda è una voce (parola, doc_id) di una lista ordinata:
+    la ricerca di un prefisso legge solo le voci che iniziano con quel prefisso.
+    """
+
+    def __init__(self):
+        self._entries = []
+        # Parole indicizzate per ogni doc_id (servono per togliere le voci vecchie)
+        self._words = {}
+
+    def build(self, texts):
+        """Indicizza in blocco le coppie (doc_id, testo), con un solo ordinamento finale."""
+        for doc_id, text in texts:
+            self.remove(doc_id)
+            words = self._words[doc_id] = set(normalize_text(text).split())
+            self._entries.extend((word, doc_id) for word in words)
+        self._entries.sort()
+
+    def add(self, doc_id, text):
+        """Indicizza (o reindicizza) le parole di 'text' per la scheda doc_id."""
+        self.remove(doc_id)
+        words = self._words[doc_id] = set(normalize_text(text).split())
+        for word in words:
+            insort(self._entries, (word, doc_id))
+
+    def remove(self, doc_id):
+        for word in self._words.pop(doc_id, ()):
+            position = bisect_left(self._entries, (word, doc_id))
+            del self._entries[position]
+
+    def search(self, text):
+        """doc_id delle schede che hanno, per ogni parola cercata, una parola che inizia così."""
+        result = None
+        for prefix in normalize_text(text).split():
+            matches = self._prefix_matches(prefix)
+            result = matches if result is None else result & matches
+            if not result:
+                break
+        return result if result is not None else set(self._words)
+
+    def matches(self, doc_id, text):
+        """True se la scheda doc_id corrisponde alla ricerca 'text' (senza leggere l'indice intero)."""
+        words = self._words.get(doc_id, ())
+        return all(any(word.startswith(prefix) for word in words) for prefix in normalize_text(text).split())
+
+    def _prefix_matches(self, prefix):
+        entries = self._entries
+        start = bisect_left(entries, (prefix,))
+        # Fine dell'intervallo: la prima stringa che segue tutte quelle che iniziano con il prefisso
+        # (anche con caratteri fuori dal piano base, es. emoji)
+        successor = prefix_successor(prefix)
+        stop = len(entries) if successor is None else bisect_left(entries, (successor,), lo=start)
+        return {doc_id for _, doc_id in entries[start:stop]}
+
+
+class DescriptorIndex:
+    """
+    Indice invertito dei campi a selezione: per ogni descrittore (campo, valore),
+    es. ('profumo', 'Ciliegia'), l'insieme dei doc_id delle schede che lo contengono.
+    """
+
+    def __init__(self, wine_color):
+        self.wine_color = wine_color
+        self._postings = {}
+        # Descrittori di ogni doc_id (servono per togliere quelli vecchi)
+        self._terms = {}
+
+    def add(self, doc_id, record):
+        """Indicizza (o reindicizza) i descrittori della scheda."""
+        self.remove(doc_id)
+        terms = self._terms[doc_id] = self._record_terms(record)
+        for term in terms:
+            self._postings.setdefault(term, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        for term in self._terms.pop(doc_id, ()):
+            postings = self._postings[term]
+            postings.discard(doc_id)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, terms, match_all=True):
+        """
+        doc_id delle schede con TUTTI i descrittori 'terms' (match_all=True, intersezione)
+        o con ALMENO UNO (match_all=False, unione). terms: coppie (campo, valore).
+        """
+        postings = [self._postings.get(tuple(term), set()) for term in terms]
+        if not postings:
+            return set(self._terms)
+        if match_all:
+            # Si parte dall'insieme più piccolo: ogni intersezione costa al più quanto lui
+            postings.sort(key=len)
+            return set.intersection(*postings)
+        return set.union(*postings)
+
+    def matches(self, doc_id, terms, match_all=True):
+        """True se la scheda doc_id risponde alla ricerca (senza leggere le liste dei descrittori)."""
+        doc_terms = self._terms.get(doc_id, ())
+        found = (tuple(term) in doc_terms for term in terms)
+        return all(found) if match_all else any(found)
+
+    def values(self, field):
+        """Valori presenti nell'archivio per il campo, con il numero di schede: [(valore, n), ...]."""
+        return sorted((value, len(doc_ids)) for (term_field, value), doc_ids in self._postings.items()
+                      if term_field == field)
+
+    def _record_terms(self, record):
+        terms = set()
+        for field in SELECTION_FIELDS:
+            value = record.get(field + '_' + self.wine_color)
+            values = value if isinstance(value, list) else [value]
+            terms.update((field, item) for item in values if item)
+        return terms
+
+
+def range_bounds(filters, field):
+    """Estremi (da, a) del filtro 'annata' o 'alcol'; quelli non numerici o non finiti
+    (nan, inf) diventano None, come un campo del filtro lasciato vuoto."""
+    bounds = filters.get(field) or (None, None)
+    return tuple(bound if isinstance(bound, (int, float)) and math.isfinite(bound) else None for bound in bounds)
+
+
+class ArchiveIndex:
+    """
+    Chiavi di ordinamento di tutte le schede di un colore, indicizzate per doc_id,
+    indice per prefisso di nome e produttore e indice invertito dei descrittori.
+
+    Filtri (dizionario, ogni voce è facoltativa):
+        {'testo': 'ricerca', 'annata': (da, a), 'alcol': (da, a), 'qualita': livello_minimo,
+         'descrittori': [(campo, valore), ...], 'tutti_i_descrittori': True}
+    Gli estremi None (o non finiti, come nan e inf) non limitano; 'qualita' è il nome di un giudizio di QUALITY_SCALE;
+    'testo' cerca le parole di nome e produttore che iniziano con le parole indicate;
+    'descrittori' cerca le schede con tutti (o, se 'tutti_i_descrittori' è False, almeno uno)
+    dei descrittori indicati.
+    """
+
+    def __init__(self, wine_color, records=()):
+        self.wine_color = wine_color
+        self._keys = {}
+        self.names = PrefixIndex()
+        self.descriptors = DescriptorIndex(wine_color)
+
+        records = list(records)
+        for record in records:
+            self._keys[record.doc_id] = sort_keys(record, wine_color)
+            self.descriptors.add(record.doc_id, record)
+        self.names.build((record.doc_id, self._search_text(record)) for record in records)
+
+    def __len__(self):
+        return len(self._keys)
+
+    # ----------------------------------------------------------------------
+    # AGGIORNAMENTO
+    # ----------------------------------------------------------------------
+    def add(self, doc_id, record):
+        """Inserisce o aggiorna la scheda (ricalcola solo le sue chiavi)."""
+        self._keys[doc_id] = sort_keys(record, self.wine_color)
+        self.names.add(doc_id, self._search_text(record))
+        self.descriptors.add(doc_id, record)
+
+    def remove(self, doc_id):
+        self._keys.pop(doc_id, None)
+        self.names.remove(doc_id)
+        self.descriptors.remove(doc_id)
+
+    def _search_text(self, record):
+        """Testo indicizzato per la ricerca: nome e produttore."""
+        return ' '.join(str(record.get(field + '_' + self.wine_color) or '') for field in ('nome', 'produttore'))
+
+    def apply_change(self, doc_id, record):
+        """Applica una modifica all'archivio: record è la scheda salvata, None se eliminata."""
+        if record is None:
+            self.remove(doc_id)
+        else:
+            self.add(doc_id, record)
+
+    # ----------------------------------------------------------------------
+    # INTERROGAZIONE
+    # ----------------------------------------------------------------------
+    def query(self, order=None, descending=False, filters=None):
+        """
+        Restituisce i doc_id delle schede che rispettano i filtri, ordinati per la colonna
+        'order' (una di SORT_FIELDS, None = inserimento). Le schede senza un valore valido
+        per la colonna finiscono sempre in fondo, in ordine di inserimento.
+        """
+        keys = self._keys
+        filters = filters or {}
+        # Con una ricerca si parte solo dalle schede trovate dagli indici (prefisso, descrittori)
+        candidates = None
+        if filters.get('testo'):
+            candidates = self.names.search(filters['testo'])
+        if filters.get('descrittori'):
+            found = self.descriptors.search(filters['descrittori'], filters.get('tutti_i_descrittori', True))
+            candidates = found if candidates is None else candidates & found
+        if candidates is None:
+            candidates = keys
+        ranges_active = any(bound is not None for field in ('annata', 'alcol') for bound in range_bounds(filters, field))
+        if ranges_active or filters.get('qualita') in QUALITY_SCALE:
+            doc_ids = [doc_id for doc_id in candidates if self._matches(keys[doc_id], filters)]
+        else:
+            doc_ids = list(candidates)
+
+        if order is None:
+            doc_ids.sort(reverse=descending)
+            return doc_ids
+
+        field = SORT_FIELDS.index(order)
+        present = [doc_id for doc_id in doc_ids if keys[doc_id][field] is not None]
+        missing = [doc_id for doc_id in doc_ids if keys[doc_id][field] is None]
+        # La funzione 'key' viene chiamata una volta per scheda, non ad ogni confronto
+        present.sort(key=lambda doc_id: (keys[doc_id][field], doc_id), reverse=descending)
+        missing.sort()
+        return present + missing
+
+    def matches(self, doc_id, filters):
+        """True se la scheda è nell'indice e rispetta i filtri."""
+        doc_keys = self._keys.get(doc_id)
+        if doc_keys is None:
+            return False
+        if not filters:
+            return True
+        if filters.get('testo') and not self.names.matches(doc_id, filters['testo']):
+            return False
+        if filters.get('descrittori') and not self.descriptors.matches(
+                doc_id, filters['descrittori'], filters.get('tutti_i_descrittori', True)):
+            return False
+        return self._matches(doc_keys, filters)
+
+    def locate(self, doc_ids, doc_id, order=None, descending=False):
+        """
+        Posizione in cui inserire doc_id nella lista 'doc_ids', già ordinata come da
+        query(order, descending): ricerca binaria sulle chiavi precalcolate.
+        """
+        keys = self._keys
+        field = SORT_FIELDS.index(order) if order is not None else None
+
+        def value(other):
+            return other if field is None else keys[other][field]
+
+        target = value(doc_id)
+
+        def before(other):
+            # True se 'other' viene prima di doc_id nell'ordinamento
+            other_value = value(other)
+            if other_value is None or target is None:
+                if other_value is None and target is None:
+                    return other < doc_id
+                return target is None
+            if descending:
+                return (other_value, other) > (target, doc_id)
+            return (other_value, other) < (target, doc_id)
+
+        low, high = 0, len(doc_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if before(doc_ids[middle]):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @staticmethod
+    def _matches(doc_keys, filters):
+        for field in ('annata', 'alcol'):
+            low, high = range_bounds(filters, field)
+            if low is None and high is None:
+                continue
+            value = getattr(doc_keys, field)
+            if value is None or (low is not None and value < low) or (high is not None and value > high):
+                return False
+
+        quality = filters.get('qualita')
+        if quality in QUALITY_SCALE:
+            if doc_keys.qualita is None or doc_keys.qualita < QUALITY_SCALE.index(quality):
+                return False
+        return True
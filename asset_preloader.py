@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-caricamento delle immagini e del font mentre è visibile la WelcomeScreen.
+
+Alla prima apertura di una schermata Kivy decodifica in modo sincrono le immagini
+(atlanti di materiale/atlas) e apre il font alla dimensione di ogni testo: il
+primo passaggio alla degustazione si blocca per qualche frame. AssetPreloader
+anticipa questo lavoro:
+
+- un thread legge e decodifica le pagine PNG degli atlanti (come fa kivy.loader
+  per AsyncImage), nell'ordine di priorità ricevuto: prima quelli delle schermate
+  più vicine nella navigazione;
+- il thread di Kivy, un atlante per frame, carica le pagine decodificate sulla GPU
+  e registra l'atlante nella cache di Kivy ('kv.atlas'): i riferimenti
+  'atlas://...' dei KV lo trovano già pronto;
+- sempre sul thread di Kivy, una dimensione per frame, il font viene aperto e i
+  suoi glifi preparati disegnando un testo di prova.
+
+Gli atlanti già caricati nel frattempo da una schermata vengono saltati.
+"""
+import json
+import os
+import threading
+from functools import partial
+
+from kivy.cache import Cache
+from kivy.clock import Clock
+from kivy.core.image import Image as CoreImage, ImageLoader
+from kivy.core.text import Label as CoreLabel
+from kivy.resources import resource_find
+
+
+# Testo disegnato per preparare i glifi del font (etichette dei bottoni e dei campi)
+FONT_SAMPLE = "ABCDEFGHIJKLMNOPQRSTUVWXYZ abcdefghijklmnopqrstuvwxyz 0123456789 àèéìòù.,'()/:"
+
+
+class AssetPreloader:
+    """
+    'atlases' sono i percorsi degli atlanti come nei KV, senza 'atlas://' e senza
+    estensione (es. 'materiale/atlas/rosso'), in ordine di priorità; 'font_sizes'
+    le dimensioni (pixel) del font da preparare, anch'esse in ordine di priorità.
+    """
+
+    def __init__(self, atlases, font_name, font_sizes):
+        self.atlases = tuple(atlases)
+        self.font_name = font_name
+        self._font_sizes = list(font_sizes)
+        self._thread = None
+        self.loaded = []  # Atlanti caricati dal pre-caricamento, nell'ordine
+
+    def start(self):
+        """Avvia (una sola volta) il pre-caricamento."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+        Clock.schedule_interval(self._warm_next_font_size, 0)
+
+    # ----------------------------------------------------------------------
+    # IMMAGINI: DECODIFICA IN BACKGROUND, CARICAMENTO SULLA GPU SUL THREAD DI KIVY
+    # ----------------------------------------------------------------------
+    def _worker(self):
+        for atlas in self.atlases:
+            if Cache.get('kv.atlas', atlas) is not None:
+                continue
+            try:
+                pages, image_id = self._decode_atlas(atlas)
+            except Exception as e:
+                print(f"ERRORE PRE-CARICAMENTO IMMAGINI {atlas}: {e}")
+                continue
+            # Un atlante alla volta: il thread di Kivy lo carica sulla GPU al prossimo frame
+            installed = threading.Event()
+            Clock.schedule_once(partial(self._install, atlas, pages, image_id, installed))
+            installed.wait()
+
+    @staticmethod
+    def _decode_atlas(atlas):
+        """Decodifica le pagine dell'atlante: (immagini con i dati in memoria, un ID dell'atlante)."""
+        filename = resource_find(atlas + '.atlas')
+        if filename is None:
+            raise FileNotFoundError(atlas + '.atlas')
+        with open(filename, encoding='utf-8') as handle:
+            meta = json.load(handle)
+        # Stesso percorso delle pagine usato da kivy.atlas.Atlas: la texture viene ritrovata in cache
+        folder = os.path.dirname(filename)
+        pages = [ImageLoader.load(os.path.join(folder, page), keep_data=True) for page in meta]
+        image_id = next(iter(next(iter(meta.values()))))
+        return pages, image_id
+
+    def _install(self, atlas, pages, image_id, installed, dt):
+        try:
+            if Cache.get('kv.atlas', atlas) is None:
+                # Crea le texture delle pagine (finiscono nella cache 'kv.texture')...
+                for page in pages:
+                    page.texture
+                # ...così Kivy registra l'atlante in 'kv.atlas' senza decodificare di nuovo
+                CoreImage('atlas://%s/%s' % (atlas, image_id))
+                self.loaded.append(atlas)
+        except Exception as e:
+            print(f"ERRORE PRE-CARICAMENTO IMMAGINI {atlas}: {e}")
+        finally:
+            installed.set()
+
+    # ----------------------------------------------------------------------
+    # FONT
+    # ----------------------------------------------------------------------
+    def _warm_next_font_size(self, dt):
+        if not self._font_sizes:
+            return False
+        CoreLabel(text=FONT_SAMPLE, font_name=self.font_name, font_size=self._font_sizes.pop(0)).refresh()
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark delle operazioni più frequenti su archivio e degustazione, con l'app avviata
+senza finestra visibile (Kivy con SDL_VIDEODRIVER=offscreen, Linux).
+
+Per ogni dimensione degli archivi (--cards, schede per colore) l'app viene avviata in
+un processo separato, in una cartella temporanea con i tre archivi già pieni, e misura:
+
+  - load_archive_data.<colore>     caricamento della prima pagina dell'archivio di ogni colore;
+  - popup_dettaglio                apertura del popup di dettaglio di una scheda (toggle_expand_red);
+  - start_edit_card                ingresso in modifica: selezioni caricate e bottoni ricolorati;
+  - info_on_enter.modifica         on_enter della schermata INFO in modifica (campi ripopolati);
+  - confirm_and_save.update/insert e delete_card: tempo della chiamata sul thread di Kivy e, con
+    il suffisso '.completata', fino all'aggiornamento della lista dopo la scrittura sull'archivio.
+
+I risultati (mediana e minimo in ms su --runs ripetizioni) vengono scritti in JSON
+(--output) e confrontati con il riferimento salvato (--baseline): un'operazione è
+segnalata PIÙ LENTA se supera il riferimento di oltre --tolerance (in proporzione) e
+di almeno --min-delta-ms. Con regressioni lo script termina con codice 1.
+
+Uso (dalla cartella del progetto):
+    python benchmarks/hot_paths.py
+    python benchmarks/hot_paths.py --cards 100 1000 --runs 9 --backend tinydb
+    python benchmarks/hot_paths.py --save-baseline   # aggiorna il riferimento con i risultati attuali
+
+Il riferimento dipende dalla macchina: va rigenerato (--save-baseline) quando si cambia
+macchina, prima di confrontare due versioni del codice.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.join(BENCHMARK_DIR, '..')
+sys.path.insert(0, PROJECT_DIR)
+
+from repository import ARCHIVE_FILES  # noqa: E402
+from startup_archives import build_archives  # noqa: E402
+
+# Schede per colore misurate di default
+DEFAULT_SIZES = (100, 1000, 10000, 50000)
+
+# Riferimento con cui vengono confrontati i risultati
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'hot_paths_baseline.json')
+
+# Versione del formato dei risultati JSON
+RESULTS_VERSION = 1
+
+# Schede modificate, inserite ed eliminate durante la misura
+EDIT_COLOR = 'rosso'
+
+
+# ==============================================================================
+# PROCESSO DI MISURA (una dimensione degli archivi)
+# ==============================================================================
+def run_worker(backend, runs, output):
+    """Avvia l'app nella cartella corrente (con gli archivi già creati) e salva le misure in 'output'."""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+    os.environ.setdefault('KIVY_LOG_MODE', 'PYTHON')
+
+    from kivy.clock import Clock
+    from kivy.core.window import Window
+    from kivy.resources import resource_add_path
+    from kivy.uix.modalview import ModalView
+    from kivy.uix.popup import Popup
+    from kivy.uix.screenmanager import NoTransition
+
+    import main
+
+    # Immagini e font (percorsi 'materiale/...') dalla cartella del progetto
+    resource_add_path(os.path.abspath(PROJECT_DIR))
+
+    class BenchmarkApp(main.WineApp):
+        # Nessun lavoro in background durante le misure, e nessuna schermata rilasciata
+        PREWARM_ARCHIVES = False
+        PRELOAD_ASSETS = False
+        MAX_RESIDENT_COLORS = None
+        ARCHIVE_BACKEND = backend
+
+        def on_start(self):
+            super().on_start()
+            # Nessuna animazione fra le schermate: ogni misura parte da una schermata già visibile
+            self.root.transition = NoTransition()
+            self.samples = {}
+            self._changes = []
+            self._steps = self.benchmark_steps()
+            self._waiting = None
+            Clock.schedule_interval(self._next_step, 0)
+
+        def on_archive_change(self, wine_color, change, doc_id, record):
+            self._changes.append((change, doc_id, time.perf_counter()))
+
+        def _next_step(self, dt):
+            if self._waiting is not None and not self._waiting():
+                return None
+            try:
+                self._waiting = next(self._steps)
+            except StopIteration:
+                self._write_results()
+                self.stop()
+                return False
+            return None
+
+        def _time(self, name, function):
+            start = time.perf_counter()
+            function()
+            self.samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+            return start
+
+        def _time_write(self, name, function):
+            """Misura la chiamata e, con un'attesa (yield from), la scrittura fino a on_archive_change."""
+            written = len(self._changes)
+            start = self._time(name, function)
+            yield lambda: len(self._changes) > written
+            change, doc_id, end = self._changes[written]
+            self.samples.setdefault(name + '.completata', []).append((end - start) * 1000)
+            return doc_id
+
+        def _fill_info(self, info_screen, i):
+            for field, text in (('nome', f'Vino del benchmark {i}'), ('produttore', 'Cantina del benchmark'),
+                                ('annata', '2020'), ('alcol', '13.5')):
+                info_screen.ids[f'{field}_{EDIT_COLOR}'].text = text
+
+        def benchmark_steps(self):
+            # Ogni 'yield' lascia passare un frame (o attende la condizione restituita)
+
+            # 1. CARICAMENTO DEGLI ARCHIVI (apertura dell'archivio e creazione della schermata esclusi)
+            for wine_color in ARCHIVE_FILES:
+                screen = self.root.get_screen('archivio_' + wine_color)
+                self.root.current = screen.name
+                yield None
+                for _ in range(runs):
+                    self._time('load_archive_data.' + wine_color, screen.load_archive_data)
+                    yield None
+
+            # 2. POPUP DI DETTAGLIO di una scheda visibile
+            screen = self.root.get_screen('archivio_' + EDIT_COLOR)
+            self.root.current = screen.name
+            yield None
+            yield None
+            for _ in range(runs):
+                item = screen.ids.archive_list.layout_manager.children[-1]
+                self._time('popup_dettaglio', item.toggle_expand_red)
+                yield None
+                for popup in [widget for widget in Window.children if isinstance(widget, ModalView)]:
+                    popup.dismiss(animation=False)
+                yield None
+
+            # 3. MODIFICA DI UNA SCHEDA: ingresso in modifica, schermata INFO e aggiornamento
+            info_screen = self.root.get_screen('info_' + EDIT_COLOR)
+            self.root.get_screen('selection')  # Destinazione dopo un inserimento
+            for phase_name in main.PHASE_NAMES:
+                self.root.get_screen(phase_name + '_' + EDIT_COLOR)
+            for _ in range(runs):
+                self.root.current = screen.name
+                yield None
+                item = screen.ids.archive_list.layout_manager.children[-1]
+                wine_data, doc_id = dict(item.wine_data), item.card_doc_id
+                self._time('start_edit_card', lambda: self.start_edit_card(EDIT_COLOR, wine_data, doc_id))
+                yield None
+                self.root.current = info_screen.name
+                yield None
+                self._time('info_on_enter.modifica', info_screen.on_enter)
+                yield from self._time_write(
+                    'confirm_and_save.update', lambda: self.confirm_and_save(EDIT_COLOR, info_screen, Popup()))
+
+            # 4. INSERIMENTO E ELIMINAZIONE di nuove schede
+            inserted = []
+            for i in range(runs):
+                self.root.current = info_screen.name
+                yield None
+                self._fill_info(info_screen, i)
+                inserted.append((yield from self._time_write(
+                    'confirm_and_save.insert', lambda: self.confirm_and_save(EDIT_COLOR, info_screen, Popup()))))
+            for doc_id in inserted:
+                self.card_to_delete_id, self.wine_color_to_delete = doc_id, EDIT_COLOR
+                yield from self._time_write('delete_card', lambda: self.delete_card(None))
+
+        def _write_results(self):
+            results = {name: {'mediana_ms': round(statistics.median(values), 3), 'min_ms': round(min(values), 3)}
+                       for name, values in self.samples.items()}
+            with open(output, 'w', encoding='utf-8') as handle:
+                json.dump(results, handle, ensure_ascii=False, indent=2)
+
+    BenchmarkApp().run()
+
+
+def measure_size(cards, backend, runs):
+    """Crea gli archivi con 'cards' schede per colore e misura le operazioni in un processo separato."""
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        build_archives(directory, backend, cards)
+        print(f"  {cards} schede per colore: archivi creati in {time.perf_counter() - start:.1f} s, misura...")
+        output = os.path.join(directory, 'risultati.json')
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', output,
+                        '--backend', backend, '--runs', str(runs)],
+                       cwd=directory, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(output, encoding='utf-8') as handle:
+            return json.load(handle)
+
+
+# ==============================================================================
+# CONFRONTO CON IL RIFERIMENTO
+# ==============================================================================
+def compare(report, baseline, tolerance, min_delta_ms):
+    """Righe del confronto (schede, operazione, riferimento, attuale, rapporto, più lenta) per le misure comuni."""
+    rows = []
+    for cards, results in report['risultati'].items():
+        reference = baseline['risultati'].get(cards, {})
+        for name, result in results.items():
+            if name not in reference:
+                continue
+            before, after = reference[name]['mediana_ms'], result['mediana_ms']
+            slower = after > before * (1 + tolerance) and after - before >= min_delta_ms
+            rows.append((cards, name, before, after, after / before if before else float('inf'), slower))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='schede per colore (default: %s)' % ' '.join(map(str, DEFAULT_SIZES)))
+    parser.add_argument('--backend', choices=('tinydb', 'sqlite'), default='sqlite')
+    parser.add_argument('--runs', type=int, default=5, help='ripetizioni di ogni operazione (si usa la mediana)')
+    parser.add_argument('--output', default='hot_paths_results.json', help='file JSON dei risultati')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='file JSON del riferimento')
+    parser.add_argument('--save-baseline', action='store_true', help='salva i risultati come nuovo riferimento')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='rallentamento tollerato rispetto al riferimento (default 0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='differenza minima (ms) per segnalare un rallentamento (default 1.0)')
+    parser.add_argument('--worker', metavar='OUTPUT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.backend, args.runs, args.worker)
+        return 0
+
+    print(f"Backend: {args.backend} - {args.runs} ripetizioni per operazione")
+    report = {
+        'versione': RESULTS_VERSION,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'piattaforma': platform.platform(),
+        'backend': args.backend,
+        'ripetizioni': args.runs,
+        'risultati': {str(cards): measure_size(cards, args.backend, args.runs) for cards in args.cards},
+    }
+    with open(args.output, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2)
+    print(f"Risultati salvati in {args.output}")
+
+    for cards, results in report['risultati'].items():
+        print(f"{cards} schede per colore (mediana / minimo)")
+        for name, result in results.items():
+            print(f"  {name:36} {result['mediana_ms']:9.2f} ms {result['min_ms']:9.2f} ms")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+        print(f"Riferimento aggiornato: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Nessun riferimento in {args.baseline}: salvarlo con --save-baseline")
+        return 0
+    with open(args.baseline, encoding='utf-8') as handle:
+        baseline = json.load(handle)
+    if (baseline['backend'], baseline['piattaforma']) != (report['backend'], report['piattaforma']):
+        print(f"ATTENZIONE: riferimento misurato con backend {baseline['backend']} su {baseline['piattaforma']}")
+
+    rows = compare(report, baseline, args.tolerance, args.min_delta_ms)
+    print(f"Confronto con il riferimento del {baseline['data']} (mediane)")
+    for cards, name, before, after, ratio, slower in rows:
+        print(f"  {cards:>6} {name:36} {before:9.2f} -> {after:9.2f} ms  x{ratio:5.2f}"
+              + ('  PIÙ LENTO' if slower else ''))
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"Operazioni più lente del riferimento: {regressions} su {len(rows)}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Misura quanto tempo di parsing KV è stato tolto dall'avvio dell'app.
+
+Confronta:
+  - tutte le regole all'avvio (come con l'unico wineapp.kv): ogni file di kv/;
+  - caricamento su richiesta (kv_loader): all'avvio solo i widget condivisi (SHARED_KV)
+    e la WelcomeScreen, gli altri file alla prima apertura della loro schermata.
+
+Uso (dalla cartella del progetto):
+    python benchmarks/kv_parse.py
+    python benchmarks/kv_parse.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from kivy.lang import Builder  # noqa: E402
+
+from kv_loader import KV_DIR, SHARED_KV, kv_files  # noqa: E402
+
+# File caricati prima del primo frame: widget condivisi e schermata iniziale
+STARTUP_KV = SHARED_KV + ('screens/welcome.kv',)
+
+
+def parse_ms(name):
+    """Tempo di Builder.load_file per un file (poi scaricato, per ripetere la misura)."""
+    path = os.path.join(KV_DIR, name)
+    start = time.perf_counter()
+    Builder.load_file(path)
+    elapsed = time.perf_counter() - start
+    Builder.unload_file(path)
+    return elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='ripetizioni (si riporta la mediana)')
+    args = parser.parse_args()
+
+    names = kv_files()
+    timings = {name: [] for name in names}
+    for _ in range(args.runs):
+        for name in names:
+            timings[name].append(parse_ms(name))
+    median = {name: statistics.median(values) for name, values in timings.items()}
+
+    startup = sum(median[name] for name in STARTUP_KV)
+    total = sum(median.values())
+    print(f"Parsing KV - mediana su {args.runs} esecuzioni")
+    for name in names:
+        when = 'avvio' if name in STARTUP_KV else 'prima apertura'
+        print(f"  {name:32} {median[name]:7.1f} ms  ({when})")
+    print(f"  Tutti i file all'avvio                : {total:7.1f} ms")
+    print(f"  Su richiesta, all'avvio               : {startup:7.1f} ms")
+    print(f"  Tempo tolto dal percorso di avvio     : {total - startup:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
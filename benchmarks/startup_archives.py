@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Misura quanto costa aprire gli archivi all'avvio dell'app.
+
+Confronta:
+  - apertura "eager" (come faceva WineApp.build): i tre archivi aperti prima del primo frame;
+  - apertura "lazy" (WineApp.get_archive): nessun archivio all'avvio, il costo si paga
+    solo al primo ingresso in un archivio (e di solito è già stato pagato in background
+    dal pre-caricamento durante la WelcomeScreen).
+
+Uso (dalla cartella del progetto):
+    python benchmarks/startup_archives.py --cards 5000 --backend tinydb
+    python benchmarks/startup_archives.py --cards 20000 --backend sqlite --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from repository import ARCHIVE_FILES, SQLiteWineRepository, WineRecord, open_repository  # noqa: E402
+
+
+def make_card(wine_color, i):
+    """Una scheda realistica (stessi campi salvati da WineApp.confirm_and_save)."""
+    c = wine_color
+    return {
+        'nome_' + c: f'Vino di prova {i}',
+        'produttore_' + c: f'Cantina {i % 250}',
+        'annata_' + c: str(1990 + i % 34),
+        'alcol_' + c: str(11 + (i % 14) * 0.5),
+        'limpidezza_' + c: 'Limpido',
+        'intensita_vista_' + c: 'Medio',
+        'colore_' + c: ['Rubino', 'Granata'],
+        'condizione_' + c: 'Pulito',
+        'intensita_naso_' + c: 'Intenso',
+        'profumo_' + c: ['Ciliegia', 'Lampone', 'Vaniglia', 'Cuoio'],
+        'dolcezza_' + c: 'Secco',
+        'acidita_' + c: 'Media',
+        'tannicita_' + c: 'Alta',
+        'livello_alcolico_' + c: 'Medio',
+        'corpo_' + c: 'Pieno',
+        'sapore_' + c: ['Ciliegia', 'Prugna', 'Tabacco'],
+        'persistenza_' + c: 'Lunga',
+        'qualita_' + c: ['Difettoso', 'Mediocre', 'Discreto', 'Buono', 'Molto Buono', 'Eccellente'][i % 6],
+    }
+
+
+def build_archives(directory, backend, cards):
+    """Crea i tre archivi con 'cards' schede ciascuno."""
+    for wine_color, base_name in ARCHIVE_FILES.items():
+        base_path = os.path.join(directory, base_name)
+        if backend == 'tinydb':
+            table = {str(i): make_card(wine_color, i) for i in range(1, cards + 1)}
+            with open(base_path + '.json', 'w', encoding='utf-8') as handle:
+                json.dump({'_default': table}, handle)
+        else:
+            repository = SQLiteWineRepository(wine_color, base_path + '.sqlite3')
+            repository.import_records(WineRecord(make_card(wine_color, i), i) for i in range(1, cards + 1))
+            # Segna la migrazione come già fatta: non esiste un JSON da cui migrare
+            repository.set_meta('migrato_da_json', '-')
+            repository.close()
+
+
+def time_call(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=5000, help='schede per colore (default 5000)')
+    parser.add_argument('--backend', choices=('tinydb', 'sqlite'), default='tinydb')
+    parser.add_argument('--runs', type=int, default=3, help='ripetizioni (si riporta la mediana)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_archives(directory, args.backend, args.cards)
+
+        eager, lazy_start, lazy_first = [], [], []
+        for _ in range(args.runs):
+            # EAGER: i tre archivi aperti in build()
+            elapsed, archives = time_call(
+                lambda: [open_repository(c, args.backend, directory=directory) for c in ARCHIVE_FILES])
+            eager.append(elapsed)
+            for db in archives:
+                db.close()
+
+            # LAZY: build() prepara solo i lock per colore, senza aprire nulla...
+            elapsed, _ = time_call(lambda: {c: threading.Lock() for c in ARCHIVE_FILES})
+            lazy_start.append(elapsed)
+
+            # ...e il primo ingresso in un archivio apre solo quel colore e ne legge le schede
+            elapsed, db = time_call(lambda: open_repository('rosso', args.backend, directory=directory))
+            elapsed_all, _ = time_call(db.all)
+            lazy_first.append(elapsed + elapsed_all)
+            db.close()
+
+    def ms(values):
+        return statistics.median(values) * 1000
+
+    print(f"Backend: {args.backend} - {args.cards} schede per colore - mediana su {args.runs} esecuzioni")
+    print(f"  Avvio EAGER (3 archivi aperti in build)        : {ms(eager):9.1f} ms")
+    print(f"  Avvio LAZY  (nessun archivio aperto in build)  : {ms(lazy_start):9.3f} ms")
+    print(f"  LAZY, primo ingresso in un archivio (1 colore) : {ms(lazy_first):9.1f} ms "
+          f"(spesso già pagato dal pre-caricamento in background)")
+    print(f"  Tempo tolto dal percorso di avvio             : {ms(eager) - ms(lazy_start):9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -15,11 +15,16 @@ source.dir = .
 # (list) Source files to include
 source.include_exts = py,png,jpg,kv,atlas
 
+# (list) Le immagini originali servono solo a tools/build_atlas.py: nell'APK vanno gli atlanti
+# (fnmatch fa combaciare '*' anche con '/', quindi materiale/atlas/ va reincluso esplicitamente)
+source.exclude_patterns = materiale/*.png
+source.include_patterns = materiale/atlas/*.png
+
 # (str) Application versioning
 version = 0.1
 
 # (list) Application requirements
-requirements = python3,kivy==2.1.0
+requirements = python3,kivy==2.1.0,sqlite3
 
 # (str) Versione Python da compilare (CRUCIALE per evitare errori NDK)
 python.version = 3.9  # ALLINEATO AL RUNNER DI GITHUB ACTIONS
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Caricamento su richiesta dei file KV.
+
+Le regole KV sono divise per schermata (kv/screens) e per widget condiviso
+(kv/widgets). All'avvio vengono caricati solo i widget usati da tutte le
+schermate (SHARED_KV); i file di una schermata vengono caricati con il Builder
+subito prima di crearla e scaricati quando viene rilasciata (vedi
+LazyScreenManager.register). I file usati da più schermate (es. tasting.kv per
+le 12 fasi della degustazione) hanno un contatore di utilizzo: vengono scaricati
+solo quando nessuna schermata li usa più.
+
+Ogni caricamento viene cronometrato: startup_done() stampa il tempo di parsing
+speso all'avvio e quanti file sono stati rimandati alla prima apertura delle
+schermate; i caricamenti successivi stampano il proprio tempo. Per misurare
+tutti i file senza avviare l'app: benchmarks/kv_parse.py.
+"""
+import os
+import time
+
+from kivy.lang import Builder
+
+
+# Cartella dei file KV (i percorsi nel resto del codice sono relativi a questa)
+KV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kv')
+
+# Widget usati da tutte le schermate: caricati all'avvio e mai scaricati
+SHARED_KV = (
+    'widgets/menu_button.kv',
+    'widgets/wine_labels.kv',
+    'widgets/selection_button.kv',
+    'widgets/navigation_button.kv',
+    'widgets/spinner_option.kv',
+)
+
+# Widget delle sole schermate archivio (intestazioni, filtri e card delle RecycleView)
+ARCHIVE_KV = (
+    'widgets/archive_controls.kv',
+    'widgets/card_items.kv',
+)
+
+
+def kv_files(kv_dir=KV_DIR):
+    """Tutti i file KV (percorsi relativi a kv_dir), in ordine alfabetico."""
+    return sorted(
+        os.path.relpath(os.path.join(folder, name), kv_dir).replace(os.sep, '/')
+        for folder, _, names in os.walk(kv_dir) for name in names if name.endswith('.kv')
+    )
+
+
+class KvLoader:
+    """
+    Carica e scarica i file KV con un contatore di utilizzo per file: acquire() carica
+    i file non ancora caricati, release() scarica quelli che nessuno usa più.
+
+    'startup_ms' è il tempo di parsing fino a startup_done() (avvio dell'app),
+    'deferred_ms' quello dei file caricati dopo, alla prima apertura delle schermate.
+    """
+
+    def __init__(self, kv_dir=KV_DIR):
+        self.kv_dir = kv_dir
+        self._users = {}
+        self._started = False
+        self.startup_ms = 0.0
+        self.deferred_ms = 0.0
+
+    def _path(self, name):
+        return os.path.join(self.kv_dir, name)
+
+    def load_shared(self):
+        """Carica i widget condivisi (SHARED_KV)."""
+        self.acquire(SHARED_KV)
+
+    def acquire(self, names):
+        """Segnala un nuovo utilizzatore dei file, caricando quelli non ancora caricati."""
+        for name in names:
+            users = self._users.get(name, 0)
+            if users == 0:
+                self._load(name)
+            self._users[name] = users + 1
+
+    def release(self, names):
+        """Toglie un utilizzatore dei file e scarica quelli rimasti senza utilizzatori."""
+        for name in names:
+            users = self._users.get(name, 0) - 1
+            if users > 0:
+                self._users[name] = users
+            elif name in self._users:
+                del self._users[name]
+                # Le regole restano applicate ai widget già creati: cambiano solo i widget futuri
+                Builder.unload_file(self._path(name))
+
+    def _load(self, name):
+        start = time.perf_counter()
+        Builder.load_file(self._path(name))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if self._started:
+            self.deferred_ms += elapsed_ms
+            print(f"KV {name}: {elapsed_ms:.1f} ms (alla prima apertura, "
+                  f"totale dopo l'avvio {self.deferred_ms:.1f} ms)")
+        else:
+            self.startup_ms += elapsed_ms
+
+    def startup_done(self):
+        """Chiude la fase di avvio e stampa il riepilogo del parsing KV."""
+        self._started = True
+        deferred = [name for name in kv_files(self.kv_dir) if name not in self._users]
+        deferred_kb = sum(os.path.getsize(self._path(name)) for name in deferred) / 1024
+        print(f"KV all'avvio: {len(self._users)} file in {self.startup_ms:.1f} ms; "
+              f"rimandati alla prima apertura delle schermate: {len(deferred)} file ({deferred_kb:.0f} KB)")
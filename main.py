@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
+from startup_profile import PROFILER, report_path  # PRIMO import: zero dei tempi del profilo di avvio
 import kivy
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.uix.boxlayout import BoxLayout
 from kivy.lang import Builder
 from kivy.uix.button import Button
+from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.behaviors import ButtonBehavior
 from kivy.graphics import Color, RoundedRectangle
 from kivy.metrics import dp  # Per definire le dimensioni in modo indipendente dalla densità
@@ -12,11 +15,24 @@ from kivy.factory import Factory
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from kivy.uix.popup import Popup
-from kivy.uix.screenmanager import ScreenManager, Screen, FadeTransition
+from kivy.uix.screenmanager import Screen, FadeTransition
 from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.properties import StringProperty, DictProperty, NumericProperty, BooleanProperty, ListProperty
-from tinydb import TinyDB, Query
-import json  # Utile per visualizzare i dati per debug
+import threading
+from functools import partial
+from persistence import ArchiveWriter  # Thread unico per le scritture sugli archivi
+from repository import ARCHIVE_FILES, open_repository, to_number  # Accesso agli archivi (SQLite o TinyDB)
+from archive_index import ArchiveIndex, QUALITY_SCALE  # Ordinamento, ricerca e filtri in memoria
+from record_format import INFO_FIELDS  # Campi di testo della scheda (vedi schema in record_format)
+from tasting_schema import (  # Fasi, gruppi e opzioni della degustazione
+    COLUMNS, DETAIL_ROWS, GROUPS, LONG_LABEL, PHASES, ROW, TASTING_FIELDS, THEMES, group_columns,
+)
+from selection_model import SelectionModel  # Selezioni della degustazione in corso (osservabili per gruppo)
+from screen_manager import LazyScreenManager  # Schermate create al primo utilizzo e rilasciate per colore (LRU)
+from kv_loader import ARCHIVE_KV, KvLoader  # File KV caricati alla creazione delle schermate
+from asset_preloader import AssetPreloader  # Immagini e font pre-caricati durante la WelcomeScreen
+from ui_trace import TRACER, trace_path, traced  # Tempi delle interazioni lente (con WINEAPP_UI_TRACE)
 from kivy.core.window import Window
 
 # Importa i widget utilizzati nel KV
@@ -24,9 +40,11 @@ from kivy.uix.image import Image
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.spinner import Spinner
 
+PROFILER.mark('import')
 
 # Imposta la dimensione fissa della finestra
 Window.size = (320, 480)
+PROFILER.mark('finestra')
 
 
 class RoundedButton(ButtonBehavior, BoxLayout):
@@ -87,8 +105,16 @@ class RoundedButton(ButtonBehavior, BoxLayout):
             self.color_instruction.rgba = self._background_color
 
 
-class BaseScreen(Screen):
-    """Classe base per le schermate con logica di selezione bottoni."""
+# Fasi della degustazione nell'ordine delle schermate (es. 'vista_rosso' -> 'naso_rosso' -> ...)
+PHASE_NAMES = tuple(phase.name for phase in PHASES)
+
+
+class TastingScreen(Screen):
+    """
+    Schermata di una fase della degustazione (vista, naso, palato o conclusioni) per un colore.
+    Il layout comune alle 12 schermate è la regola <TastingScreen> del KV; i gruppi di bottoni
+    della fase vengono costruiti dallo schema della degustazione (vedi tasting_schema).
+    """
 
     # Bianco sporco trasparente al 70% come sfondo non selezionato (vedi <SelectionButton@Button> nel file kivi)
     COLOR_DESELECTED = (0.9, 0.9, 0.9, 0.7)
@@ -96,110 +122,165 @@ class BaseScreen(Screen):
     # Giallo chiaro trasparente al 70% come sfondo selezionato
     COLOR_SELECTED = (0.96, 0.96, 0.5, 0.7)  # alternativa (0, 0.3, 0.3, 0.5) ciano molto scuro trasparente al 70%
 
-    # Definisce le chiavi del DB che questa schermata gestisce
-    # DEVE essere sovrascritta nelle classi figlie (es. RedWineVistaScreen)
-    SELECTION_KEYS = []
+    # Altezza relativa delle righe nelle fasi senza altezza fissa (es. palato)
+    ROW_SIZE_HINT_Y = 0.14
 
-    def on_enter(self, *args):
-        """Metodo chiamato quando si naviga nella schermata.
-        Pre-carica i colori dei bottoni se siamo in modalità modifica."""
-        super().on_enter(*args)
-        app = App.get_running_app()
-
-        # 1. RESET TOTALE: Spegni tutti i bottoni in questa schermata
-        self._reset_button_colors()  # Assumi che questo usi self.COLOR_DESELECTED
-
-        # 1. Controlla se siamo in modalità modifica E se ci sono dati di selezione
-        if app.card_to_update_id is not None and app.selections:
+    # Gruppi a colonne: spazio per il titolo e altezza di ogni bottone della colonna più lunga
+    COLUMN_TITLE_HEIGHT = 40
+    COLUMN_BUTTON_HEIGHT = 14
 
-            # 2. Resetta e poi imposta i colori dei bottoni
-            self._apply_selections(app, self.SELECTION_KEYS)
-            #self._apply_selections(app)
+    phase = StringProperty('')  # Nome della fase nello schema (es. 'vista')
+    wine_color = StringProperty('')  # 'rosso', 'bianco' o 'rosato'
 
-    def _apply_selections(self, app, relevant_keys):
-        """
-        Itera sui BOX contenitori e imposta il colore.
-        Gestisce anche il caso in cui un singolo DB key (es. 'profumo_rosso')
-        è distribuito su più KV ID (es. 'profumo_primari_rosso_box').
-        """
+    # Schermate dei bottoni "Indietro" e "Avanti"
+    previous_screen = StringProperty('')
+    next_screen = StringProperty('')
 
-        for kv_id in relevant_keys:
+    # Nella prima fase "Indietro" torna alla scelta del vino: nascosto durante la modifica di una scheda
+    is_first_phase = BooleanProperty(False)
 
-            # --- NUOVA LOGICA DI MAPPATURA ---
-            # 1. Deriva la chiave DB. In caso di chiavi composte (es. 'profumo_primari_...'),
-            #    dovrebbe tornare al nome base (es. 'profumo_...')
+    def __init__(self, **kwargs):
+        phase, wine_color = kwargs['phase'], kwargs['wine_color']
+        index = PHASE_NAMES.index(phase)
+        kwargs.setdefault('name', phase + '_' + wine_color)
+        kwargs.setdefault('is_first_phase', index == 0)
+        kwargs.setdefault('previous_screen', PHASE_NAMES[index - 1] + '_' + wine_color if index else 'selection')
+        kwargs.setdefault('next_screen', PHASE_NAMES[index + 1] + '_' + wine_color
+                          if index + 1 < len(PHASE_NAMES) else 'info_' + wine_color)
+        super().__init__(**kwargs)
 
-            # Rimuovi '_box'
-            db_key_derived = kv_id.replace('_box', '')
+    def on_kv_post(self, base_widget):
+        super().on_kv_post(base_widget)
+        self._build_groups()
+        self._bind_selections(App.get_running_app().selections)
 
-            # Mappatura specifica per chiavi composte (Primari/Secondari/Terziari/etc.)
-            if 'primari' in db_key_derived or 'secondari' in db_key_derived or 'terzari' in db_key_derived:
-                # Esempio: 'profumo_primari_rosso' -> 'profumo_rosso'
-                db_key = db_key_derived.split('_')[0] + '_' + db_key_derived.split('_')[-1]
+    # ----------------------------------------------------------------------
+    # GRUPPI DI BOTTONI (dallo schema) E REGISTRO DEI BOTTONI
+    # ----------------------------------------------------------------------
+    def _build_groups(self):
+        """
+        Costruisce UNA volta, dopo l'applicazione del KV, i gruppi di bottoni della fase nel BOX
+        'groups_box' e il registro dei bottoni di selezione: chiave DB (es. 'profumo_rosso') ->
+        {testo del bottone: bottone}. I cambi di schermata non devono attraversare l'albero dei widget.
+        """
+        phase = PHASES[PHASE_NAMES.index(self.phase)]
+        theme = THEMES[self.wine_color]
+        container = self.ids.groups_box
+        container.spacing = phase.spacing
+
+        self._button_groups = {}
+        for group in phase.groups:
+            db_key = group.field + '_' + self.wine_color
+            self._button_groups[db_key] = {}
+            container.add_widget(self._group_box(phase, group, db_key, theme))
+
+        if phase.row_height:
+            # Spazio libero sotto i gruppi a righe di altezza fissa
+            container.add_widget(Label(size_hint_y=0.1))
+
+        # Bottoni colorati come selezionati, per gruppo (vedi render_group)
+        self._painted = {db_key: set() for db_key in self._button_groups}
+
+    def _group_box(self, phase, group, db_key, theme):
+        """BOX di un gruppo: etichetta e bottoni in riga, oppure etichetta e colonne di bottoni."""
+        label_class = Factory.get(theme.label_class)
+        columns = group_columns(group, self.wine_color)
+
+        box = BoxLayout(spacing=group.spacing)
+        box.add_widget(label_class(text=group.label, size_hint_x=group.label_width))
+
+        if group.layout == ROW:
+            if phase.row_height:
+                box.size_hint_y, box.height = None, phase.row_height
             else:
-                # Caso normale (es. 'limpidezza_rosso')
-                db_key = db_key_derived
-            # --- FINE NUOVA LOGICA DI MAPPATURA ---
+                box.size_hint_y = self.ROW_SIZE_HINT_Y
+            box_id, _, labels = columns[0]
+            self.ids[box_id] = box  # ID del BOX come nel KV (es. 'limpidezza_rosso_box')
+            for text in labels:
+                box.add_widget(self._selection_button(group, db_key, text, theme, size_hint_x=group.button_width))
+            return box
+
+        # COLUMNS / COLUMN: l'altezza dipende dalla colonna più lunga
+        box.size_hint_y = None
+        box.height = group.height or (
+            self.COLUMN_TITLE_HEIGHT + self.COLUMN_BUTTON_HEIGHT * max(len(labels) for _, _, labels in columns))
+        columns_box = BoxLayout(spacing=group.spacing, padding=group.spacing)
+        for box_id, title, labels in columns:
+            column = BoxLayout(orientation='vertical', spacing=1 if group.layout == COLUMNS else group.spacing)
+            self.ids[box_id] = column  # es. 'profumo_primari_rosso_box'
+            if title:
+                column.add_widget(label_class(text=title, font_size=group.font_size + 1, size_hint_y=None, height=13))
+            for text in labels:
+                column.add_widget(self._selection_button(
+                    group, db_key, text, theme, size_hint_x=1 if group.layout == COLUMNS else group.button_width))
+            columns_box.add_widget(column)
+        box.add_widget(columns_box)
+        return box
+
+    def _selection_button(self, group, db_key, text, theme, **kwargs):
+        """Bottone di selezione (singola o multipla) del gruppo, registrato per testo."""
+        font_size = group.font_size or theme.font_size
+        if group.small_font_size and len(text) > LONG_LABEL:
+            font_size = group.small_font_size
+
+        button = Factory.SelectionButton(text=text, font_size=font_size, color=theme.button_color, **kwargs)
+        press = self.on_multiple_select_press if group.multiple else self.on_button_press
+        button.bind(on_release=partial(press, db_key))
+        self._button_groups[db_key][text] = button
+        return button
+
+    def _bind_selections(self, selections):
+        """
+        Registra la schermata SOLO sui gruppi di selezione dei suoi bottoni: quando cambia
+        un gruppo (bottone premuto, scheda caricata per la modifica, degustazione azzerata)
+        viene ridisegnato solo quel gruppo, qualunque sia la schermata visibile.
+        """
+        self._selection_callbacks = {db_key: partial(self._on_selection_change, db_key) for db_key in self._button_groups}
+        selections.bind(**self._selection_callbacks)
+        for db_key in self._button_groups:
+            self.render_group(db_key, selections.get(db_key))
 
-            # 2. Ottieni il valore selezionato dal dizionario app.selections
-            # db_key sarà 'profumo_rosso' (corretto) o 'limpidezza_rosso' (corretto)
-            db_value = app.selections.get(db_key)
+    def release(self):
+        """Prima del rilascio della schermata (vedi LazyScreenManager): si stacca dal modello delle selezioni."""
+        App.get_running_app().selections.unbind(**self._selection_callbacks)
 
-            if db_value is None:
-                continue
-
-            # 3. Trova il BoxLayout contenitore
-            try:
-                box_container = self.ids[kv_id]  # Usa l'ID KV (es. 'profumo_primari_rosso_box')
-            except KeyError:
-                print(f"ATTENZIONE: BoxLayout con ID '{kv_id}' non trovato.")
-                continue
+    def _on_selection_change(self, db_key, selections, db_value):
+        self.render_group(db_key, db_value)
 
-            # 4. Itera sui bottoni e colora
-            # ... (il resto del codice rimane uguale) ...
-            for widget in box_container.children:
-                if isinstance(widget, ButtonBehavior) and hasattr(widget, 'text'):
-                    button_text = widget.text
-                    is_selected = False
-
-                    # Logica per la selezione (Singola o Multipla)
-                    if isinstance(db_value, str) and button_text == db_value:
-                        is_selected = True
-                    elif isinstance(db_value, list) and button_text in db_value:
-                        is_selected = True
-
-                    if is_selected:
-                        widget.background_color = self.COLOR_SELECTED
-                    else:
-                        widget.background_color = self.COLOR_DESELECTED
-
-    def _reset_button_colors(self):
-        """Resetta esplicitamente i colori di tutti i bottoni a COLOR_DESELECTED."""
-        for widget in self.walk():
-            if isinstance(widget, ButtonBehavior) and hasattr(widget, 'background_color'):
-                widget.background_color = self.COLOR_DESELECTED
-
-    def on_button_press(self, group_name, button, other_buttons):
+    def render_group(self, db_key, db_value):
+        """
+        Colora come selezionati i bottoni del gruppo scelti in 'db_value' (testo o lista di
+        testi, selezione singola o multipla; None = nessuna selezione) e spegne gli altri.
+        Cambia il colore solo dei bottoni il cui stato è diverso dall'ultimo aggiornamento.
+        """
+        group = self._button_groups[db_key]
+        if isinstance(db_value, str):
+            db_value = (db_value,)
+        elif not isinstance(db_value, list):
+            db_value = ()
+        # Ricerca per testo nel registro (dizionario): nessuna scansione dei bottoni del BOX
+        selected = {group[text] for text in db_value if text in group}
+
+        painted = self._painted[db_key]
+        for widget in painted - selected:
+            widget.background_color = self.COLOR_DESELECTED
+        for widget in selected - painted:
+            widget.background_color = self.COLOR_SELECTED
+        self._painted[db_key] = selected
+
+    def on_button_press(self, group_name, button):
         """
         Gestisce la selezione esclusiva di un bottone e aggiorna lo stato.
+        I colori dei bottoni del gruppo vengono aggiornati dalla notifica del modello
+        delle selezioni (vedi render_group).
         """
         app = App.get_running_app()
-        current_selection = app.selections.get(group_name)
 
-        if current_selection == button.text:
+        if app.selections.get(group_name) == button.text:
             # Deseleziona il bottone se è già premuto
-            # (Resetta il colore Bianco sporco e trasparenza al 70%)
-            button.background_color = self.COLOR_DESELECTED
-            app.selections.pop(group_name, None)
+            app.selections.pop(group_name)
         else:
-            # Seleziona il nuovo bottone
-            for widget in other_buttons:
-                # Resetta il colore degli altri bottoni
-                if isinstance(widget, Button):
-                    widget.background_color = self.COLOR_DESELECTED
-
-            # Colore evidenziato
-            button.background_color = self.COLOR_SELECTED
+            # Seleziona il nuovo bottone (sostituisce quello precedente del gruppo)
             app.selections[group_name] = button.text
 
     def on_multiple_select_press(self, group_name, button):
@@ -207,30 +288,26 @@ class BaseScreen(Screen):
         Gestisce la selezione multipla di bottoni e aggiorna lo stato.
         """
         app = App.get_running_app()
-        # Assicurati che la chiave sia una lista
-        if group_name not in app.selections or not isinstance(app.selections[group_name], list):
-            app.selections[group_name] = []
-
-        if button.text in app.selections[group_name]:
-            # Se il bottone è già nella lista, lo rimuovi
-            app.selections[group_name].remove(button.text)
-            button.background_color = self.COLOR_DESELECTED
-        else:
-            # Altrimenti, lo aggiungi alla lista
-            app.selections[group_name].append(button.text)
-            button.background_color = self.COLOR_SELECTED
+        # Aggiunge il testo alla lista del gruppo, o lo rimuove se è già presente
+        app.selections.toggle(group_name, button.text)
 
 
 # ==============================================================================
 # DEFINIZIONE DELLE CLASSI SCREEN
-# Queste classi non contengono logica (solo "pass") perché il loro layout
-# e la navigazione sono gestiti nel file KV.
+# Il layout e la navigazione di queste classi sono gestiti nel file KV.
+# Le schermate della degustazione sono tutte TastingScreen (vedi sopra).
 # ==============================================================================
 
 
 class WelcomeScreen(Screen):
     """Schermata di Benvenuto con il tasto 'Inizia'."""
-    pass
+
+    def on_enter(self, *args):
+        # Mentre l'utente guarda la schermata iniziale, apre gli archivi e prepara immagini e font in background
+        super().on_enter(*args)
+        app = App.get_running_app()
+        app.prewarm_archives()
+        app.preload_assets()
 
 
 class WineSelectionScreen(Screen):
@@ -238,53 +315,13 @@ class WineSelectionScreen(Screen):
     pass
 
 
-class RedWineViewScreen(BaseScreen):
-    """Schermata per la fase 'Vista' del vino rosso."""
-    # Le chiavi devono corrispondere esattamente agli ID dei BoxLayout nel KV!
-    SELECTION_KEYS = ['limpidezza_rosso_box', 'intensita_vista_rosso_box', 'colore_rosso_box']
-    pass
-
-
-class RedWineNoseScreen(BaseScreen):
-    """Schermata per la fase 'Naso' del vino rosso."""
-    # DEVONO ESSERE GLI ID KV CORRETTI, inclusi i suffissi _box
-    SELECTION_KEYS = [
-        'condizione_rosso_box',         # Corretto: era 'condizione_rosso' nel log
-        'intensita_naso_rosso_box',     # Corretto: era 'intensita_naso_rosso' nel log
-        # NOTA: Se hai suddiviso i profumi in box separati, includili tutti
-        'profumo_primari_rosso_box',
-        'profumo_secondari_rosso_box',
-        'profumo_terzari_rosso_box'
-    ]
-    pass
-
-
-class RedWineTasteScreen(BaseScreen):
-    """Schermata per la fase 'Palato' del vino rosso."""
-    # Chiavi del DB gestite in questa schermata:
-    SELECTION_KEYS = ['dolcezza_rosso_box',
-                      'acidita_rosso_box',
-                      'tannicita_rosso_box',
-                      'livello_alcolico_rosso_box',
-                      'corpo_rosso_box',
-                      'sapore_primari_rosso_box', 'sapore_secondari_rosso_box', 'sapore_terzari_rosso_box',
-                      'persistenza_rosso_box'
-                      ]
-    pass
-
-
-class RedWineEpilogueScreen(BaseScreen):
-    """Schermata di 'Conclusione' del vino rosso."""
-    SELECTION_KEYS = ['qualita_rosso_box']
-    pass
-
-
 class RedWineInfoScreen(Screen):
     """Schermata di 'Info' del vino rosso."""
 
     # ----------------------------------------------------------------------
     # PRE-CARICAMENTO E CAMBIO DI TESTO DEL BOTTONE SALVA/AGGIORNA
     # ----------------------------------------------------------------------
+    @traced()
     def on_enter(self, *args):
         """Metodo chiamato quando si naviga in questa schermata.
         Controlla se è attiva la modalità di modifica e pre-popola i campi.
@@ -293,7 +330,7 @@ class RedWineInfoScreen(Screen):
         app = App.get_running_app()
 
         # Riferimento al bottone "Salva Scheda" (Assumiamo l'ID 'nav_salva_rosso' nel KV)
-        # NOTA: Devi assicurarti che il bottone nel file wineapp.kv abbia questo ID.
+        # NOTA: Devi assicurarti che il bottone nel file kv/screens/info_rosso.kv abbia questo ID.
         try:
             btn_salva = self.ids.nav_salva_rosso
         except KeyError:
@@ -334,52 +371,13 @@ class RedWineInfoScreen(Screen):
             # self.ids['alcol_rosso'].text = 'Gradazione alcolica'
 
 
-class WhiteWineViewScreen(BaseScreen):
-    """Schermata per la fase 'Vista' del vino bianco."""
-    # Le chiavi devono corrispondere esattamente agli ID dei BoxLayout nel KV!
-    SELECTION_KEYS = ['limpidezza_bianco_box', 'intensita_vista_bianco_box', 'colore_bianco_box']
-    pass
-
-class WhiteWineNoseScreen(BaseScreen):
-    """Schermata per la fase 'Naso' del vino bianco."""
-    # DEVONO ESSERE GLI ID KV CORRETTI, inclusi i suffissi _box
-    SELECTION_KEYS = [
-        'condizione_bianco_box',
-        'intensita_naso_bianco_box',
-        # NOTA: Se hai suddiviso i profumi in box separati, includili tutti
-        'profumo_primari_bianco_box',
-        'profumo_secondari_bianco_box',
-        'profumo_terzari_bianco_box'
-    ]
-    pass
-
-
-class WhiteWineTasteScreen(BaseScreen):
-    """Schermata per la fase 'Palato' del vino bianco."""
-    # Chiavi del DB gestite in questa schermata:
-    SELECTION_KEYS = ['dolcezza_bianco_box',
-                      'acidita_bianco_box',
-                      'tannicita_bianco_box',
-                      'livello_alcolico_bianco_box',
-                      'corpo_bianco_box',
-                      'sapore_primari_bianco_box', 'sapore_secondari_bianco_box', 'sapore_terzari_bianco_box',
-                      'persistenza_bianco_box'
-                      ]
-    pass
-
-
-class WhiteWineEpilogueScreen(BaseScreen):
-    """Schermata di 'Conclusione' del vino bianco."""
-    SELECTION_KEYS = ['qualita_bianco_box']
-    pass
-
-
 class WhiteWineInfoScreen(Screen):
     """Schermata di 'Info' del vino bianco."""
 
     # ----------------------------------------------------------------------
     # PRE-CARICAMENTO E CAMBIO DI TESTO DEL BOTTONE SALVA/AGGIORNA
     # ----------------------------------------------------------------------
+    @traced()
     def on_enter(self, *args):
         """Metodo chiamato quando si naviga in questa schermata.
 		Controlla se è attiva la modalità di modifica e pre-popola i campi.
@@ -388,7 +386,7 @@ class WhiteWineInfoScreen(Screen):
         app = App.get_running_app()
 
         # Riferimento al bottone "Salva Scheda" (Assumiamo l'ID 'nav_salva_rosso' nel KV)
-        # NOTA: Devi assicurarti che il bottone nel file wineapp.kv abbia questo ID.
+        # NOTA: Devi assicurarti che il bottone nel file kv/screens/info_bianco.kv abbia questo ID.
         try:
             btn_salva = self.ids.nav_salva_bianco
         except KeyError:
@@ -429,53 +427,13 @@ class WhiteWineInfoScreen(Screen):
             # self.ids['alcol_bianco'].text = 'Gradazione alcolica'
 
 
-class PinkWineViewScreen(BaseScreen):
-    """Schermata per la fase 'Vista' del vino rosato."""
-    # Le chiavi devono corrispondere esattamente agli ID dei BoxLayout nel KV!
-    SELECTION_KEYS = ['limpidezza_rosato_box', 'intensita_vista_rosato_box', 'colore_rosato_box']
-    pass
-
-
-class PinkWineNoseScreen(BaseScreen):
-    """Schermata per la fase 'Olfatto' del vino rosato."""
-    # DEVONO ESSERE GLI ID KV CORRETTI, inclusi i suffissi _box
-    SELECTION_KEYS = [
-        'condizione_rosato_box',
-        'intensita_naso_rosato_box',
-        # NOTA: Se hai suddiviso i profumi in box separati, includili tutti
-        'profumo_primari_rosato_box',
-        'profumo_secondari_rosato_box',
-        'profumo_terzari_rosato_box'
-    ]
-    pass
-
-
-class PinkWineTasteScreen(BaseScreen):
-    """Schermata per la fase 'Palato' del vino rosato."""
-    # Chiavi del DB gestite in questa schermata:
-    SELECTION_KEYS = ['dolcezza_rosato_box',
-                      'acidita_rosato_box',
-                      'tannicita_rosato_box',
-                      'livello_alcolico_rosato_box',
-                      'corpo_rosato_box',
-                      'sapore_primari_rosato_box', 'sapore_secondari_rosato_box', 'sapore_terzari_rosato_box',
-                      'persistenza_rosato_box'
-                      ]
-    pass
-
-
-class PinkWineEpilogueScreen(BaseScreen):
-    """Schermata di 'Conclusione' del vino rosato."""
-    SELECTION_KEYS = ['qualita_rosato_box']
-    pass
-
-
 class PinkWineInfoScreen(Screen):
     """Schermata di 'Info' del vino rosato."""
 
     # ----------------------------------------------------------------------
     # PRE-CARICAMENTO E CAMBIO DI TESTO DEL BOTTONE SALVA/AGGIORNA
     # ----------------------------------------------------------------------
+    @traced()
     def on_enter(self, *args):
         """Metodo chiamato quando si naviga in questa schermata.
 		Controlla se è attiva la modalità di modifica e pre-popola i campi.
@@ -484,7 +442,7 @@ class PinkWineInfoScreen(Screen):
         app = App.get_running_app()
 
         # Riferimento al bottone "Salva Scheda" (Assumiamo l'ID 'nav_salva_rosso' nel KV)
-        # NOTA: Devi assicurarti che il bottone nel file wineapp.kv abbia questo ID.
+        # NOTA: Devi assicurarti che il bottone nel file kv/screens/info_rosato.kv abbia questo ID.
         try:
             btn_salva = self.ids.nav_salva_rosato
         except KeyError:
@@ -525,16 +483,36 @@ class PinkWineInfoScreen(Screen):
             # self.ids['alcol_rosato'].text = 'Gradazione alcolica'
 
 
-class RedWineCardItem(ButtonBehavior, GridLayout):
+# Scheda INFO di ogni colore (ultima schermata della degustazione, dopo le conclusioni)
+INFO_SCREENS = {'rosso': RedWineInfoScreen, 'bianco': WhiteWineInfoScreen, 'rosato': PinkWineInfoScreen}
+
+
+class WineCardViewBehavior(RecycleDataViewBehavior):
+    """
+    Comportamento comune delle schede nella RecycleView dell'archivio.
+    row_index (righe a colori alternati) è la posizione attuale nell'archivio: non è salvato
+    nei dati, così inserire o eliminare una scheda non richiede di rinumerare le altre.
+    La RecycleView contiene solo le pagine caricate: 'row_offset' è la posizione della prima.
+    """
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.row_index = index + getattr(rv, 'row_offset', 0)
+        return super().refresh_view_attrs(rv, index, data)
+
+
+class RedWineCardItem(WineCardViewBehavior, ButtonBehavior, GridLayout):
     """
     Scheda per visualizzare i dati di un singolo vino.
-    Definiamo la proprietà wine_data che riceverà il dizionario da TinyDB.
+    Definiamo la proprietà wine_data che riceverà il dizionario dall'archivio.
+    È la 'viewclass' della RecycleView dell'archivio: la stessa istanza viene riutilizzata
+    per righe diverse durante lo scorrimento, ricevendo ogni volta wine_data, row_index e card_doc_id.
     """
     wine_data = DictProperty({})  # Usiamo DictProperty perché wine_data è un dizionario (il record di TinyDB)
     row_index = NumericProperty(0)  # Proprietà per l'indice della riga (0, 1, 2, 3...)
     expanded = BooleanProperty(False)  # Traccia se la scheda è espansa o meno
     card_doc_id = NumericProperty(0)  # per memorizzare l'ID univoco del documento (TinyDB doc_id)
 
+    @traced()
     def toggle_expand_red(self):
         """Mostra un popup con i dettagli completi della degustazione."""
 
@@ -593,18 +571,9 @@ class RedWineCardItem(ButtonBehavior, GridLayout):
 
             scroll_content.add_widget(label)
 
-        # 4a. Dettagli Vista
-        add_detail_row_red("Vista (Limpidezza / Intensità / Colore):\n", ['limpidezza_rosso', 'intensita_vista_rosso', 'colore_rosso'])
-
-        # 4b. Dettagli Olfatto
-        add_detail_row_red("Olfatto (Condizione / Intensità):\n", ['condizione_rosso', 'intensita_naso_rosso']),
-        add_detail_row_red("Profumi: ", ['profumo_rosso'])
-
-        # 4c. Dettagli Palato
-        add_detail_row_red("Palato: ", ['dolcezza_rosso'])
-        add_detail_row_red("Corpo / Acidità / Tannini / Alcol:\n", ['corpo_rosso', 'acidita_rosso', 'tannicita_rosso', 'livello_alcolico_rosso'])
-        add_detail_row_red("Sapori: ", ['sapore_rosso'])
-        add_detail_row_red("Persistenza / Qualità:\n", ['persistenza_rosso', 'qualita_rosso'])
+        # 4. Dettagli Vista, Olfatto, Palato e Conclusioni (righe dello schema della degustazione)
+        for title, fields in DETAIL_ROWS:
+            add_detail_row_red(title, [field + '_rosso' for field in fields])
 
         # 5. Contenitore dei bottoni (sotto i dettagli)
         button_box = BoxLayout(
@@ -728,16 +697,19 @@ class RedWineCardItem(ButtonBehavior, GridLayout):
         # Devi ASSICURARTI che il metodo start_edit_card nella tua WineApp accetti 3 argomenti.
         app.start_edit_card(wine_color, self.wine_data, self.card_doc_id)
 
-class WhiteWineCardItem(ButtonBehavior, GridLayout):
+class WhiteWineCardItem(WineCardViewBehavior, ButtonBehavior, GridLayout):
     """
     Scheda per visualizzare i dati di un singolo vino.
-    Definiamo la proprietà wine_data che riceverà il dizionario da TinyDB.
+    Definiamo la proprietà wine_data che riceverà il dizionario dall'archivio.
+    È la 'viewclass' della RecycleView dell'archivio: la stessa istanza viene riutilizzata
+    per righe diverse durante lo scorrimento, ricevendo ogni volta wine_data, row_index e card_doc_id.
     """
     wine_data = DictProperty({})  # Usiamo DictProperty perché wine_data è un dizionario (il record di TinyDB)
     row_index = NumericProperty(0)  # Proprietà per l'indice della riga (0, 1, 2, 3...)
     expanded = BooleanProperty(False)  # Traccia se la scheda è espansa o meno
     card_doc_id = NumericProperty(0)  # per memorizzare l'ID univoco del documento (TinyDB doc_id)
 
+    @traced()
     def toggle_expand_white(self):
         """Mostra un popup con i dettagli completi della degustazione."""
 
@@ -796,18 +768,9 @@ class WhiteWineCardItem(ButtonBehavior, GridLayout):
 
             scroll_content.add_widget(label)
 
-        # 4a. Dettagli Vista
-        add_detail_row_white("Vista (Limpidezza / Intensità / Colore):\n", ['limpidezza_bianco', 'intensita_vista_bianco', 'colore_bianco'])
-
-        # 4b. Dettagli Olfatto
-        add_detail_row_white("Olfatto (Condizione / Intensità):\n", ['condizione_bianco', 'intensita_naso_bianco']),
-        add_detail_row_white("Profumi: ", ['profumo_bianco'])
-
-        # 4c. Dettagli Palato
-        add_detail_row_white("Palato: ", ['dolcezza_bianco'])
-        add_detail_row_white("Corpo / Acidità / Tannini / Alcol:\n", ['corpo_bianco', 'acidita_bianco', 'tannicita_bianco', 'livello_alcolico_bianco'])
-        add_detail_row_white("Sapori: ", ['sapore_bianco'])
-        add_detail_row_white("Persistenza / Qualità:\n", ['persistenza_bianco', 'qualita_bianco'])
+        # 4. Dettagli Vista, Olfatto, Palato e Conclusioni (righe dello schema della degustazione)
+        for title, fields in DETAIL_ROWS:
+            add_detail_row_white(title, [field + '_bianco' for field in fields])
 
         # 5. Contenitore dei bottoni (sotto i dettagli)
         button_box = BoxLayout(
@@ -931,16 +894,19 @@ class WhiteWineCardItem(ButtonBehavior, GridLayout):
         # Devi ASSICURARTI che il metodo start_edit_card nella tua WineApp accetti 3 argomenti.
         app.start_edit_card(wine_color, self.wine_data, self.card_doc_id)
 
-class PinkWineCardItem(ButtonBehavior, GridLayout):
+class PinkWineCardItem(WineCardViewBehavior, ButtonBehavior, GridLayout):
     """
     Scheda per visualizzare i dati di un singolo vino.
-    Definiamo la proprietà wine_data che riceverà il dizionario da TinyDB.
+    Definiamo la proprietà wine_data che riceverà il dizionario dall'archivio.
+    È la 'viewclass' della RecycleView dell'archivio: la stessa istanza viene riutilizzata
+    per righe diverse durante lo scorrimento, ricevendo ogni volta wine_data, row_index e card_doc_id.
     """
     wine_data = DictProperty({})  # Usiamo DictProperty perché wine_data è un dizionario (il record di TinyDB)
     row_index = NumericProperty(0)  # Proprietà per l'indice della riga (0, 1, 2, 3...)
     expanded = BooleanProperty(False)  # Traccia se la scheda è espansa o meno
     card_doc_id = NumericProperty(0)  # per memorizzare l'ID univoco del documento (TinyDB doc_id)
 
+    @traced()
     def toggle_expand_pink(self):
         """Mostra un popup con i dettagli completi della degustazione."""
 
@@ -999,18 +965,9 @@ class PinkWineCardItem(ButtonBehavior, GridLayout):
 
             scroll_content.add_widget(label)
 
-        # 4a. Dettagli Vista
-        add_detail_row_pink("Vista (Limpidezza / Intensità / Colore):\n", ['limpidezza_rosato', 'intensita_vista_rosato', 'colore_rosato'])
-
-        # 4b. Dettagli Olfatto
-        add_detail_row_pink("Olfatto (Condizione / Intensità):\n", ['condizione_rosato', 'intensita_naso_rosato']),
-        add_detail_row_pink("Profumi: ", ['profumo_rosato'])
-
-        # 4c. Dettagli Palato
-        add_detail_row_pink("Palato: ", ['dolcezza_rosato'])
-        add_detail_row_pink("Corpo / Acidità / Tannini / Alcol:\n", ['corpo_rosato', 'acidita_rosato', 'tannicita_rosato', 'livello_alcolico_rosato'])
-        add_detail_row_pink("Sapori: ", ['sapore_rosato'])
-        add_detail_row_pink("Persistenza / Qualità:\n", ['persistenza_rosato', 'qualita_rosato'])
+        # 4. Dettagli Vista, Olfatto, Palato e Conclusioni (righe dello schema della degustazione)
+        for title, fields in DETAIL_ROWS:
+            add_detail_row_pink(title, [field + '_rosato' for field in fields])
 
         # 5. Contenitore dei bottoni (sotto i dettagli)
         button_box = BoxLayout(
@@ -1135,118 +1092,409 @@ class PinkWineCardItem(ButtonBehavior, GridLayout):
         app.start_edit_card(wine_color, self.wine_data, self.card_doc_id)
 
 
-class RedArchiveScreen(Screen):
-    """Schermata della visualizzazione dell' 'archivio' dei vini rossi."""
+class ArchiveScreen(Screen):
+    """
+    Base comune delle tre schermate di archivio.
+    Le schede sono mostrate in una RecycleView (id 'archive_list', vedi KV): la lista contiene
+    solo dizionari, e i widget *WineCardItem esistono solo per le righe visibili.
+
+    Le schede vengono lette a pagine tramite un ArchiveCursor (vedi repository.py): all'ingresso
+    solo la prima pagina, poi la successiva quando lo scorrimento si avvicina al fondo. In memoria
+    restano al massimo MAX_LOADED_PAGES pagine: quelle lontane dalla parte visibile vengono
+    scartate e rilette se si torna indietro.
+
+    La lista viene letta dall'archivio solo al primo ingresso: in seguito le modifiche arrivano
+    come eventi 'on_archive_change' dell'app e toccano solo la riga della scheda interessata.
+    Se il file dell'archivio è stato modificato da fuori, all'ingresso si ricarica tutto.
+
+    L'ordine delle righe (tocco sulle intestazioni delle colonne), la ricerca per nome/produttore
+    e i filtri su annata, gradazione e qualità vengono calcolati dall'ArchiveIndex del colore
+    (vedi archive_index.py).
+    """
 
-    def on_enter(self):
-        # Chiamato quando la schermata diventa attiva.
-        self.load_archive_data()
+    # Colore del vino e messaggio per l'archivio vuoto (definiti dalle sottoclassi)
+    WINE_COLOR = ''
+    EMPTY_TEXT = ''
+
+    # Schede per pagina e numero massimo di pagine tenute nella RecycleView
+    PAGE_SIZE = 50
+    MAX_LOADED_PAGES = 4
+
+    # Testo dei bottoni di intestazione (id 'ordina_<colonna>' nel KV)
+    SORT_LABELS = {'nome': 'Nome / Produttore', 'annata': 'Annata', 'alcol': 'Alcol', 'qualita': 'Qualità'}
+
+    # Secondi di attesa dopo l'ultima modifica ai filtri prima di riapplicarli
+    FILTER_DELAY = 0.3
+
+    # Titoli dei gruppi di descrittori nel popup del filtro (dallo schema della degustazione)
+    DESCRIPTOR_LABELS = {field: group.title for field, group in GROUPS.items()}
+
+    # Secondi dopo i quali il messaggio di esito viene cancellato
+    SAVE_STATUS_DURATION = 3.0
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Cursore sui doc_id dell'archivio (in ordine crescente) e posizione della prima
+        # riga caricata: archive_list.data contiene le righe da _window_start in poi.
+        self._cursor = None
+        self._window_start = 0
+        self._paging = False
+
+        # Ordinamento (colonna di SORT_LABELS, None = inserimento) e filtri attivi
+        self._order = None
+        self._descending = False
+        self._filters = {}
+        # Descrittori scelti nel popup: coppie (campo, valore), tutti (E) o almeno uno (O)
+        self._descriptor_terms = []
+        self._match_all_descriptors = True
+        self._filter_trigger = Clock.create_trigger(self.apply_filters, self.FILTER_DELAY)
+
+        App.get_running_app().bind(on_archive_change=self._on_archive_change)
+
+    def on_kv_post(self, base_widget):
+        super().on_kv_post(base_widget)
+        self.ids.archive_list.bind(scroll_y=self._on_list_scroll)
+
+    @traced(lambda screen: screen.WINE_COLOR)
+    def on_enter(self):
+        # Chiamato quando la schermata diventa attiva: ricarica solo se necessario.
+        db = App.get_running_app().get_archive(self.WINE_COLOR)
+        if self._cursor is None:
+            self.load_archive_data()
+        elif db.changed_on_disk():
+            print(f"Archivio {self.WINE_COLOR} modificato su disco: ricaricamento completo.")
+            App.get_running_app().reload_archive(self.WINE_COLOR)
+            self.load_archive_data()
+
+    @traced(lambda screen: screen.WINE_COLOR)
     def load_archive_data(self):
-        # Carica i dati dal database e popola il GridLayout.
-        app_red = App.get_running_app()
-        db_red = app_red.db_red  # Riferimento al TinyDB dei vini rossi
+        # Crea il cursore sull'archivio e carica nella RecycleView solo la prima pagina.
+        app = App.get_running_app()
+        db = app.get_archive(self.WINE_COLOR)  # Riferimento al repository del colore della schermata
 
-        # Svuota il contenitore prima di ricaricare (utile per i cambiamenti di schermo)
-        container = self.ids.archive_container
-        container.clear_widgets()
+        # I doc_id nell'ordine e con i filtri attuali (solo chiavi precalcolate, nessuna scheda letta)
+        doc_ids = app.get_archive_index(self.WINE_COLOR).query(self._order, self._descending, self._filters)
+        self._cursor = db.cursor(doc_ids, page_size=self.PAGE_SIZE)
+        self._window_start = 0
 
-        # Legge tutti i documenti dal database
-        all_wines = db_red.all()
+        # Una voce (dizionario) per riga: la RecycleView assegna questi valori alle proprietà
+        # della scheda riutilizzata (wine_data, card_doc_id), senza creare widget.
+        archive_list = self.ids.archive_list
+        archive_list.data = [self._card_view(wine_document) for wine_document in self._cursor.fetch(0)]
+        archive_list.scroll_y = 1
+        self._refresh_list()
 
-        if not all_wines:
-            container.add_widget(Label(text="Nessun vino rosso archiviato.",
-                                       size_hint_y=None, height=40,
-                                       color=(0.1, 0.1, 0.1, 1)))
+    # ----------------------------------------------------------------------
+    # PAGINE (caricamento durante lo scorrimento)
+    # ----------------------------------------------------------------------
+    @property
+    def _window_end(self):
+        return self._window_start + len(self.ids.archive_list.data)
+
+    def _on_list_scroll(self, archive_list, scroll_y):
+        if self._cursor is None or self._paging:
             return
 
-        # Passa l'indice della riga (i)
-        for i, wine_document in enumerate(all_wines):
-            # 1. Converti il Documento TinyDB in un normale dizionario
-            wine_data = dict(wine_document)
+        # Altezza del contenuto che non entra nello schermo, sopra e sotto la parte visibile
+        hidden = max(archive_list.layout_manager.height - archive_list.height, 0)
+        below = scroll_y * hidden
+        above = hidden - below
 
-            # 2. AGGIUNGI l'ID del documento (doc_id) al dizionario dei dati.
-            # Questo ID è cruciale per la funzione UPDATE.
-            wine_data['_id'] = wine_document.doc_id
+        # Carica la pagina successiva/precedente quando manca meno di uno schermo al bordo
+        if below < archive_list.height and self._window_end < len(self._cursor):
+            self._load_next_page()
+        elif above < archive_list.height and self._window_start > 0:
+            self._load_previous_page()
 
-            # 3. Crea e aggiungi il widget della scheda
-            card = RedWineCardItem(wine_data=wine_data, row_index=i, card_doc_id=wine_document.doc_id)
-            container.add_widget(card)
+    def _load_next_page(self):
+        views = [self._card_view(wine_document) for wine_document in self._cursor.fetch(self._window_end)]
 
+        def change(rows):
+            rows = rows + views
+            # Troppe righe in memoria: scarta le più lontane, in cima
+            excess = max(len(rows) - self.PAGE_SIZE * self.MAX_LOADED_PAGES, 0)
+            self._window_start += excess
+            return rows[excess:], -excess
 
-class WhiteArchiveScreen(Screen):
-    """Schermata della visualizzazione dell' 'archivio' dei vini bianchi."""
+        self._change_window(change)
 
-    def on_enter(self):
-        # Chiamato quando la schermata diventa attiva.
-        self.load_archive_data()
+    def _load_previous_page(self):
+        start = max(self._window_start - self.PAGE_SIZE, 0)
+        views = [self._card_view(wine_document) for wine_document in self._cursor.fetch(start, self._window_start)]
 
-    def load_archive_data(self):
-        # Carica i dati dal database e popola il GridLayout.
-        app_white = App.get_running_app()
-        db_white = app_white.db_white  # Riferimento al TinyDB dei vini bianchi
+        def change(rows):
+            rows = views + rows
+            self._window_start = start
+            # Troppe righe in memoria: scarta le più lontane, in fondo
+            return rows[:self.PAGE_SIZE * self.MAX_LOADED_PAGES], len(views)
 
-        # Svuota il contenitore prima di ricaricare (utile per i cambiamenti di schermo)
-        container = self.ids.archive_container
-        container.clear_widgets()
+        self._change_window(change)
 
-        # Legge tutti i documenti dal database
-        all_wines = db_white.all()
+    def _change_window(self, change):
+        """
+        change(righe) restituisce le nuove righe e quante ne ha aggiunte (o tolte, se negativo)
+        SOPRA la parte visibile: lo scorrimento viene riposizionato sulle stesse schede di prima.
+        """
+        archive_list = self.ids.archive_list
+        layout = archive_list.layout_manager
+        row_height = layout.default_size[1] + layout.spacing
 
-        if not all_wines:
-            container.add_widget(Label(text="Nessun vino bianco archiviato.",
-                                       size_hint_y=None, height=40,
-                                       color=(0.1, 0.1, 0.1, 1)))
-            return
+        # Distanza (in pixel) fra l'inizio del contenuto e la parte visibile
+        hidden = max(layout.height - archive_list.height, 0)
+        top = (1 - archive_list.scroll_y) * hidden
 
-        # Passa l'indice della riga (i)
-        for i, wine_document in enumerate(all_wines):
-            # 1. Converti il Documento TinyDB in un normale dizionario
-            wine_data = dict(wine_document)
-            # 2. AGGIUNGI l'ID del documento (doc_id) al dizionario dei dati.
-            # Questo ID è cruciale per la funzione UPDATE.
-            wine_data['_id'] = wine_document.doc_id
-            # 3. Crea e aggiungi il widget della scheda
-            card = WhiteWineCardItem(wine_data=wine_data, row_index=i, card_doc_id=wine_document.doc_id)
-            container.add_widget(card)
-
-class PinkArchiveScreen(Screen):
-    """Schermata della visualizzazione dell' 'archivio' dei vini rosati."""
+        self._paging = True
+        try:
+            archive_list.data, rows_above = change(list(archive_list.data))
+            self._refresh_list()
+
+            hidden = max(layout.height - archive_list.height, 0)
+            top += rows_above * row_height
+            archive_list.scroll_y = min(max(1 - top / hidden, 0), 1) if hidden else 1
+        finally:
+            self._paging = False
+
+    # ----------------------------------------------------------------------
+    # ORDINAMENTO E FILTRI
+    # ----------------------------------------------------------------------
+    def sort_by(self, field):
+        """Tocco su un'intestazione: ordina per quella colonna, o inverte l'ordine se è già attiva."""
+        if self._order == field:
+            self._descending = not self._descending
+        else:
+            self._order, self._descending = field, False
+
+        for name, label in self.SORT_LABELS.items():
+            arrow = (' v' if self._descending else ' ^') if name == self._order else ''
+            self.ids['ordina_' + name].text = label + arrow
 
-    def on_enter(self):
-        # Chiamato quando la schermata diventa attiva.
         self.load_archive_data()
 
-    def load_archive_data(self):
-        # Carica i dati dal database e popola il GridLayout.
-        app_pink = App.get_running_app()
-        db_pink = app_pink.db_pink  # Riferimento al TinyDB dei vini rosati
+    def schedule_filters(self, *args):
+        """Chiamato ad ogni modifica dei campi filtro: riapplica i filtri dopo una breve pausa."""
+        self._filter_trigger.cancel()
+        self._filter_trigger()
+
+    def apply_filters(self, *args):
+        """Legge i campi filtro (ricerca, annata da/a, alcol da/a, qualità minima) e ricarica la lista."""
+        self._filter_trigger.cancel()
+        ids = self.ids
+        quality = ids.filtro_qualita.text
+        self._filters = {
+            'testo': ids.filtro_testo.text.strip(),
+            'annata': (to_number(ids.filtro_annata_da.text, int), to_number(ids.filtro_annata_a.text, int)),
+            'alcol': (to_number(ids.filtro_alcol_da.text, float), to_number(ids.filtro_alcol_a.text, float)),
+            'qualita': quality if quality in QUALITY_SCALE else None,
+            'descrittori': list(self._descriptor_terms),
+            'tutti_i_descrittori': self._match_all_descriptors,
+        }
+        if self._cursor is not None:
+            self.load_archive_data()
+
+    def show_descriptor_filter(self):
+        """Popup con i descrittori presenti nell'archivio (indice invertito): si scelgono quelli
+        da cercare e se le schede devono averli tutti (E) o almeno uno (O)."""
+        FONT = 'materiale/comicbd.ttf'
+        COLORE_SFONDO_CHIARO = (0.98, 0.95, 0.90, 0.9)
+        COLORE_TESTO = (0.15, 0.15, 0.15, 1)
+        COLORE_SCELTO = (0.96, 0.96, 0.5, 1)  # Giallo chiaro, come i bottoni selezionati delle schede
+        COLORE_NON_SCELTO = (0.9, 0.9, 0.9, 0.7)
+
+        descriptors = App.get_running_app().get_archive_index(self.WINE_COLOR).descriptors
+        selected = set(self._descriptor_terms)
+
+        content = BoxLayout(orientation='vertical', padding=dp(12), spacing=dp(8))
+        content.add_widget(Label(text='Descrittori', size_hint_y=None, height=dp(30), font_size='18sp',
+                                 bold=True, font_name=FONT, color=COLORE_TESTO))
+
+        # 1. Un gruppo di bottoni per ogni campo, con il numero di schede per descrittore
+        groups = GridLayout(cols=1, spacing=dp(4), size_hint_y=None)
+        groups.bind(minimum_height=groups.setter('height'))
+        toggles = []
+        for field in TASTING_FIELDS:
+            values = descriptors.values(field)
+            if not values:
+                continue
+            groups.add_widget(Label(text=self.DESCRIPTOR_LABELS[field], size_hint_y=None, height=dp(24),
+                                    font_name=FONT, font_size='14sp', color=COLORE_TESTO))
+            grid = GridLayout(cols=2, spacing=dp(2), size_hint_y=None)
+            grid.bind(minimum_height=grid.setter('height'))
+            for value, count in values:
+                toggle = ToggleButton(text=f'{value} ({count})', font_name=FONT, font_size='11sp',
+                                      size_hint_y=None, height=dp(30), color=COLORE_TESTO,
+                                      background_normal='', background_down='',
+                                      state='down' if (field, value) in selected else 'normal')
+                toggle.term = (field, value)
+                toggle.background_color = COLORE_SCELTO if toggle.state == 'down' else COLORE_NON_SCELTO
+                toggle.bind(state=lambda button, state: setattr(
+                    button, 'background_color', COLORE_SCELTO if state == 'down' else COLORE_NON_SCELTO))
+                toggles.append(toggle)
+                grid.add_widget(toggle)
+            groups.add_widget(grid)
+
+        scroll = ScrollView(do_scroll_x=False)
+        scroll.add_widget(groups)
+        content.add_widget(scroll)
+
+        # 2. Modalità: tutti i descrittori (intersezione) o almeno uno (unione)
+        mode_box = BoxLayout(size_hint_y=None, height=dp(32), spacing=dp(4))
+        match_all = ToggleButton(text='Tutti (E)', group='modo_descrittori', font_name=FONT, allow_no_selection=False,
+                                 state='down' if self._match_all_descriptors else 'normal')
+        match_any = ToggleButton(text='Almeno uno (O)', group='modo_descrittori', font_name=FONT,
+                                 allow_no_selection=False,
+                                 state='normal' if self._match_all_descriptors else 'down')
+        mode_box.add_widget(match_all)
+        mode_box.add_widget(match_any)
+        content.add_widget(mode_box)
+
+        # 3. Bottoni
+        button_box = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(8))
+        btn_apply = RoundedButton(text='Applica', font_name=FONT, background_color=(0.1, 0.7, 0.1, 1))
+        btn_clear = RoundedButton(text='Azzera', font_name=FONT, background_color=(0.7, 0.1, 0.1, 1))
+        button_box.add_widget(btn_apply)
+        button_box.add_widget(btn_clear)
+        content.add_widget(button_box)
+
+        with content.canvas.before:
+            Color(rgba=COLORE_SFONDO_CHIARO)
+            rect = RoundedRectangle(pos=content.pos, size=content.size, radius=[(15, 15) for _ in range(4)])
+            content.bind(pos=lambda instance, value: setattr(rect, 'pos', value),
+                         size=lambda instance, value: setattr(rect, 'size', value))
+
+        popup = Popup(title='', content=content, size_hint=(0.9, 0.85), background='',
+                      background_color=(0, 0, 0, 0), separator_color=(0, 0, 0, 0), title_size='0sp')
+
+        def apply(terms, all_terms):
+            self._descriptor_terms = terms
+            self._match_all_descriptors = all_terms
+            self.ids.filtro_descrittori.text = f'Descrittori ({len(terms)})' if terms else 'Descrittori'
+            popup.dismiss()
+            self.apply_filters()
+
+        btn_apply.bind(on_release=lambda x: apply([t.term for t in toggles if t.state == 'down'],
+                                                  match_all.state == 'down'))
+        btn_clear.bind(on_release=lambda x: apply([], True))
+        popup.open()
 
-        # Svuota il contenitore prima di ricaricare (utile per i cambiamenti di schermo)
-        container = self.ids.archive_container
-        container.clear_widgets()
+    # ----------------------------------------------------------------------
+    # MODIFICHE INCREMENTALI
+    # ----------------------------------------------------------------------
+    def _on_archive_change(self, app, wine_color, change, doc_id, record):
+        if wine_color == self.WINE_COLOR:
+            self.apply_archive_change(doc_id, record)
+
+    def release(self):
+        """Prima del rilascio della schermata (vedi LazyScreenManager): si stacca dagli eventi dell'app."""
+        App.get_running_app().unbind(on_archive_change=self._on_archive_change)
 
-        # Legge tutti i documenti dal database
-        all_wines = db_pink.all()
+    def apply_archive_change(self, doc_id, record):
+        """
+        Applica alla lista una sola modifica: record è la scheda salvata, None se eliminata.
+        L'operazione è idempotente (una scheda già presente viene aggiornata, una già
+        assente ignorata), quindi è corretta anche se load_archive_data l'ha già letta.
+        """
+        if self._cursor is None:
+            # Mai visitata: il primo ingresso leggerà l'archivio
+            return
 
-        if not all_wines:
-            container.add_widget(Label(text="Nessun vino rosato archiviato.",
-                                       size_hint_y=None, height=40,
-                                       color=(0.1, 0.1, 0.1, 1)))
+        # L'indice del colore è già aggiornato (vedi WineApp._on_archive_written)
+        index = App.get_running_app().get_archive_index(self.WINE_COLOR)
+        cursor = self._cursor
+        data = self.ids.archive_list.data
+
+        # 1. Toglie la riga dalla posizione vecchia (se c'era)
+        old_position = cursor.remove(doc_id)
+
+        # 2. La rimette nella posizione data dalle chiavi nuove, se rispetta ancora i filtri
+        new_position = None
+        if record is not None and index.matches(doc_id, self._filters):
+            new_position = index.locate(cursor.doc_ids, doc_id, self._order, self._descending)
+
+        start, end = self._window_start, self._window_end
+        if old_position is not None and old_position == new_position:
+            # Stessa posizione: si aggiorna solo il contenuto della riga, se è caricata
+            cursor.insert(new_position, doc_id)
+            if start <= new_position < end:
+                data[new_position - start] = self._card_view(record)
+        else:
+            if old_position is not None:
+                if old_position < start:
+                    self._window_start -= 1
+                elif old_position < end:
+                    del data[old_position - start]
+                start, end = self._window_start, self._window_end
+
+            if new_position is not None:
+                # Una riga è visibile subito solo se cade dentro le pagine caricate
+                # (o in fondo, quando l'ultima pagina è già caricata)
+                loaded_to_end = end == len(cursor)
+                cursor.insert(new_position, doc_id)
+                if new_position < start:
+                    self._window_start += 1
+                elif new_position < end or loaded_to_end:
+                    data.insert(new_position - start, self._card_view(record))
+
+        self._refresh_list()
+
+    def _refresh_list(self):
+        self.ids.empty_label.text = self.EMPTY_TEXT if not self._cursor else ''
+        archive_list = self.ids.archive_list
+        # Posizione nell'archivio della prima riga caricata (colori alternati, vedi WineCardViewBehavior)
+        archive_list.row_offset = self._window_start
+        # La RecycleView aggiornerebbe le righe solo al prossimo ridisegno della finestra:
+        # a schermata ferma (fine transizione) la lista resterebbe vuota fino al primo tocco.
+        archive_list.refresh_views()
+
+    @staticmethod
+    def _card_view(wine_document):
+        """Voce della RecycleView per una scheda dell'archivio."""
+        # 1. Converti il Documento in un normale dizionario
+        wine_data = dict(wine_document)
+
+        # 2. AGGIUNGI l'ID del documento (doc_id) al dizionario dei dati.
+        # Questo ID è cruciale per la funzione UPDATE.
+        wine_data['_id'] = wine_document.doc_id
+        return {'wine_data': wine_data, 'card_doc_id': wine_document.doc_id}
+
+    def show_save_status(self, text, error=False):
+        """Mostra 'text' nella Label 'save_status' in fondo all'archivio e lo cancella dopo qualche secondo."""
+        label = self.ids.get('save_status')
+        if label is None:
             return
 
-        # Passa l'indice della riga (i)
-        for i, wine_document in enumerate(all_wines):
-            # 1. Converti il Documento TinyDB in un normale dizionario
-            wine_data = dict(wine_document)
+        label.text = text
+        label.color = (0.7, 0.1, 0.1, 1) if error else (0.1, 0.1, 0.1, 1)
+
+        # Un solo timer per schermata: un nuovo messaggio riparte da zero
+        if not hasattr(self, '_clear_status_trigger'):
+            self._clear_status_trigger = Clock.create_trigger(self._clear_save_status, self.SAVE_STATUS_DURATION)
+        self._clear_status_trigger.cancel()
+        self._clear_status_trigger()
 
-            # 2. AGGIUNGI l'ID del documento (doc_id) al dizionario dei dati.
-            # Questo ID è cruciale per la funzione UPDATE.
-            wine_data['_id'] = wine_document.doc_id
+    def _clear_save_status(self, *args):
+        self.ids.save_status.text = ''
+
+
+class RedArchiveScreen(ArchiveScreen):
+    """Schermata della visualizzazione dell' 'archivio' dei vini rossi."""
+    WINE_COLOR = 'rosso'
+    EMPTY_TEXT = "Nessun vino rosso archiviato."
 
-            # 3. Crea e aggiungi il widget della scheda
-            card = PinkWineCardItem(wine_data=wine_data, row_index=i, card_doc_id=wine_document.doc_id)
-            container.add_widget(card)
+
+class WhiteArchiveScreen(ArchiveScreen):
+    """Schermata della visualizzazione dell' 'archivio' dei vini bianchi."""
+    WINE_COLOR = 'bianco'
+    EMPTY_TEXT = "Nessun vino bianco archiviato."
+
+
+class PinkArchiveScreen(ArchiveScreen):
+    """Schermata della visualizzazione dell' 'archivio' dei vini rosati."""
+    WINE_COLOR = 'rosato'
+    EMPTY_TEXT = "Nessun vino rosato archiviato."
+
+
+# Schermata di archivio di ogni colore
+ARCHIVE_SCREENS = {'rosso': RedArchiveScreen, 'bianco': WhiteArchiveScreen, 'rosato': PinkArchiveScreen}
 
 # ==============================================================================
 # CLASSE APPLICAZIONE E SCREEN MANAGER
@@ -1255,54 +1503,318 @@ class PinkArchiveScreen(Screen):
 
 class WineApp(App):
     # Proprietà per lo sfondo. Non usata in questo setup, ma utile per il futuro.
-    sfondo_principale = StringProperty("materiale/iniziale.png")
-
-    # Questo dizionario memorizzerà le selezioni dell'utente
-    selections = {}
-    db_red = None  # Aggiungiamo un riferimento al database per i rossi
-    db_white = None  # Aggiungiamo un riferimento al database per i bianchi
-    db_pink = None  # Aggiungiamo un riferimento al database per i rosati
+    sfondo_principale = StringProperty("atlas://materiale/atlas/benvenuto/iniziale")
+
+    # Selezioni dell'utente (SelectionModel, creato in build): si usa come un dizionario
+    # chiave DB -> testo o lista di testi, e notifica i cambi per gruppo alle schermate
+    selections = None
+
+    # Backend degli archivi: 'sqlite' (indicizzato) oppure 'tinydb' (file JSON storici).
+    # Alla prima apertura con 'sqlite' le schede dei file JSON vengono migrate automaticamente.
+    ARCHIVE_BACKEND = 'sqlite'
+
+    # Gli archivi vengono aperti solo al primo utilizzo (vedi get_archive). Se PREWARM_ARCHIVES
+    # è True, mentre è visibile la WelcomeScreen un thread li apre e ne legge le schede in anticipo.
+    PREWARM_ARCHIVES = True
+
+    # Se PRELOAD_ASSETS è True, durante la WelcomeScreen vengono decodificati in background gli atlanti
+    # delle immagini (nell'ordine di PRELOAD_ATLASES: prima le schermate più vicine nella navigazione)
+    # e preparate le dimensioni del font della degustazione (vedi asset_preloader.py)
+    PRELOAD_ASSETS = True
+    PRELOAD_ATLASES = ('materiale/atlas/comune', 'materiale/atlas/selezione') + tuple(
+        'materiale/atlas/' + wine_color for wine_color in ARCHIVE_FILES)
+
+    # Scrittura differita: le modifiche vengono portate su disco dopo WRITE_BEHIND_DELAY secondi
+    # di inattività (oltre che in pausa e alla chiusura). Al massimo MAX_UNFLUSHED_CARDS schede
+    # salvate/eliminate restano solo in memoria: oltre questo limite il salvataggio è immediato.
+    WRITE_BEHIND_DELAY = 2.0
+    MAX_UNFLUSHED_CARDS = 5
+
+    # Le schermate vengono create alla prima navigazione (vedi LazyScreenManager). Restano in memoria
+    # quelle di al massimo MAX_RESIDENT_COLORS colori: le schermate (degustazione, INFO e archivio)
+    # del colore usato meno di recente vengono rilasciate, tranne durante una degustazione in corso.
+    # None = nessun rilascio.
+    MAX_RESIDENT_COLORS = 2
+
+    # Se PROFILE_STARTUP è True (o con la variabile d'ambiente WINEAPP_STARTUP_PROFILE), al primo frame
+    # disegnato vengono scritti i tempi delle fasi dell'avvio, della costruzione delle schermate e
+    # dell'apertura degli archivi (report JSON + riepilogo, vedi startup_profile.py)
+    PROFILE_STARTUP = False
+
+    # Evento emesso dopo ogni scrittura riuscita su un archivio (vedi _on_archive_written)
+    __events__ = ('on_archive_change',)
+
+    # Testo del messaggio di esito per ogni tipo di modifica ("Scheda salvata", ...)
+    ARCHIVE_CHANGE_LABELS = {'insert': 'salvata', 'update': 'salvata', 'remove': 'eliminata'}
 
     # NUOVA PROPRIETÀ per tracciare l'ID del record da aggiornare
     # Usiamo NumericProperty con allownone=True per gestire il valore None (nessuna modifica attiva)
     card_to_update_id = NumericProperty(None, allownone=True)
 
+    def load_kv(self, filename=None):
+        """
+        All'avvio vengono caricati solo i KV dei widget condivisi (kv/widgets): quelli di
+        ogni schermata (kv/screens) vengono caricati alla sua creazione, vedi build().
+        """
+        self.kv_loader = KvLoader()
+        self.kv_loader.load_shared()
+        PROFILER.mark('kv condivisi')
+        return True
+
     def build(self):
-        # Inizializza il database. Verrà creato un file db.json nella cartella principale.
-        self.db_red = TinyDB('red_wine_database.json')
-        self.db_white = TinyDB('white_wine_database.json')
-        self.db_pink = TinyDB('pink_wine_database.json')
+        # Il modello delle selezioni va creato PRIMA delle schermate, che vi si registrano in on_kv_post
+        self.selections = SelectionModel()
+
+        # Gli archivi (un repository per colore, vedi repository.py) NON vengono aperti qui:
+        # get_archive() li apre al primo accesso. Un lock per colore evita doppie aperture
+        # quando il thread di pre-caricamento e l'interfaccia chiedono lo stesso archivio.
+        self._archives = {}
+        self._archive_indexes = {}
+        self._archive_locks = {wine_color: threading.Lock() for wine_color in ARCHIVE_FILES}
+        self._prewarm_thread = None
+
+        # Dimensioni del font nella degustazione: etichette (16) e bottoni di navigazione (24) dei KV,
+        # bottoni dei colori e dei gruppi, titoli delle colonne
+        font_sizes = [16, 24] + [theme.font_size for theme in THEMES.values()] + [
+            size for group in GROUPS.values()
+            for size in (group.font_size, group.small_font_size, group.font_size and group.font_size + 1) if size]
+        self.asset_preloader = AssetPreloader(self.PRELOAD_ATLASES, 'materiale/comicbd.ttf', dict.fromkeys(font_sizes))
+
+        # Timer (debounce) per il flush degli archivi dopo un salvataggio o un'eliminazione
+        self._flush_trigger = Clock.create_trigger(self.flush_archives, self.WRITE_BEHIND_DELAY)
+
+        # Thread unico per insert/update/remove/flush: le operazioni vengono eseguite nell'ordine
+        # di invio e l'esito torna sul thread di Kivy tramite Clock.schedule_once.
+        self.archive_writer = ArchiveWriter(dispatch=lambda callback: Clock.schedule_once(lambda dt: callback()))
 
         # Inizializza lo ScreenManager
-        sm = ScreenManager(transition=FadeTransition())
-
-        # Aggiungi le schermate con i loro nomi per la navigazione
-        sm.add_widget(WelcomeScreen(name='welcome'))
-        sm.add_widget(WineSelectionScreen(name='selection'))
-        sm.add_widget(RedWineViewScreen(name='vista_rosso'))
-        sm.add_widget(RedWineNoseScreen(name='naso_rosso'))
-        sm.add_widget(RedWineTasteScreen(name='palato_rosso'))
-        sm.add_widget(RedWineEpilogueScreen(name='conclusioni_rosso'))
-        sm.add_widget(RedWineInfoScreen(name='info_rosso'))
-        sm.add_widget(WhiteWineViewScreen(name='vista_bianco'))
-        sm.add_widget(WhiteWineNoseScreen(name='naso_bianco'))
-        sm.add_widget(WhiteWineTasteScreen(name='palato_bianco'))
-        sm.add_widget(WhiteWineEpilogueScreen(name='conclusioni_bianco'))
-        sm.add_widget(WhiteWineInfoScreen(name='info_bianco'))
-        sm.add_widget(PinkWineViewScreen(name='vista_rosato'))
-        sm.add_widget(PinkWineNoseScreen(name='naso_rosato'))
-        sm.add_widget(PinkWineTasteScreen(name='palato_rosato'))
-        sm.add_widget(PinkWineEpilogueScreen(name='conclusioni_rosato'))
-        sm.add_widget(PinkWineInfoScreen(name='info_rosato'))
-        sm.add_widget(RedArchiveScreen(name='archivio_rosso'))
-        sm.add_widget(WhiteArchiveScreen(name='archivio_bianco'))
-        sm.add_widget(PinkArchiveScreen(name='archivio_rosato'))
+        sm = LazyScreenManager(transition=FadeTransition(), max_resident_groups=self.MAX_RESIDENT_COLORS)
+        sm.can_release_group = self._can_release_color
+        sm.kv_loader = self.kv_loader
+        sm.profiler = PROFILER
+
+        # Registra le schermate con i loro nomi per la navigazione e i loro file KV: vengono
+        # create (e i KV caricati) al primo utilizzo
+        sm.register('welcome', partial(WelcomeScreen, name='welcome'), kv_files=['screens/welcome.kv'])
+        sm.register('selection', partial(WineSelectionScreen, name='selection'), kv_files=['screens/selection.kv'])
+        # Per ogni colore (gruppo per il rilascio): le fasi della degustazione (generate dallo
+        # schema), la scheda INFO e l'archivio
+        for wine_color, info_screen_class in INFO_SCREENS.items():
+            for phase_name in PHASE_NAMES:
+                sm.register(phase_name + '_' + wine_color,
+                            partial(TastingScreen, phase=phase_name, wine_color=wine_color), wine_color,
+                            kv_files=['screens/tasting.kv'])
+            sm.register('info_' + wine_color, partial(info_screen_class, name='info_' + wine_color), wine_color,
+                        kv_files=[f'screens/info_{wine_color}.kv'])
+            sm.register('archivio_' + wine_color,
+                        partial(ARCHIVE_SCREENS[wine_color], name='archivio_' + wine_color), wine_color,
+                        kv_files=ARCHIVE_KV + (f'screens/archivio_{wine_color}.kv',))
+        sm.current = 'welcome'
 
         # 1. Abilita la gestione dell'hardware back button (per Android/Linux)
         Window.bind(on_keyboard=self.on_key_down)
 
+        PROFILER.mark('build')
         return sm
 
+    def on_start(self):
+        # Tempo di parsing KV speso all'avvio e file rimandati alla prima apertura delle schermate
+        self.kv_loader.startup_done()
+        PROFILER.mark('on_start')
+        Window.bind(on_flip=self._on_first_frame)
+
+    def _on_first_frame(self, window):
+        """Chiude il profilo di avvio al primo frame disegnato (e ne scrive il report se richiesto)."""
+        window.unbind(on_flip=self._on_first_frame)
+        PROFILER.mark('primo frame')
+        PROFILER.finish(report_path(self.PROFILE_STARTUP))
+
+    def _can_release_color(self, wine_color):
+        """Le schermate di un colore con una degustazione in corso (selezioni o campi INFO) restano in memoria."""
+        suffix = '_' + wine_color
+        if any(group.endswith(suffix) for group, _ in self.selections.items()):
+            return False
+        info_screen = self.root.peek_screen('info' + suffix)
+        return info_screen is None or all(
+            info_screen.ids[field + suffix].text in ('', 'Gradazione alcolica') for field in INFO_FIELDS)
+
+    # ----------------------------------------------------------------------
+    # APERTURA "LAZY" DEGLI ARCHIVI
+    # ----------------------------------------------------------------------
+    def get_archive(self, wine_color):
+        """Restituisce il repository del colore indicato, aprendolo al primo utilizzo."""
+        db = self._archives.get(wine_color)
+        if db is not None:
+            return db
+
+        with self._archive_locks[wine_color]:
+            # Ricontrolla: l'archivio potrebbe essere stato aperto dal thread di pre-caricamento
+            db = self._archives.get(wine_color)
+            if db is None:
+                db = self._open_archive(wine_color)
+        return db
+
+    def get_archive_index(self, wine_color):
+        """Restituisce l'indice (ordinamento e filtri) del colore indicato, aprendo l'archivio se serve."""
+        self.get_archive(wine_color)
+        return self._archive_indexes[wine_color]
+
+    def _open_archive(self, wine_color):
+        """
+        Apre l'archivio e ne costruisce l'indice leggendo una volta tutte le schede.
+        Va chiamato con il lock del colore: l'indice viene pubblicato PRIMA dell'archivio,
+        così chi trova l'archivio aperto (es. il thread di scrittura) trova anche l'indice.
+        """
+        with PROFILER.measure(wine_color, 'archivio'):
+            db = open_repository(wine_color, self.ARCHIVE_BACKEND, max_pending=self.MAX_UNFLUSHED_CARDS)
+            self._archive_indexes[wine_color] = ArchiveIndex(wine_color, db.all())
+        self._archives[wine_color] = db
+        self._upgrade_archive(wine_color)
+        return db
+
+    def _upgrade_archive(self, wine_color, after_doc_id=0):
+        """
+        Riscrive in background, un blocco alla volta sul thread di salvataggio, le schede
+        salvate con uno schema precedente (in memoria sono già aggiornate dal codec).
+        Fra un blocco e l'altro possono passare i salvataggi fatti dall'utente.
+        """
+        db = self._archives[wine_color]
+        self.archive_writer.submit(partial(db.upgrade_records, after_doc_id),
+                                   partial(self._on_archive_upgraded, wine_color))
+
+    def _on_archive_upgraded(self, wine_color, next_doc_id, error):
+        if error is None and next_doc_id is not None:
+            self._upgrade_archive(wine_color, next_doc_id)
+
+    def reload_archive(self, wine_color):
+        """Rilegge dal disco un archivio modificato da fuori e ne ricostruisce l'indice."""
+        with self._archive_locks[wine_color]:
+            db = self._archives[wine_color]
+            db.reload()
+            self._archive_indexes[wine_color] = ArchiveIndex(wine_color, db.all())
+
+    @property
+    def db_red(self):
+        return self.get_archive('rosso')
+
+    @property
+    def db_white(self):
+        return self.get_archive('bianco')
+
+    @property
+    def db_pink(self):
+        return self.get_archive('rosato')
+
+    def prewarm_archives(self):
+        """Avvia (una sola volta) il thread che apre gli archivi e ne legge le schede in anticipo."""
+        if not self.PREWARM_ARCHIVES or self._prewarm_thread is not None:
+            return
+
+        self._prewarm_thread = threading.Thread(target=self._prewarm_worker, daemon=True)
+        self._prewarm_thread.start()
+
+    def preload_assets(self):
+        """Avvia (una sola volta) il pre-caricamento di immagini e font delle prossime schermate."""
+        if self.PRELOAD_ASSETS:
+            self.asset_preloader.start()
+
+    def _prewarm_worker(self):
+        for wine_color in ARCHIVE_FILES:
+            with self._archive_locks[wine_color]:
+                if wine_color in self._archives:
+                    continue
+                try:
+                    # Legge tutte le schede per l'indice: riempie anche la cache (TinyDB)
+                    # o la cache del file (SQLite)
+                    self._open_archive(wine_color)
+                except Exception as e:
+                    print(f"ERRORE PRE-CARICAMENTO ARCHIVIO {wine_color}: {e}")
+
+    # ----------------------------------------------------------------------
+    # CICLO DI VITA E SCRITTURA DIFFERITA DEGLI ARCHIVI
+    # ----------------------------------------------------------------------
+    def on_pause(self):
+        """Android: l'app va in background e potrebbe essere chiusa dal sistema, salva subito."""
+        self.flush_archives()
+        # Attende il thread di scrittura: le modifiche devono essere su disco prima della pausa
+        self.archive_writer.wait()
+        return True  # True = l'app può andare in pausa invece di essere terminata
+
+    def on_resume(self):
+        pass
+
+    def on_stop(self):
+        """Chiusura dell'app: scrive le modifiche in sospeso e chiude gli archivi."""
+        self._flush_trigger.cancel()
+        # Esegue le operazioni ancora in coda (salvataggi, eliminazioni) e ferma il thread di scrittura
+        self.archive_writer.stop()
+        # Chiude solo gli archivi effettivamente aperti (senza aprire quelli mai usati)
+        for wine_color in ARCHIVE_FILES:
+            with self._archive_locks[wine_color]:
+                db = self._archives.pop(wine_color, None)
+                if db is not None:
+                    db.close()
+        if TRACER.enabled:
+            TRACER.export_chrome(trace_path())
+
+    def schedule_archive_flush(self):
+        """(Ri)avvia il timer di flush: il disco viene aggiornato solo dopo una pausa nelle modifiche."""
+        self._flush_trigger.cancel()
+        self._flush_trigger()
+
+    def flush_archives(self, *args):
+        """Accoda al thread di scrittura il flush di tutti gli archivi aperti con modifiche in sospeso."""
+        for db in list(self._archives.values()):
+            if db.pending:
+                self.archive_writer.submit(db.flush)
+
+    def submit_archive_write(self, wine_color, change, doc_id=None, record=None):
+        """
+        Accoda sul thread di scrittura una modifica all'archivio del colore indicato.
+        change: 'insert' (record), 'update' (doc_id, record) oppure 'remove' (doc_id).
+        """
+        self.archive_writer.submit(partial(self._write_card, wine_color, change, doc_id, record),
+                                   partial(self._on_archive_written, wine_color, change))
+
+    def _write_card(self, wine_color, change, doc_id, record):
+        """Eseguito sul thread di scrittura: applica la modifica e restituisce (doc_id, scheda salvata)."""
+        db = self.get_archive(wine_color)
+        if change == 'insert':
+            doc_id = db.insert(record)
+        elif change == 'update':
+            db.update(doc_id, record)
+        else:
+            db.remove(doc_id)
+            return doc_id, None
+        # Rilegge la scheda: per un update è il risultato dell'unione dei campi
+        return doc_id, db.get(doc_id)
+
+    def _on_archive_written(self, wine_color, change, result, error):
+        """Esito di una scrittura (sul thread di Kivy): notifica la modifica e pianifica il flush."""
+        action = self.ARCHIVE_CHANGE_LABELS[change]
+        archive_screen_name = f'archivio_{wine_color}'
+        # Solo se la schermata esiste già: non viene creata per mostrare l'esito
+        screen_instance = self.root.peek_screen(archive_screen_name)
+
+        if error is not None:
+            if screen_instance is not None:
+                screen_instance.show_save_status(f"Errore: scheda non {action}", error=True)
+            return
+
+        self.schedule_archive_flush()
+        if screen_instance is not None:
+            screen_instance.show_save_status(f"Scheda {action}")
+
+        # Prima l'indice, poi le schermate di archivio, che applicano solo questa modifica
+        # (vedi ArchiveScreen.apply_archive_change) usando le chiavi già aggiornate
+        doc_id, record = result
+        self._archive_indexes[wine_color].apply_change(doc_id, record)
+        self.dispatch('on_archive_change', wine_color, change, doc_id, record)
+
+    def on_archive_change(self, wine_color, change, doc_id, record):
+        """Evento: una scheda è stata inserita/aggiornata/eliminata (record è None se eliminata)."""
+        pass
+
     # metodo on_key_down
     def on_key_down(self, window, key, *args):
         """Gestisce l'evento di pressione dei tasti, in particolare il tasto 'Back' (27)."""
@@ -1436,22 +1948,21 @@ class WineApp(App):
         # 5. Mostra il popup
         confirm_popup.open()
 
+    @traced(lambda app, wine_color, *args: wine_color)
     def confirm_and_save(self, wine_color, info_screen, popup_instance):
         """Esegue il salvataggio (INSERT) o l'aggiornamento (UPDATE) per il vino specifico e chiude il popup."""
 
         # Chiude il popup
         popup_instance.dismiss()
 
-        # 0. Seleziona il DB corretto e definisci la destinazione di navigazione
+        # 0. Definisci la destinazione di navigazione
+        #    (l'archivio viene scelto dal thread di scrittura, vedi submit_archive_write)
         if wine_color == 'rosso':
-            db = self.db_red
             archive_screen_name = 'archivio_rosso'
         elif wine_color == 'bianco':
-            db = self.db_white
             archive_screen_name = 'archivio_bianco'
         else:
             # Assumendo che 'pink' o 'rosato' sia il caso rimanente
-            db = self.db_pink
             archive_screen_name = 'archivio_rosato'  # O 'archivio_rosato', a seconda del KV
 
         selections = self.selections.copy()
@@ -1460,41 +1971,29 @@ class WineApp(App):
         wine_card_ordered = {}
 
         # 2. Campi della SCHEDA INFO (Priorità)
-        wine_card_ordered['nome_' + wine_color] = info_screen.ids['nome_' + wine_color].text
-        wine_card_ordered['produttore_' + wine_color] = info_screen.ids['produttore_' + wine_color].text
-        wine_card_ordered['annata_' + wine_color] = info_screen.ids['annata_' + wine_color].text
-        # Qui è meglio salvare la stringa attuale dello spinner, anche se è il placeholder
-        wine_card_ordered['alcol_' + wine_color] = info_screen.ids['alcol_' + wine_color].text
-        # AGGIUNGI QUI IL CAMPO NOTE PERSONALI SE ESISTE:
-        # wine_card_ordered['note_personali'] = info_screen.ids['note_' + wine_color].text
-
-        # 3. Campi delle ALTRE SCHEDE
-        wine_card_ordered['limpidezza_' + wine_color] = selections.get('limpidezza_' + wine_color, '')
-        wine_card_ordered['intensita_vista_' + wine_color] = selections.get('intensita_vista_' + wine_color, '')
-        wine_card_ordered['colore_' + wine_color] = selections.get('colore_' + wine_color, '')
-        wine_card_ordered['condizione_' + wine_color] = selections.get('condizione_' + wine_color, '')
-        wine_card_ordered['intensita_naso_' + wine_color] = selections.get('intensita_naso_' + wine_color, '')
-        wine_card_ordered['profumo_' + wine_color] = selections.get('profumo_' + wine_color, '')
-        wine_card_ordered['dolcezza_' + wine_color] = selections.get('dolcezza_' + wine_color, '')
-        wine_card_ordered['acidita_' + wine_color] = selections.get('acidita_' + wine_color, '')
-        wine_card_ordered['tannicita_' + wine_color] = selections.get('tannicita_' + wine_color, '')
-        wine_card_ordered['livello_alcolico_' + wine_color] = selections.get('livello_alcolico_' + wine_color, '')
-        wine_card_ordered['corpo_' + wine_color] = selections.get('corpo_' + wine_color, '')
-        wine_card_ordered['sapore_' + wine_color] = selections.get('sapore_' + wine_color, '')
-        wine_card_ordered['persistenza_' + wine_color] = selections.get('persistenza_' + wine_color, '')
-        wine_card_ordered['qualita_' + wine_color] = selections.get('qualita_' + wine_color, '')
+        #    Per l'alcol si salva la stringa attuale dello spinner, anche se è il placeholder
+        for field in INFO_FIELDS:
+            wine_card_ordered[field + '_' + wine_color] = info_screen.ids[field + '_' + wine_color].text
+        # PER AGGIUNGERE UN CAMPO (es. note personali): in coda a RECORD_FIELDS in record_format,
+        # aumentando SCHEMA_VERSION e registrando la migrazione per le schede già salvate.
+
+        # 3. Campi delle ALTRE SCHEDE, nell'ordine dello schema della degustazione
+        for field in TASTING_FIELDS:
+            wine_card_ordered[field + '_' + wine_color] = selections.get(field + '_' + wine_color, '')
 
         # =========================================================================
         # 4. LOGICA AGGIORNAMENTO / INSERIMENTO
         # =========================================================================
+        # La scrittura avviene sul thread di salvataggio: navigazione e reset dei campi
+        # sono immediati, l'esito viene mostrato dall'archivio (vedi _on_archive_written).
         if self.card_to_update_id is not None:
             # --- MODALITÀ DI AGGIORNAMENTO (UPDATE) ---
             doc_id = self.card_to_update_id
 
-            # Esegue l'aggiornamento nel DB utilizzando l'ID del documento
-            db.update(wine_card_ordered, doc_ids=[doc_id])
+            # Accoda l'aggiornamento nel DB utilizzando l'ID del documento
+            self.submit_archive_write(wine_color, 'update', doc_id, wine_card_ordered)
 
-            print(f"Scheda ID {doc_id} aggiornata con successo per vino: {wine_color}")
+            print(f"Scheda ID {doc_id} in aggiornamento per vino: {wine_color}")
 
             # Resetta lo stato di modifica
             self.card_to_update_id = None
@@ -1504,10 +2003,9 @@ class WineApp(App):
 
         else:
             # --- MODALITÀ DI INSERIMENTO NUOVA SCHEDA (INSERT) ---
-            db.insert(wine_card_ordered)
+            self.submit_archive_write(wine_color, 'insert', record=wine_card_ordered)
 
-            print("Scheda salvata con successo per vino:", wine_color)
-            print(json.dumps(wine_card_ordered, indent=4))
+            print("Scheda in salvataggio per vino:", wine_color)
 
             # Naviga verso la schermata di scelta vino 'selection' (logica originale)
             self.root.current = 'selection'
@@ -1531,60 +2029,10 @@ class WineApp(App):
         # Resetta i bottoni e le selezioni
         self.reset_all_selections(wine_color)
 
-    # Definisci il colore deselezionato in un punto accessibile, o direttamente qui:
-    #COLOR_DESELECTED_APP = (0.9, 0.9, 0.9, 0.7)
-
     def reset_all_selections(self, colore_del_vino):
-        # Resetta il dizionario delle selezioni
-        self.selections = {}
-
-        # Resetta i bottoni di ogni scheda in modo pulito
-        # VISTA
-        view_screen = self.root.get_screen('vista_' + colore_del_vino)
-        if view_screen:
-            for box_id in ['limpidezza_' + colore_del_vino + '_box', 'intensita_vista_' + colore_del_vino + '_box',
-                           'colore_' + colore_del_vino + '_box']:
-                if box_id in view_screen.ids:
-                    box = view_screen.ids[box_id]
-                    for btn in box.children:
-                        # Usa la costante di colore
-                        btn.background_color = (0.9, 0.9, 0.9, 0.7)
-
-        # NASO
-        nose_screen = self.root.get_screen('naso_' + colore_del_vino)
-        if nose_screen:
-            for box_id in ['condizione_' + colore_del_vino + '_box', 'intensita_naso_' + colore_del_vino + '_box',
-                           'profumo_primari_' + colore_del_vino + '_box', 'profumo_secondari_' + colore_del_vino + '_box',
-                           'profumo_terzari_' + colore_del_vino + '_box']:
-                if box_id in nose_screen.ids:
-                    box = nose_screen.ids[box_id]
-                    for btn in box.children:
-                        # Usa la costante di colore
-                        btn.background_color = (0.9, 0.9, 0.9, 0.7)
-
-        # PALATO
-        taste_screen = self.root.get_screen('palato_' + colore_del_vino)
-        if taste_screen:
-            for box_id in ['dolcezza_' + colore_del_vino + '_box', 'acidita_' + colore_del_vino + '_box',
-                           'tannicita_' + colore_del_vino + '_box', 'livello_alcolico_' + colore_del_vino + '_box',
-                           'corpo_' + colore_del_vino + '_box', 'sapore_primari_' + colore_del_vino + '_box',
-                           'sapore_secondari_' + colore_del_vino + '_box', 'sapore_terzari_' + colore_del_vino + '_box',
-                           'persistenza_' + colore_del_vino + '_box']:
-                if box_id in taste_screen.ids:
-                    box = taste_screen.ids[box_id]
-                    for btn in box.children:
-                        # Usa la costante di colore
-                        btn.background_color = (0.9, 0.9, 0.9, 0.7)
-
-        # CONCLUSIONI
-        epilogue_screen = self.root.get_screen('conclusioni_' + colore_del_vino)
-        if epilogue_screen:
-            for box_id in ['qualita_' + colore_del_vino + '_box']:
-                if box_id in epilogue_screen.ids:
-                    box = epilogue_screen.ids[box_id]
-                    for btn in box.children:
-                        # Usa la costante di colore
-                        btn.background_color = (0.9, 0.9, 0.9, 0.7)
+        # Resetta le selezioni: le schermate (VISTA, NASO, PALATO, CONCLUSIONI) ricevono la
+        # notifica solo per i gruppi che avevano una selezione e spengono quei bottoni
+        self.selections.clear()
 
     def reset_all_data_entry_fields(self, wine_color):
         """Resetta tutti i campi di input di testo e gli spinner sulla schermata INFO
@@ -1597,9 +2045,9 @@ class WineApp(App):
         self.card_to_update_id = None  # Cruciale per assicurare che il prossimo salvataggio sia un INSERT
 
         # 3. Resetta i campi di testo (sulla schermata INFO)
-        info_screen_name = f'info_{wine_color}'
-        if self.root.has_screen(info_screen_name):
-            info_screen = self.root.get_screen(info_screen_name)
+        #    (solo se la schermata esiste già: una schermata non ancora creata ha i campi vuoti)
+        info_screen = self.root.peek_screen(f'info_{wine_color}')
+        if info_screen is not None:
 
             # Campi di testo: li azzeriamo
             info_screen.ids[f'nome_{wine_color}'].text = ''
@@ -1639,16 +2087,21 @@ class WineApp(App):
         # 2. Lista delle opzioni del menu:
         # (img_normale, img_cliccata, azione)
         menu_items = [
-            # SOSTITUISCI QUESTI PERCORSI CON I TUOI FILE IMMAGINE REALI
-            ('materiale/menu_archivio_rossi.png', 'materiale/menu_archivio_rossi_cliccato.png',
+            # Immagini dell'atlante 'comune' (vedi tools/build_atlas.py)
+            ('atlas://materiale/atlas/comune/menu_archivio_rossi',
+             'atlas://materiale/atlas/comune/menu_archivio_rossi_cliccato',
              lambda: self.navigate_to_archive('rosso')),
-            ('materiale/menu_archivio_bianchi.png', 'materiale/menu_archivio_bianchi_cliccato.png',
+            ('atlas://materiale/atlas/comune/menu_archivio_bianchi',
+             'atlas://materiale/atlas/comune/menu_archivio_bianchi_cliccato',
              lambda: self.navigate_to_archive('bianco')),
-            ('materiale/menu_archivio_rosati.png', 'materiale/menu_archivio_rosati_cliccato.png',
+            ('atlas://materiale/atlas/comune/menu_archivio_rosati',
+             'atlas://materiale/atlas/comune/menu_archivio_rosati_cliccato',
              lambda: self.navigate_to_archive('rosato')),
-            ('materiale/menu_vai_a_degustazione.png', 'materiale/menu_vai_a_degustazione_cliccato.png',
+            ('atlas://materiale/atlas/comune/menu_vai_a_degustazione',
+             'atlas://materiale/atlas/comune/menu_vai_a_degustazione_cliccato',
              lambda: self.cancel_edit_and_go_to_selection()),
-            ('materiale/menu_esci.png', 'materiale/menu_esci_cliccato.png', self.stop)
+            ('atlas://materiale/atlas/comune/menu_esci', 'atlas://materiale/atlas/comune/menu_esci_cliccato',
+             self.stop)
         ]
 
         # 3. Creazione e configurazione dei bottoni
@@ -1696,12 +2149,13 @@ class WineApp(App):
         else:
             print(f"Errore: La schermata '{archive_screen_name}' non è definita nel ScreenManager.")
 
+    @traced(lambda app, wine_color, *args: wine_color)
     def start_edit_card(self, wine_color, wine_data, card_doc_id):
         """Prepara l'app per la modifica di una scheda esistente.
         Carica i dati della scheda in app.selections e app.text_inputs."""
 
         # --- AZZERA LO STATO PRIMA DI CARICARE I NUOVI DATI ---
-        self.selections = {}
+        selections = {}
         self.text_inputs = {}
         # -----------------------------------------------------------------
 
@@ -1709,15 +2163,21 @@ class WineApp(App):
         # L'ID viene passato come argomento e salvato direttamente.
         self.card_to_update_id = card_doc_id
 
+        # Campi di testo della scheda INFO (e spinner alcolico), come in confirm_and_save
+        text_keys = {field + '_' + wine_color for field in INFO_FIELDS} | {'note_personali'}
+
         # Mappa i dati della scheda in selections e text_inputs per pre-caricare l'UI
         for key, value in wine_data.items():
             if key not in ['_id', 'colore_vino']:  # Escludi ID e colore vino
                 # I campi di testo (e lo spinner alcolico) devono essere mappati in text_inputs
-                if key in ['nome_' + wine_color, 'produttore_' + wine_color, 'annata_' + wine_color, 'note_personali', 'alcol_' + wine_color]:
+                if key in text_keys:
                     self.text_inputs[key] = str(value)
                 else:
                     # Le selezioni dei bottoni (singole o multiple) vanno in selections
-                    self.selections[key] = value
+                    selections[key] = value
+
+        # 2. Carica le selezioni nel modello: si ridisegnano solo i gruppi che cambiano
+        self.selections.load(selections)
 
         # 3. Imposta la modalità di modifica
         self.is_editing = True
@@ -1834,44 +2294,23 @@ class WineApp(App):
             return
 
         # ====================================================================
-        # 1. MAPPATURA DEL COLORE (DEVE ESSERE QUI)
+        # 1. ELIMINA DAL DB (repository SQLite o TinyDB) SUL THREAD DI SCRITTURA
         # ====================================================================
-        color_map = {'rosso': 'red', 'bianco': 'white', 'rosato': 'pink'}
-        short_color = color_map.get(wine_color, 'red')
-        db_attr_name = f'db_{short_color}'
+        # La coda è unica e FIFO: un aggiornamento ancora in corso sulla stessa
+        # scheda viene sempre eseguito prima di questa eliminazione.
+        self.submit_archive_write(wine_color, 'remove', card_id)
+        print(f"Scheda {wine_color} con ID {card_id} in eliminazione.")
 
         # ====================================================================
-        # 2. ELIMINA DAL DB (TinyDB)
-        # ====================================================================
-        try:
-            db = getattr(self, db_attr_name)
-
-            # TinyDB: Rimuovi il documento usando il suo ID univoco
-            # Assicurati che 'from tinydb import where' sia importato nel file, se necessario.
-            db.remove(doc_ids=[card_id])
-            print(f"Scheda {wine_color} con ID {card_id} eliminata con successo.")
-
-        except Exception as e:
-            print(f"ERRORE ELIMINAZIONE DB: {e}")
-            if popup_to_dismiss:
-                popup_to_dismiss.dismiss()
-            return
-
-        # ====================================================================
-        # 3. AGGIORNA INTERFACCIA E NAVIGA
+        # 2. NAVIGA ALL'ARCHIVIO
         # ====================================================================
+        # La riga viene tolta dalla lista quando l'eliminazione è completata (evento on_archive_change)
         archive_screen_name = f'archivio_{wine_color}'
         if self.root.has_screen(archive_screen_name):
-            screen_instance = self.root.get_screen(archive_screen_name)
-
-            # 3a. Ricarica i dati (mostrando la lista aggiornata)
-            screen_instance.load_archive_data()
-
-            # 3b. Naviga alla schermata dell'archivio
             self.root.current = archive_screen_name
 
         # ====================================================================
-        # 4. CHIUDI IL POPUP DI DETTAGLIO (USANDO IL RIFERIMENTO SALVATO)
+        # 3. CHIUDI IL POPUP DI DETTAGLIO (USANDO IL RIFERIMENTO SALVATO)
         # ====================================================================
         # Chiudiamo il popup di dettaglio scheda usando il riferimento che abbiamo salvato
         # in confirm_delete_card (self.detail_popup_to_close)
@@ -1880,12 +2319,12 @@ class WineApp(App):
             self.detail_popup_to_close = None
 
         # ====================================================================
-        # 5. CHIUDI IL POPUP DI CONFERMA (Chiamato 'popup_to_dismiss')
+        # 4. CHIUDI IL POPUP DI CONFERMA (Chiamato 'popup_to_dismiss')
         # ====================================================================
         if popup_to_dismiss:
             popup_to_dismiss.dismiss()
 
-        # 6. Resetta le variabili temporanee
+        # 5. Resetta le variabili temporanee
         self.card_to_delete_id = None
         self.wine_color_to_delete = None
         # Rimuovi anche la variabile temporanea del popup di dettaglio, se presente
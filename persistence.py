@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Salvataggi in background per gli archivi dei vini.
+
+ArchiveWriter è un unico thread "scrittore": riceve le operazioni (insert,
+update, remove, flush) in una coda e le esegue una alla volta, nell'ordine in
+cui sono state inviate. Così l'interfaccia non si blocca durante le scritture
+su disco e le modifiche alla stessa scheda (es. aggiornamento seguito da
+eliminazione dello stesso doc_id) non possono mai essere eseguite fuori ordine.
+
+Il risultato di ogni operazione viene consegnato alla callback tramite la
+funzione 'dispatch' (nell'app: Clock.schedule_once, quindi sul thread di Kivy).
+"""
+import queue
+import threading
+from functools import partial
+
+
+class ArchiveWriter:
+    """Coda FIFO di operazioni sugli archivi, eseguite da un solo thread."""
+
+    def __init__(self, dispatch=None):
+        # dispatch(funzione): esegue la callback sul thread giusto. Di default la chiama subito.
+        self._dispatch = dispatch or (lambda function: function())
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='ArchiveWriter', daemon=True)
+        self._thread.start()
+
+    def submit(self, operation, callback=None):
+        """
+        Accoda 'operation' (una funzione senza argomenti). Al termine, se presente,
+        viene chiamata callback(result, error): error è None se tutto è andato bene.
+        """
+        self._queue.put((operation, callback))
+
+    def wait(self):
+        """Blocca finché tutte le operazioni accodate non sono state eseguite."""
+        self._queue.join()
+
+    def stop(self):
+        """Esegue le operazioni rimaste in coda e termina il thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            operation, callback = item
+            try:
+                result, error = operation(), None
+            except Exception as e:
+                result, error = None, e
+                print(f"ERRORE SALVATAGGIO ARCHIVIO: {e}")
+
+            if callback is not None:
+                self._dispatch(partial(callback, result, error))
+            self._queue.task_done()
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Formato compatto delle schede salvate negli archivi.
+
+Una scheda salvata da WineApp.confirm_and_save ha 18 chiavi con il colore nel
+nome ('limpidezza_rosso', 'intensita_vista_rosso', ...) e quasi tutti i valori
+sono le stesse etichette dei bottoni ripetute in ogni scheda. Su disco la
+scheda diventa invece una lista "posizionale":
+
+    [1, "Barolo", "Gaja", "2016", "14", 0, 1, [0, 2], 0, 2, [0, 1, 7], ...]
+
+- il primo elemento è la versione dello schema della scheda (SCHEMA_VERSION);
+- la posizione nella lista è il codice del campo (RECORD_FIELDS), senza colore;
+- i campi a selezione (SELECTION_FIELDS) sono codici interi del vocabolario:
+  la posizione dell'etichetta nella lista del campo (es. 'Limpido' -> 0);
+- None = campo assente; le chiavi non previste finiscono in un dizionario finale.
+
+Il vocabolario parte dalle opzioni dello schema della degustazione
+(tasting_schema.vocabulary) ed è salvato nell'intestazione dell'archivio insieme alla versione del formato. Le etichette
+nuove (opzioni aggiunte allo schema, schede importate) vengono solo accodate, quindi
+i codici già scritti su disco non cambiano mai significato.
+
+RecordCodec fa la conversione nei due sensi: fuori dallo storage le schede sono
+sempre i soliti dizionari 'campo_colore' -> etichetta.
+
+Quando la struttura della scheda cambia si aumenta SCHEMA_VERSION e si registra
+una migrazione con @migration: le schede salvate con una versione precedente
+vengono aggiornate alla lettura (decode), senza fermare l'avvio per convertire
+l'archivio; i backend le riscrivono poi in background (vedi repository).
+"""
+import threading
+
+from tasting_schema import TASTING_FIELDS, vocabulary
+
+
+# Versione del formato compatto scritta nell'intestazione degli archivi
+# (1: senza versione dello schema in testa alle schede, letta come schema 1)
+FORMAT_VERSION = 2
+
+# Versione attuale dello schema della scheda (campi e significato dei valori)
+SCHEMA_VERSION = 1
+
+# Campi della scheda INFO (testo libero), nell'ordine di confirm_and_save
+INFO_FIELDS = ('nome', 'produttore', 'annata', 'alcol')
+
+# Campi a selezione della scheda (bottoni di vista, naso, palato e conclusioni), nell'ordine
+# delle schermate. 'colore', 'profumo' e 'sapore' sono a selezione multipla (liste).
+SELECTION_FIELDS = (
+    'limpidezza', 'intensita_vista', 'colore',
+    'condizione', 'intensita_naso', 'profumo',
+    'dolcezza', 'acidita', 'tannicita', 'livello_alcolico', 'corpo', 'sapore', 'persistenza',
+    'qualita',
+)
+
+# Tutti i campi della scheda: la posizione è il codice del campo nel formato compatto.
+# I campi nuovi vanno aggiunti SOLO in coda, insieme a una migrazione dello schema.
+RECORD_FIELDS = INFO_FIELDS + SELECTION_FIELDS
+
+# Ogni gruppo dello schema della degustazione deve avere una posizione su disco
+_UNSTORED = [field for field in TASTING_FIELDS if field not in SELECTION_FIELDS]
+if _UNSTORED:
+    raise ValueError(f"Campi dello schema della degustazione senza posizione in SELECTION_FIELDS: {_UNSTORED}")
+
+
+# Migrazioni dello schema: versione di partenza -> funzione(record, wine_color) -> record
+_MIGRATIONS = {}
+
+
+def migration(from_version):
+    """
+    Registra la funzione che porta una scheda dalla versione 'from_version' alla successiva.
+    Esempio (schema 2 con un campo 'note' aggiunto in coda a RECORD_FIELDS):
+
+        @migration(1)
+        def _aggiungi_note(record, wine_color):
+            record.setdefault('note_' + wine_color, '')
+            return record
+    """
+    def register(function):
+        if from_version in _MIGRATIONS:
+            raise ValueError(f"Migrazione dalla versione {from_version} già registrata")
+        _MIGRATIONS[from_version] = function
+        return function
+    return register
+
+
+def upgrade_record(record, version, wine_color):
+    """Applica in ordine le migrazioni da 'version' a SCHEMA_VERSION."""
+    if version > SCHEMA_VERSION:
+        raise ValueError(f"Scheda salvata con lo schema {version}, più recente di questa "
+                         f"versione dell'app (schema {SCHEMA_VERSION})")
+    while version < SCHEMA_VERSION:
+        record = _MIGRATIONS[version](record, wine_color)
+        version += 1
+    return record
+
+
+class RecordCodec:
+    """
+    Conversione scheda <-> lista compatta per l'archivio di un colore.
+
+    Il vocabolario cresce (solo in coda) quando si codifica un'etichetta nuova:
+    'changed' indica che contiene etichette non ancora salvate nell'intestazione
+    dell'archivio (vedi take_header). Thread-safe: la compattazione del journal
+    codifica le schede da un thread separato.
+
+    'stale' conta le schede decodificate con uno schema precedente (e quindi
+    aggiornate in memoria, ma non ancora riscritte su disco).
+    """
+
+    def __init__(self, wine_color, seed=None):
+        self.wine_color = wine_color
+        self._seed = seed if seed is not None else vocabulary()
+        self._lock = threading.Lock()
+        self._keys = tuple(field + '_' + wine_color for field in RECORD_FIELDS)
+        self._key_set = frozenset(self._keys)
+        self.stale = 0
+        self._set_vocabulary({})
+
+    # ----------------------------------------------------------------------
+    # VOCABOLARIO E INTESTAZIONE
+    # ----------------------------------------------------------------------
+    def _set_vocabulary(self, vocabulary):
+        """Vocabolario salvato + etichette del KV non ancora presenti (accodate)."""
+        self._labels = {field: list(vocabulary.get(field, ())) for field in SELECTION_FIELDS}
+        self.changed = False
+        for field, labels in self._seed.items():
+            for label in labels:
+                if field in self._labels and label not in self._labels[field]:
+                    self._labels[field].append(label)
+                    self.changed = True
+
+        self._codes = {
+            field: {label: code for code, label in enumerate(labels)}
+            for field, labels in self._labels.items()
+        }
+        # Per ogni posizione: lista delle etichette (campi a selezione) o None (testo libero)
+        self._position_labels = tuple(self._labels.get(field) for field in RECORD_FIELDS)
+
+    def load_header(self, header):
+        """Adotta il vocabolario letto dall'intestazione dell'archivio."""
+        version = header.get('versione')
+        if not isinstance(version, int) or not 1 <= version <= FORMAT_VERSION:
+            raise ValueError(f"Formato dell'archivio non supportato: versione {version} "
+                             f"(questa versione dell'app legge fino alla {FORMAT_VERSION})")
+        with self._lock:
+            self._set_vocabulary(header.get('vocabolario', {}))
+            if version < FORMAT_VERSION:
+                # L'intestazione va riscritta con la versione attuale prima delle nuove schede
+                self.changed = True
+
+    def header(self):
+        """Intestazione da salvare nell'archivio: versione, colore e vocabolario."""
+        with self._lock:
+            return {
+                'versione': FORMAT_VERSION,
+                'colore': self.wine_color,
+                'vocabolario': {field: list(labels) for field, labels in self._labels.items()},
+            }
+
+    def take_header(self):
+        """Intestazione da salvare se il vocabolario è cambiato dall'ultima volta, altrimenti None."""
+        with self._lock:
+            if not self.changed:
+                return None
+            self.changed = False
+        return self.header()
+
+    # ----------------------------------------------------------------------
+    # CODIFICA
+    # ----------------------------------------------------------------------
+    def _code(self, field, label):
+        """Codice dell'etichetta nel vocabolario del campo (la aggiunge se nuova)."""
+        codes = self._codes[field]
+        code = codes.get(label)
+        if code is None:
+            labels = self._labels[field]
+            code = codes[label] = len(labels)
+            labels.append(label)
+            self.changed = True
+        return code
+
+    def encode(self, record):
+        """Scheda (dizionario, schema attuale) -> lista compatta."""
+        row = []
+        extra = {key: value for key, value in record.items() if key not in self._key_set}
+
+        with self._lock:
+            for field, key, labels in zip(RECORD_FIELDS, self._keys, self._position_labels):
+                if key not in record:
+                    row.append(None)
+                    continue
+
+                value = record[key]
+                if labels is None:
+                    # Testo libero (None resta fra le chiavi extra per distinguerlo da "assente")
+                    if value is None:
+                        extra[key] = value
+                    row.append(value)
+                elif value == '':
+                    # Nessuna selezione: resta la stringa vuota
+                    row.append(value)
+                elif isinstance(value, str):
+                    row.append(self._code(field, value))
+                elif isinstance(value, list) and all(isinstance(label, str) for label in value):
+                    row.append([self._code(field, label) for label in value])
+                else:
+                    # Valore inatteso per un campo a selezione: salvato così com'è
+                    extra[key] = value
+                    row.append(None)
+
+        while row and row[-1] is None:
+            row.pop()
+        if extra:
+            row.extend([None] * (len(RECORD_FIELDS) - len(row)))
+            row.append(extra)
+        return [SCHEMA_VERSION] + row
+
+    def decode(self, row):
+        """
+        Lista compatta -> scheda (dizionario) aggiornata allo schema attuale.
+        I dizionari (archivi precedenti al formato compatto) sono schede dello schema 1.
+        """
+        if isinstance(row, dict):
+            return self._upgrade(row, 1)
+
+        if row and type(row[0]) is int:
+            version, row = row[0], row[1:]
+        else:
+            # Formato compatto 1: nessuna versione in testa
+            version = 1
+
+        record = {}
+        for key, labels, value in zip(self._keys, self._position_labels, row):
+            if value is None:
+                continue
+            if labels is not None:
+                if type(value) is int:
+                    value = labels[value]
+                elif type(value) is list:
+                    value = [labels[code] for code in value]
+            record[key] = value
+
+        if len(row) > len(RECORD_FIELDS):
+            record.update(row[-1])
+        return self._upgrade(record, version)
+
+    def _upgrade(self, record, version):
+        if version == SCHEMA_VERSION:
+            return record
+        self.stale += 1
+        return upgrade_record(record, version, self.wine_color)
@@ -0,0 +1,641 @@
+# -*- coding: utf-8 -*-
+"""
+Livello "repository" per gli archivi dei vini.
+
+Le schermate e WineApp non parlano più direttamente con TinyDB ma con un
+WineRepository, che espone solo le operazioni usate dall'app (all, get,
+insert, update, remove, find_by, flush). Sono disponibili due implementazioni:
+
+- TinyDBWineRepository: il backend storico (file JSON + journal, vedi storage.py);
+- SQLiteWineRepository: un file SQLite per colore, con indici su nome,
+  produttore, annata, gradazione alcolica e qualità.
+
+Alla prima apertura del backend SQLite le schede presenti nel vecchio file
+JSON vengono copiate una sola volta (migrate_json_to_sqlite), mantenendo i
+doc_id originali. Il file JSON non viene cancellato e resta come backup.
+
+In entrambi i backend le schede sono salvate nel formato compatto di
+record_format (campi senza colore, etichette come codici del vocabolario):
+gli archivi nel formato precedente vengono convertiti alla prima apertura.
+Le schede di uno schema precedente sono aggiornate alla lettura e riscritte
+in background (upgrade_records), senza bloccare l'apertura dell'archivio.
+
+Entrambi i backend sono "write-behind": le modifiche restano in memoria (o in
+una transazione aperta) finché non si chiama flush(), oppure finché le
+scritture in sospeso non raggiungono 'max_pending'.
+"""
+import functools
+import json
+from bisect import bisect_left
+import math
+import os
+import sqlite3
+import threading
+
+from tinydb import TinyDB, Query
+
+from record_format import SCHEMA_VERSION, RecordCodec
+from storage import JournalStorage, WriteBehindMiddleware
+
+
+# Nome base dei file di archivio per ogni colore (l'estensione dipende dal backend)
+ARCHIVE_FILES = {
+    'rosso': 'red_wine_database',
+    'bianco': 'white_wine_database',
+    'rosato': 'pink_wine_database',
+}
+
+# Campi della scheda copiati in colonne indicizzate (chiave DB = campo + '_' + colore)
+INDEXED_FIELDS = ('nome', 'produttore', 'annata', 'alcol', 'qualita')
+
+# Numero massimo predefinito di schede salvate/eliminate non ancora scritte su disco
+DEFAULT_MAX_PENDING = WriteBehindMiddleware.DEFAULT_MAX_PENDING
+
+# Schede di uno schema precedente riscritte per ogni passo di upgrade_records
+UPGRADE_BATCH_SIZE = 200
+
+
+def synchronized(method):
+    """Esegue il metodo con il lock del repository: le letture arrivano dall'interfaccia,
+    le scritture dal thread di salvataggio (vedi persistence.ArchiveWriter)."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class WineRecord(dict):
+    """Una scheda letta dall'archivio: un dizionario con in più il suo doc_id
+    (stessa interfaccia dei Document di TinyDB)."""
+
+    def __init__(self, value, doc_id):
+        super().__init__(value)
+        self.doc_id = doc_id
+
+
+class WineRepository:
+    """
+    Interfaccia comune dei backend di archivio (uno per colore del vino).
+    Le sottoclassi DEVONO implementare tutti i metodi.
+    """
+
+    def __init__(self, wine_color):
+        self.wine_color = wine_color
+        # Rientrante: alcuni metodi ne chiamano altri (es. update -> get)
+        self._lock = threading.RLock()
+
+    def all(self):
+        """Restituisce tutte le schede (lista di WineRecord) in ordine di inserimento."""
+        raise NotImplementedError
+
+    def get(self, doc_id):
+        """Restituisce la scheda con l'ID indicato, o None se non esiste."""
+        raise NotImplementedError
+
+    def doc_ids(self):
+        """Restituisce i doc_id di tutte le schede in ordine di inserimento (senza leggerne i dati)."""
+        raise NotImplementedError
+
+    def get_many(self, doc_ids):
+        """Restituisce le schede con gli ID indicati, nello stesso ordine (gli ID inesistenti sono saltati)."""
+        raise NotImplementedError
+
+    def cursor(self, doc_ids=None, page_size=None):
+        """Cursore a pagine sulle schede 'doc_ids' (di default tutte, in ordine di inserimento)."""
+        if doc_ids is None:
+            doc_ids = self.doc_ids()
+        return ArchiveCursor(self, doc_ids, page_size or ArchiveCursor.DEFAULT_PAGE_SIZE)
+
+    def insert(self, record):
+        """Inserisce una nuova scheda e ne restituisce il doc_id."""
+        raise NotImplementedError
+
+    def update(self, doc_id, fields):
+        """Aggiorna (unendo i campi) la scheda con l'ID indicato."""
+        raise NotImplementedError
+
+    def remove(self, doc_id):
+        """Elimina la scheda con l'ID indicato."""
+        raise NotImplementedError
+
+    def find_by(self, field, value):
+        """Cerca le schede con campo == valore (es. find_by('produttore', 'Gaja'))."""
+        raise NotImplementedError
+
+    @property
+    def pending(self):
+        """Numero di modifiche non ancora scritte su disco."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Scrive su disco le modifiche in sospeso."""
+        raise NotImplementedError
+
+    def close(self):
+        """Scrive le modifiche in sospeso e chiude i file aperti dal backend."""
+        raise NotImplementedError
+
+    def changed_on_disk(self):
+        """True se il file dell'archivio è stato modificato da fuori (altro processo, copia
+        a mano, ripristino di un backup) dopo l'ultima lettura/scrittura di questo repository."""
+        raise NotImplementedError
+
+    def reload(self):
+        """Salva le modifiche in sospeso e rilegge l'archivio dal disco."""
+        raise NotImplementedError
+
+    def upgrade_records(self, after_doc_id=0, limit=UPGRADE_BATCH_SIZE):
+        """
+        Riscrive con lo schema attuale al massimo 'limit' schede salvate con uno schema
+        precedente e con doc_id > after_doc_id. Restituisce il doc_id da cui proseguire,
+        o None se non ce ne sono altre: va chiamato a passi dal thread di salvataggio.
+        """
+        raise NotImplementedError
+
+    def _key(self, field):
+        """Chiave DB del campo per il colore del repository (es. 'nome' -> 'nome_rosso')."""
+        return field + '_' + self.wine_color
+
+
+# ==============================================================================
+# BACKEND TINYDB
+# ==============================================================================
+
+
+class TinyDBWineRepository(WineRepository):
+    """Archivio su file JSON gestito da TinyDB (storage a journal con cache write-behind)."""
+
+    def __init__(self, wine_color, path, max_pending=DEFAULT_MAX_PENDING):
+        super().__init__(wine_color)
+        self.path = path
+        self._cache = WriteBehindMiddleware(JournalStorage, max_pending=max_pending)
+        self._db = TinyDB(path, storage=self._cache, codec=RecordCodec(wine_color))
+
+    @synchronized
+    def all(self):
+        return self._db.all()
+
+    @synchronized
+    def get(self, doc_id):
+        return self._db.get(doc_id=doc_id)
+
+    @synchronized
+    def doc_ids(self):
+        return self._cache.doc_ids(self._db.default_table_name)
+
+    @synchronized
+    def get_many(self, doc_ids):
+        documents = (self._db.get(doc_id=doc_id) for doc_id in doc_ids)
+        return [document for document in documents if document is not None]
+
+    @synchronized
+    def insert(self, record):
+        return self._db.insert(record)
+
+    @synchronized
+    def update(self, doc_id, fields):
+        self._db.update(fields, doc_ids=[doc_id])
+
+    @synchronized
+    def remove(self, doc_id):
+        self._db.remove(doc_ids=[doc_id])
+
+    @synchronized
+    def find_by(self, field, value):
+        return self._db.search(Query()[self._key(field)] == value)
+
+    @property
+    def pending(self):
+        return self._cache.pending
+
+    @synchronized
+    def flush(self):
+        self._cache.flush()
+
+    @synchronized
+    def close(self):
+        # CachingMiddleware.close() esegue il flush prima di chiudere lo storage
+        self._db.close()
+
+    @synchronized
+    def changed_on_disk(self):
+        return self._cache.storage.changed_on_disk()
+
+    @synchronized
+    def reload(self):
+        # Lo stato è tutto in memoria (cache + storage): si riapre il file da zero
+        self._db.close()
+        self._cache = WriteBehindMiddleware(JournalStorage, max_pending=self._cache.WRITE_CACHE_SIZE)
+        self._db = TinyDB(self.path, storage=self._cache, codec=RecordCodec(self.wine_color))
+
+    def upgrade_records(self, after_doc_id=0, limit=UPGRADE_BATCH_SIZE):
+        # Le schede sono già tutte in memoria (aggiornate dal codec): le riscrive la
+        # compattazione avviata in background all'apertura, vedi JournalStorage.
+        return None
+
+
+# ==============================================================================
+# BACKEND SQLITE
+# ==============================================================================
+
+
+class SQLiteWineRepository(WineRepository):
+    """
+    Archivio su SQLite. La scheda completa è salvata come JSON compatto nella colonna
+    'dati' (intestazione del formato nella tabella 'meta'); i campi più usati per ordinare e cercare sono copiati in colonne
+    indicizzate, così le ricerche non devono leggere e decodificare tutte le schede.
+
+    Le modifiche restano in una transazione aperta (visibile alle letture della
+    stessa connessione) fino a flush() o fino a 'max_pending' modifiche.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS schede (
+            doc_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome       TEXT,
+            produttore TEXT,
+            annata     INTEGER,
+            alcol      REAL,
+            qualita    TEXT,
+            versione   INTEGER NOT NULL DEFAULT 1,
+            dati       TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_schede_nome ON schede (nome);
+        CREATE INDEX IF NOT EXISTS idx_schede_produttore ON schede (produttore);
+        CREATE INDEX IF NOT EXISTS idx_schede_annata ON schede (annata);
+        CREATE INDEX IF NOT EXISTS idx_schede_alcol ON schede (alcol);
+        CREATE INDEX IF NOT EXISTS idx_schede_qualita ON schede (qualita);
+        CREATE TABLE IF NOT EXISTS meta (
+            chiave TEXT PRIMARY KEY,
+            valore TEXT
+        );
+    """
+
+    UPDATE_ROW = (
+        'UPDATE schede SET nome = ?, produttore = ?, annata = ?, alcol = ?, qualita = ?, versione = ?, dati = ? '
+        'WHERE doc_id = ?'
+    )
+
+    def __init__(self, wine_color, path, max_pending=DEFAULT_MAX_PENDING):
+        super().__init__(wine_color)
+        self.path = path
+        self._max_pending = max_pending
+        self._pending = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: le scritture sono append sul file di log, senza riscrivere le pagine dell'archivio
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        self._add_missing_columns()
+        # Formato compatto della colonna 'dati' (vedi record_format)
+        self._codec = RecordCodec(wine_color)
+        self._load_format()
+        # Cambia solo quando un'ALTRA connessione fa commit sul file (vedi changed_on_disk)
+        self._data_version = self._read_data_version()
+
+    # ----------------------------------------------------------------------
+    # CONVERSIONE SCHEDA <-> RIGA
+    # ----------------------------------------------------------------------
+    def _add_missing_columns(self):
+        """Aggiunge le colonne introdotte dopo la creazione del file (le righe esistenti
+        prendono il valore di default, senza riscrivere la tabella)."""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(schede)')}
+        if 'versione' not in columns:
+            self._conn.execute('ALTER TABLE schede ADD COLUMN versione INTEGER NOT NULL DEFAULT 1')
+
+    def _columns(self, record):
+        """Valori delle colonne indicizzate (annata e alcol convertiti in numeri, se possibile)
+        e versione dello schema della scheda (sempre quella attuale quando si scrive)."""
+        return (
+            record.get(self._key('nome')),
+            record.get(self._key('produttore')),
+            to_number(record.get(self._key('annata')), int),
+            to_number(record.get(self._key('alcol')), float),
+            record.get(self._key('qualita')),
+            SCHEMA_VERSION,
+        )
+
+    def _to_record(self, row):
+        doc_id, dati = row
+        return WineRecord(self._codec.decode(json.loads(dati)), doc_id)
+
+    def _dumps(self, record):
+        """Valore della colonna 'dati': la scheda nel formato compatto."""
+        return json.dumps(self._codec.encode(record), ensure_ascii=False, separators=(',', ':'))
+
+    def _load_format(self):
+        """Legge l'intestazione del formato; alla prima apertura converte le schede salvate
+        nel formato precedente (dizionari JSON completi) in un'unica transazione."""
+        header = self.get_meta('formato_schede')
+        if header is not None:
+            self._codec.load_header(json.loads(header))
+            return
+
+        rows = self._conn.execute('SELECT doc_id, dati FROM schede').fetchall()
+        self._conn.executemany(
+            'UPDATE schede SET versione = ?, dati = ? WHERE doc_id = ?',
+            [(SCHEMA_VERSION, self._dumps(self._codec.decode(json.loads(dati))), doc_id) for doc_id, dati in rows]
+        )
+        self._store_format(force=True)
+        self._pending += 1
+        self.flush()
+        if rows:
+            # Restituisce al file system le pagine liberate dalla conversione
+            self._conn.execute('VACUUM')
+
+    def _store_format(self, force=False):
+        """Salva l'intestazione del formato se il vocabolario è cambiato (o sempre, con 'force'),
+        nella stessa transazione delle schede che usano i codici nuovi."""
+        header = self._codec.take_header() or (self._codec.header() if force else None)
+        if header is not None:
+            self._conn.execute('INSERT OR REPLACE INTO meta (chiave, valore) VALUES (?, ?)',
+                               ('formato_schede', json.dumps(header, ensure_ascii=False)))
+
+    # ----------------------------------------------------------------------
+    # OPERAZIONI
+    # ----------------------------------------------------------------------
+    @synchronized
+    def all(self):
+        rows = self._conn.execute('SELECT doc_id, dati FROM schede ORDER BY doc_id')
+        return [self._to_record(row) for row in rows]
+
+    @synchronized
+    def get(self, doc_id):
+        row = self._conn.execute('SELECT doc_id, dati FROM schede WHERE doc_id = ?', (doc_id,)).fetchone()
+        return self._to_record(row) if row else None
+
+    @synchronized
+    def doc_ids(self):
+        # Legge solo la chiave primaria: nessuna scheda viene decodificata
+        return [row[0] for row in self._conn.execute('SELECT doc_id FROM schede ORDER BY doc_id')]
+
+    @synchronized
+    def get_many(self, doc_ids):
+        doc_ids = list(doc_ids)
+        records = {}
+        # A blocchi, per restare sotto il limite di parametri di SQLite
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            rows = self._conn.execute(
+                f'SELECT doc_id, dati FROM schede WHERE doc_id IN ({",".join("?" * len(chunk))})', chunk
+            )
+            records.update((row[0], self._to_record(row)) for row in rows)
+        return [records[doc_id] for doc_id in doc_ids if doc_id in records]
+
+    @synchronized
+    def insert(self, record):
+        cursor = self._conn.execute(
+            'INSERT INTO schede (nome, produttore, annata, alcol, qualita, versione, dati) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            self._columns(record) + (self._dumps(record),)
+        )
+        self._store_format()
+        self._mark_pending()
+        return cursor.lastrowid
+
+    @synchronized
+    def update(self, doc_id, fields):
+        current = self.get(doc_id)
+        if current is None:
+            return
+
+        record = dict(current)
+        record.update(fields)
+        self._conn.execute(self.UPDATE_ROW, self._columns(record) + (self._dumps(record), doc_id))
+        self._store_format()
+        self._mark_pending()
+
+    @synchronized
+    def remove(self, doc_id):
+        self._conn.execute('DELETE FROM schede WHERE doc_id = ?', (doc_id,))
+        self._mark_pending()
+
+    @synchronized
+    def upgrade_records(self, after_doc_id=0, limit=UPGRADE_BATCH_SIZE):
+        # Solo le righe di uno schema precedente, 'limit' alla volta: memoria limitata
+        # e un commit per blocco, anche con archivi molto grandi.
+        rows = self._conn.execute(
+            'SELECT doc_id, dati FROM schede WHERE versione < ? AND doc_id > ? ORDER BY doc_id LIMIT ?',
+            (SCHEMA_VERSION, after_doc_id, limit)
+        ).fetchall()
+        if not rows:
+            return None
+
+        records = [self._to_record(row) for row in rows]
+        self._conn.executemany(
+            self.UPDATE_ROW,
+            [self._columns(record) + (self._dumps(record), record.doc_id) for record in records]
+        )
+        self._store_format()
+        self._pending += 1
+        self.flush()
+        return rows[-1][0]
+
+    @synchronized
+    def find_by(self, field, value):
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Campo '{field}' non indicizzato: usa uno fra {INDEXED_FIELDS}")
+
+        if field == 'annata':
+            value = to_number(value, int)
+        elif field == 'alcol':
+            value = to_number(value, float)
+
+        # Il nome della colonna viene solo da INDEXED_FIELDS, quindi è sicuro interpolarlo
+        rows = self._conn.execute(
+            f'SELECT doc_id, dati FROM schede WHERE {field} = ? ORDER BY doc_id', (value,)
+        )
+        return [self._to_record(row) for row in rows]
+
+    @property
+    def pending(self):
+        return self._pending
+
+    @synchronized
+    def flush(self):
+        if self._pending:
+            self._conn.commit()
+            self._pending = 0
+
+    @synchronized
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    @synchronized
+    def changed_on_disk(self):
+        return self._read_data_version() != self._data_version
+
+    @synchronized
+    def reload(self):
+        # Le letture SQLite vedono sempre il file aggiornato: basta salvare e ripartire da qui
+        self.flush()
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self):
+        return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _mark_pending(self):
+        """Conta una modifica non salvata e fa il commit se si supera il limite."""
+        self._pending += 1
+        if self._pending >= self._max_pending:
+            self.flush()
+
+    # ----------------------------------------------------------------------
+    # METADATI (usati dalla migrazione)
+    # ----------------------------------------------------------------------
+    @synchronized
+    def import_records(self, documents):
+        """Inserisce in blocco schede con doc_id già assegnato, in un'unica transazione."""
+        self._conn.executemany(
+            'INSERT INTO schede (doc_id, nome, produttore, annata, alcol, qualita, versione, dati) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                (document.doc_id,) + self._columns(document) + (self._dumps(document),)
+                for document in documents
+            )
+        )
+        self._store_format()
+        self._pending += 1
+        self.flush()
+
+    @synchronized
+    def get_meta(self, key):
+        row = self._conn.execute('SELECT valore FROM meta WHERE chiave = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    @synchronized
+    def set_meta(self, key, value):
+        self._conn.execute('INSERT OR REPLACE INTO meta (chiave, valore) VALUES (?, ?)', (key, value))
+        self._mark_pending()
+
+
+class ArchiveCursor:
+    """
+    Cursore a pagine su una sequenza ordinata di doc_id.
+
+    Tiene in memoria solo gli ID (l'ordine e i filtri li decide chi lo crea): le schede
+    vengono lette dall'archivio una pagina alla volta con fetch(), quindi la memoria usata
+    per i dati non dipende dalla dimensione dell'archivio ma solo da quante pagine si tengono.
+
+    Ogni posizione ha un'etichetta numerica crescente (lista parallela a doc_ids): la
+    posizione di un doc_id si trova con una ricerca binaria sulla sua etichetta, senza
+    scorrere la lista. doc_ids va modificata solo con insert() e remove().
+    """
+
+    # Numero di schede lette per ogni pagina
+    DEFAULT_PAGE_SIZE = 50
+
+    # Distanza fra le etichette di due posizioni consecutive dopo una rinumerazione
+    LABEL_GAP = 1 << 16
+
+    def __init__(self, repository, doc_ids, page_size=DEFAULT_PAGE_SIZE):
+        self.repository = repository
+        self.doc_ids = list(doc_ids)
+        self.page_size = page_size
+        self._relabel()
+
+    def _relabel(self):
+        """Etichette distanziate di LABEL_GAP nell'ordine attuale di doc_ids."""
+        self._labels = list(range(0, len(self.doc_ids) * self.LABEL_GAP, self.LABEL_GAP))
+        self._label_of = dict(zip(self.doc_ids, self._labels))
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def fetch(self, start, stop=None):
+        """Legge le schede dalla posizione 'start' a 'stop' esclusa (di default una pagina)."""
+        if stop is None:
+            stop = start + self.page_size
+        start, stop = max(start, 0), min(stop, len(self.doc_ids))
+        if start >= stop:
+            return []
+        return self.repository.get_many(self.doc_ids[start:stop])
+
+    def index(self, doc_id):
+        """Posizione del doc_id nel cursore, o None se non presente."""
+        label = self._label_of.get(doc_id)
+        return None if label is None else bisect_left(self._labels, label)
+
+    def remove(self, doc_id):
+        """Toglie doc_id dal cursore; restituisce la sua posizione, o None se non c'era."""
+        position = self.index(doc_id)
+        if position is not None:
+            del self.doc_ids[position]
+            del self._labels[position]
+            del self._label_of[doc_id]
+        return position
+
+    def insert(self, position, doc_id):
+        """Inserisce doc_id (non presente nel cursore) nella posizione indicata."""
+        before = self._labels[position - 1] if position > 0 else None
+        after = self._labels[position] if position < len(self._labels) else None
+        self.doc_ids.insert(position, doc_id)
+        if before is not None and after is not None and after - before < 2:
+            # Nessuna etichetta libera fra le due vicine: si rinumera tutto (raro)
+            self._relabel()
+            return
+        if before is None:
+            label = 0 if after is None else after - self.LABEL_GAP
+        else:
+            label = before + self.LABEL_GAP if after is None else (before + after) // 2
+        self._labels.insert(position, label)
+        self._label_of[doc_id] = label
+
+
+def to_number(value, number_type):
+    """Converte '13,5' / '2019' in numero; restituisce None per testi non numerici
+    (es. il placeholder 'Gradazione alcolica') e per 'nan' / 'inf', che float() accetta
+    ma che non si possono confrontare né ordinare con gli altri valori."""
+    try:
+        number = number_type(str(value).replace(',', '.').strip())
+        return number if math.isfinite(number) else None
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+# ==============================================================================
+# MIGRAZIONE E APERTURA
+# ==============================================================================
+
+
+def migrate_json_to_sqlite(json_path, repository):
+    """
+    Copia UNA SOLA VOLTA le schede del vecchio archivio TinyDB nel repository SQLite,
+    mantenendo i doc_id. Restituisce il numero di schede copiate (0 se già migrato).
+    """
+    if repository.get_meta('migrato_da_json') is not None:
+        return 0
+
+    migrated = 0
+    if os.path.exists(json_path) or os.path.exists(json_path + '.journal'):
+        # Il file JSON (con il suo journal) resta un backup: viene letto senza creare o riscrivere file
+        old_db = TinyDB(json_path, storage=JournalStorage, codec=RecordCodec(repository.wine_color), read_only=True)
+        try:
+            documents = old_db.all()
+            repository.import_records(documents)
+            migrated = len(documents)
+        finally:
+            old_db.close()
+
+    repository.set_meta('migrato_da_json', json_path)
+    repository.flush()
+    print(f"Migrazione archivio '{json_path}' -> '{repository.path}': {migrated} schede copiate.")
+    return migrated
+
+
+def open_repository(wine_color, backend='sqlite', directory='', max_pending=DEFAULT_MAX_PENDING):
+    """Apre l'archivio del colore indicato con il backend scelto ('sqlite' o 'tinydb')."""
+    base_path = os.path.join(directory, ARCHIVE_FILES[wine_color])
+
+    if backend == 'tinydb':
+        return TinyDBWineRepository(wine_color, base_path + '.json', max_pending=max_pending)
+
+    if backend == 'sqlite':
+        repository = SQLiteWineRepository(wine_color, base_path + '.sqlite3', max_pending=max_pending)
+        migrate_json_to_sqlite(base_path + '.json', repository)
+        return repository
+
+    raise ValueError(f"Backend di archivio sconosciuto: '{backend}'")
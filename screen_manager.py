@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+ScreenManager con schermate create al primo utilizzo.
+
+LazyScreenManager riceve per ogni schermata una "fabbrica" (register) invece
+dell'istanza: la schermata e tutto il suo albero di widget vengono costruiti
+solo la prima volta che serve (navigazione con current, get_screen). All'avvio
+esiste quindi solo la schermata iniziale.
+
+Le schermate possono appartenere a un gruppo (es. il colore del vino). Con
+max_resident_groups impostato, dopo ogni cambio di schermata vengono rilasciate
+le schermate dei gruppi usati meno di recente (LRU) oltre il limite: tornando
+su una di esse la schermata viene ricostruita dalla sua fabbrica. Prima di
+essere rilasciata la schermata riceve release(), se lo definisce, per staccarsi
+dagli oggetti che le sopravvivono (es. l'app o il modello delle selezioni).
+
+Con kv_loader impostato (vedi kv_loader.KvLoader) i file KV di ogni schermata
+(kv_files di register) vengono caricati prima di costruirla e scaricati quando
+viene rilasciata.
+
+Con profiler impostato (vedi startup_profile.StartupProfiler) la costruzione di
+ogni schermata, compreso il caricamento dei suoi KV, viene cronometrata.
+"""
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from kivy.properties import NumericProperty
+from kivy.uix.screenmanager import ScreenManager
+
+
+class LazyScreenManager(ScreenManager):
+    """
+    has_screen / get_screen considerano anche le schermate registrate ma non ancora costruite;
+    peek_screen restituisce la schermata solo se esiste già (None altrimenti), per chi deve
+    aggiornare una schermata senza costringere a costruirla.
+    """
+
+    # Numero massimo di gruppi con schermate in memoria (None = nessun rilascio)
+    max_resident_groups = NumericProperty(None, allownone=True)
+
+    def __init__(self, **kwargs):
+        # Nome -> (fabbrica senza argomenti che restituisce la schermata, gruppo o None, file KV)
+        self._factories = {}
+        # Gruppi nell'ordine di utilizzo: l'ultimo è il più recente
+        self._group_use = OrderedDict()
+        # Funzione(gruppo) -> False per impedire il rilascio di un gruppo (es. degustazione in corso)
+        self.can_release_group = None
+        # Caricatore dei file KV delle schermate (acquire/release), None = KV già caricati
+        self.kv_loader = None
+        # Profiler che cronometra la costruzione delle schermate (measure), None = nessuna misura
+        self.profiler = None
+        super().__init__(**kwargs)
+
+    def register(self, name, factory, group=None, kv_files=()):
+        """Registra la fabbrica della schermata 'name' (la schermata NON viene creata)."""
+        self._factories[name] = (factory, group, tuple(kv_files))
+
+    def _group(self, name):
+        return self._factories[name][1] if name in self._factories else None
+
+    # ----------------------------------------------------------------------
+    # ACCESSO ALLE SCHERMATE
+    # ----------------------------------------------------------------------
+    def has_screen(self, name):
+        return name in self._factories or super().has_screen(name)
+
+    def peek_screen(self, name):
+        """La schermata 'name' se è già stata costruita, altrimenti None."""
+        for screen in self.screens:
+            if screen.name == name:
+                return screen
+        return None
+
+    def get_screen(self, name):
+        """Restituisce la schermata, costruendola dalla sua fabbrica al primo accesso."""
+        screen = self.peek_screen(name)
+        if screen is None and name in self._factories:
+            factory, _, kv_files = self._factories[name]
+            with nullcontext() if self.profiler is None else self.profiler.measure(name, 'schermata'):
+                screen = self._build_screen(name, factory, kv_files)
+            self.add_widget(screen)
+        return screen if screen is not None else super().get_screen(name)
+
+    def _build_screen(self, name, factory, kv_files):
+        if self.kv_loader is not None:
+            self.kv_loader.acquire(kv_files)
+        try:
+            screen = factory()
+            if screen.name != name:
+                raise ValueError(f"La fabbrica della schermata '{name}' ha creato '{screen.name}'")
+        except Exception:
+            if self.kv_loader is not None:
+                self.kv_loader.release(kv_files)
+            raise
+        return screen
+
+    # ----------------------------------------------------------------------
+    # RILASCIO DELLE SCHERMATE USATE MENO DI RECENTE
+    # ----------------------------------------------------------------------
+    def on_current(self, instance, value):
+        super().on_current(instance, value)
+        group = self._group(value)
+        if group is None:
+            return
+        self._group_use.pop(group, None)
+        self._group_use[group] = None
+        self.release_groups()
+
+    def release_groups(self):
+        """Rilascia i gruppi meno recenti oltre max_resident_groups (escluso quello attuale)."""
+        if self.max_resident_groups is None:
+            return
+        surplus = len(self._group_use) - int(self.max_resident_groups)
+        for group in list(self._group_use)[:max(surplus, 0)]:
+            if self.can_release_group is not None and not self.can_release_group(group):
+                continue
+            if self._release_group(group):
+                del self._group_use[group]
+
+    def _release_group(self, group):
+        """Rilascia le schermate costruite del gruppo. False se una è ancora visibile."""
+        in_transition = (self.transition.screen_in, self.transition.screen_out) if self.transition.is_active else ()
+        screens = [screen for screen in self.screens if self._group(screen.name) == group]
+        if any(screen is self.current_screen or screen in in_transition for screen in screens):
+            return False
+        for screen in screens:
+            release = getattr(screen, 'release', None)
+            if release is not None:
+                release()
+            self.remove_widget(screen)
+            if self.kv_loader is not None:
+                self.kv_loader.release(self._factories[screen.name][2])
+        return True
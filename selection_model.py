@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Stato delle selezioni della degustazione in corso.
+
+SelectionModel sostituisce il dizionario WineApp.selections: ogni gruppo di
+bottoni (chiave DB, es. 'profumo_rosso') è una proprietà Kivy, quindi chi
+vuole sapere quando cambia una selezione si registra solo sui gruppi che gli
+interessano (model.bind(profumo_rosso=callback)). Le schermate della
+degustazione ridisegnano così solo i bottoni del gruppo cambiato, e azzerare
+la degustazione notifica solo i gruppi che avevano una selezione.
+
+Espone anche l'interfaccia di un dizionario (get, [], pop, copy, ...) usata da
+confirm_and_save e dagli altri punti che leggevano WineApp.selections.
+"""
+from kivy.event import EventDispatcher
+
+from record_format import SELECTION_FIELDS
+from repository import ARCHIVE_FILES
+
+
+# Gruppi di selezione: un campo a selezione per ogni colore (es. 'limpidezza_rosso')
+SELECTION_GROUPS = tuple(field + '_' + wine_color for wine_color in ARCHIVE_FILES for field in SELECTION_FIELDS)
+
+
+def _normalized(value):
+    """Valore da memorizzare per un gruppo: liste copiate, None per '' e [] (nessuna selezione)."""
+    if value == '' or value == []:
+        return None
+    return list(value) if isinstance(value, list) else value
+
+
+class SelectionModel(EventDispatcher):
+    """
+    Selezioni correnti: gruppo -> testo del bottone (selezione singola), lista di testi
+    (selezione multipla) o None (nessuna selezione). Il testo vuoto e la lista vuota
+    (es. gruppi non compilati di una scheda salvata) vengono memorizzati come None.
+
+    I valori non vanno modificati sul posto: ogni modifica assegna un valore nuovo,
+    così la proprietà del gruppo emette l'evento di cambio.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        for group in SELECTION_GROUPS:
+            self.create_property(group, None, allownone=True)
+
+    # ----------------------------------------------------------------------
+    # INTERFACCIA "DIZIONARIO"
+    # ----------------------------------------------------------------------
+    def get(self, group, default=None):
+        value = getattr(self, group) if group in SELECTION_GROUPS else None
+        return default if value is None else value
+
+    def __getitem__(self, group):
+        value = self.get(group)
+        if value is None:
+            raise KeyError(group)
+        return value
+
+    def __setitem__(self, group, value):
+        if group not in SELECTION_GROUPS:
+            raise KeyError(f"Gruppo di selezione sconosciuto: '{group}'")
+        setattr(self, group, _normalized(value))
+
+    def __contains__(self, group):
+        return self.get(group) is not None
+
+    def __bool__(self):
+        return any(getattr(self, group) is not None for group in SELECTION_GROUPS)
+
+    def pop(self, group, default=None):
+        value = self.get(group)
+        if value is None:
+            return default
+        setattr(self, group, None)
+        return value
+
+    def items(self):
+        return [(group, self.get(group)) for group in SELECTION_GROUPS if group in self]
+
+    def copy(self):
+        """Dizionario con le selezioni correnti (liste copiate)."""
+        return {group: list(value) if isinstance(value, list) else value for group, value in self.items()}
+
+    # ----------------------------------------------------------------------
+    # OPERAZIONI DELLA DEGUSTAZIONE
+    # ----------------------------------------------------------------------
+    def toggle(self, group, text):
+        """Selezione multipla: aggiunge 'text' alla lista del gruppo, o lo toglie se c'è già."""
+        current = self.get(group)
+        current = current if isinstance(current, list) else []
+        if text in current:
+            self[group] = [item for item in current if item != text]
+        else:
+            self[group] = current + [text]
+
+    def load(self, selections):
+        """Sostituisce tutte le selezioni (es. scheda da modificare). Le chiavi che non sono
+        gruppi di selezione vengono ignorate; cambiano solo i gruppi con un valore diverso."""
+        for group in SELECTION_GROUPS:
+            setattr(self, group, _normalized(selections.get(group)))
+
+    def clear(self):
+        """Azzera la degustazione: notifica solo i gruppi che avevano una selezione."""
+        for group in SELECTION_GROUPS:
+            if getattr(self, group) is not None:
+                setattr(self, group, None)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Profilo dei tempi di avvio dell'app.
+
+main.py importa questo modulo PER PRIMO: l'istante dell'import è lo zero dei tempi.
+PROFILER registra poi, con time.perf_counter (monotono):
+
+- le fasi dell'avvio, in sequenza (mark): import dei moduli, finestra, KV
+  condivisi, build, on_start, fino al primo frame disegnato;
+- le operazioni misurate con measure(): costruzione di ogni schermata (anche
+  dentro build), apertura degli archivi (anche dal thread di pre-caricamento).
+
+La registrazione costa qualche chiamata a perf_counter ed è sempre attiva fino al
+primo frame disegnato, dove finish() la chiude; il report viene scritto solo se
+l'avvio è profilato (variabile d'ambiente WINEAPP_STARTUP_PROFILE, oppure
+WineApp.PROFILE_STARTUP): in quel caso finish() scrive il report JSON e ne
+stampa un riepilogo leggibile. Con
+WINEAPP_STARTUP_PROFILE=1 il file è REPORT_FILE, con un altro valore è il
+percorso del file, es.:
+
+    WINEAPP_STARTUP_PROFILE=profili/avvio.json python main.py
+
+I report di due build si confrontano campo per campo (stessi nomi di fasi e schermate).
+"""
+import json
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Variabile d'ambiente che abilita il report, e file del report se vale '1'
+ENV_VAR = 'WINEAPP_STARTUP_PROFILE'
+REPORT_FILE = 'startup_profile.json'
+
+# Versione del formato del report JSON
+REPORT_VERSION = 1
+
+
+def report_path(enabled=False):
+    """File del report secondo WINEAPP_STARTUP_PROFILE ('enabled' = abilitato da configurazione), o None."""
+    value = os.environ.get(ENV_VAR, '').strip()
+    if value.lower() in ('', '0', 'false', 'no'):
+        return REPORT_FILE if enabled else None
+    return REPORT_FILE if value.lower() in ('1', 'true', 'yes') else value
+
+
+class StartupProfiler:
+    """
+    Tempi in millisecondi dallo zero (creazione del profiler). Ogni evento è un dizionario
+    {'nome', 'tipo', 'inizio_ms', 'durata_ms', 'thread'}: 'tipo' è 'fase' per le fasi
+    in sequenza, altrimenti il tipo passato a measure() (es. 'schermata', 'archivio').
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._last_mark = self._start
+        self._lock = threading.Lock()
+        self.events = []
+        self.finished = False
+
+    def _ms(self, instant):
+        return round((instant - self._start) * 1000, 3)
+
+    def _record(self, name, kind, start, end):
+        if self.finished:
+            return
+        event = {
+            'nome': name,
+            'tipo': kind,
+            'inizio_ms': self._ms(start),
+            'durata_ms': round((end - start) * 1000, 3),
+            'thread': threading.current_thread().name,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def mark(self, name):
+        """Chiude la fase 'name', iniziata alla fine della fase precedente."""
+        now = time.perf_counter()
+        start, self._last_mark = self._last_mark, now
+        self._record(name, 'fase', start, now)
+
+    @contextmanager
+    def measure(self, name, kind):
+        """Misura il blocco with (es. la costruzione di una schermata)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, kind, start, time.perf_counter())
+
+    # ----------------------------------------------------------------------
+    # REPORT
+    # ----------------------------------------------------------------------
+    def report(self):
+        """Report (dizionario serializzabile in JSON) con gli eventi registrati finora."""
+        with self._lock:
+            events = list(self.events)
+        phases = [event for event in events if event['tipo'] == 'fase']
+        return {
+            'versione': REPORT_VERSION,
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'piattaforma': platform.platform(),
+            'totale_ms': phases[-1]['inizio_ms'] + phases[-1]['durata_ms'] if phases else 0.0,
+            'fasi': phases,
+            'operazioni': sorted((event for event in events if event['tipo'] != 'fase'),
+                                 key=lambda event: event['inizio_ms']),
+        }
+
+    def summary(self, report):
+        """Riepilogo leggibile del report."""
+        total = report['totale_ms'] or 1.0
+        lines = [f"Avvio: {report['totale_ms']:.1f} ms fino al primo frame"]
+        for phase in report['fasi']:
+            lines.append(f"  {phase['nome']:28} {phase['durata_ms']:9.1f} ms {phase['durata_ms'] * 100 / total:5.1f}%")
+        for event in report['operazioni']:
+            name = f"{event['tipo']} {event['nome']}"
+            lines.append(f"    {name:26} {event['durata_ms']:9.1f} ms  (a {event['inizio_ms']:.1f} ms, "
+                         f"thread {event['thread']})")
+        return '\n'.join(lines)
+
+    def finish(self, path=None):
+        """
+        Chiude il profilo: gli eventi successivi non vengono più registrati. Con 'path'
+        scrive il report JSON e ne stampa il riepilogo.
+        """
+        if self.finished:
+            return None
+        report = self.report()
+        self.finished = True
+        if path is None:
+            return report
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+        print(self.summary(report))
+        print(f"Profilo dell'avvio salvato in {path}")
+        return report
+
+
+# Profiler dell'avvio: lo zero dei tempi è il primo import di questo modulo (in testa a main.py)
+PROFILER = StartupProfiler()
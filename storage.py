@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+Storage personalizzati per TinyDB usati dagli archivi dei vini.
+
+Lo storage JSON predefinito di TinyDB riserializza e riscrive l'intero file ad
+ogni insert/update/remove: con qualche migliaio di schede per colore il
+salvataggio di una singola degustazione diventa lento. JournalStorage invece
+aggiunge in coda ad un file di log una riga per ogni documento modificato e
+ricostruisce lo stato all'apertura (file base + log). Quando il log supera una
+soglia viene compattato in background riscrivendo il file base.
+
+Il file base resta nello stesso formato di JSONStorage, quindi gli archivi
+esistenti (es. 'red_wine_database.json') vengono letti senza conversioni.
+Con un 'codec' (vedi record_format.RecordCodec) le schede su disco sono invece
+liste compatte e il file base ha in più l'intestazione del formato: TinyDB vede
+comunque le schede decodificate. Un archivio nel formato precedente, o con
+schede di uno schema precedente (aggiornate in memoria dal codec), viene
+riscritto dalla prima compattazione, avviata in background all'apertura.
+Con read_only=True (es. il vecchio archivio JSON da migrare, che resta un backup)
+lo storage legge file base e journal senza creare, scrivere o compattare nulla.
+
+WriteBehindMiddleware aggiunge sopra lo storage una cache "write-behind": le
+modifiche restano in memoria finché l'app non chiama flush() (timer, pausa,
+chiusura) o finché non si supera il numero massimo di scritture non salvate.
+"""
+import json
+import os
+import threading
+
+from tinydb.middlewares import CachingMiddleware
+from tinydb.storages import Storage
+
+
+class JournalStorage(Storage):
+    """
+    Storage TinyDB "append-only": ogni mutazione scrive solo le righe dei
+    documenti cambiati nel file '<path>.journal'.
+
+    Formato di una riga del journal (JSON compatto, una per riga):
+        {"op": "set", "t": "_default", "id": "3", "doc": {...}}
+        {"op": "del", "t": "_default", "id": "3"}
+        {"op": "drop", "t": "_default"}
+        {"op": "formato", "formato": {"versione": 1, "vocabolario": {...}}}
+    Le operazioni sono idempotenti, quindi rieseguire il log su un file base
+    già compattato produce sempre lo stesso stato. La riga "formato" precede
+    le schede che usano codici nuovi del vocabolario.
+    """
+
+    # Numero di righe del journal oltre il quale parte la compattazione
+    DEFAULT_COMPACT_THRESHOLD = 500
+
+    # Chiave dell'intestazione del formato compatto nel file base (non è una tabella)
+    FORMAT_KEY = '__formato__'
+
+    def __init__(self, path, compact_threshold=DEFAULT_COMPACT_THRESHOLD, encoding='utf-8', codec=None,
+                 read_only=False, **kwargs):
+        super().__init__()
+
+        self._path = path
+        self._codec = codec
+        self._journal_path = path + '.journal'
+        # Journal "congelato" durante una compattazione in corso (o interrotta da un crash)
+        self._compacting_path = path + '.journal.compacting'
+        self._encoding = encoding
+        self._compact_threshold = compact_threshold
+        self._read_only = read_only
+
+        # Protegge self._data, il file del journal e l'avvio della compattazione
+        self._lock = threading.Lock()
+        self._compactor = None
+
+        # 1. Ricostruisce lo stato: file base + journal congelato + journal corrente
+        self._data, compact_base = self._load_base()
+        self._entries = self._replay(self._compacting_path)
+        self._entries += self._replay(self._journal_path)
+
+        # 2. Apre il journal in append per le prossime scritture (in sola lettura: nessun file)
+        self._journal = None if read_only else open(self._journal_path, mode='a', encoding=self._encoding)
+
+        # 3. Se un crash ha interrotto una compattazione, la riprende subito; con il codec
+        #    la compattazione converte anche un file base ancora nel formato precedente e
+        #    riscrive le schede di uno schema precedente. In sola lettura i file restano come sono.
+        upgrade = (self._codec is not None and any(self._data.values())
+                   and (not compact_base or self._codec.stale > 0))
+        if not read_only and (os.path.exists(self._compacting_path) or self._entries > self._compact_threshold
+                              or upgrade):
+            self._start_compaction()
+
+        # 4. Firma dei file come li abbiamo lasciati noi (vedi changed_on_disk)
+        self._signature = self._disk_signature()
+
+    # ----------------------------------------------------------------------
+    # INTERFACCIA STORAGE DI TINYDB
+    # ----------------------------------------------------------------------
+    def read(self):
+        """Restituisce una copia dello stato in memoria (nessun accesso al disco)."""
+        with self._lock:
+            if not self._data:
+                # Database vuoto: TinyDB si aspetta None per inizializzarsi
+                return None
+
+            # TinyDB modifica i documenti "sul posto" durante gli update, quindi
+            # restituiamo copie per poter poi calcolare le differenze in write().
+            return {
+                table_name: {doc_id: dict(doc) for doc_id, doc in table.items()}
+                for table_name, table in self._data.items()
+            }
+
+    def write(self, data):
+        """Confronta il nuovo stato con quello attuale e accoda solo le differenze."""
+        if self._read_only:
+            raise PermissionError(f"Archivio '{self._path}' aperto in sola lettura")
+        with self._lock:
+            entries = self._diff(self._data, data)
+
+            if entries:
+                lines = [self._encode(entry) for entry in entries]
+                # Vocabolario cresciuto durante la codifica: va salvato prima delle schede
+                header = self._codec.take_header() if self._codec is not None else None
+                if header is not None:
+                    lines.insert(0, self._encode({'op': 'formato', 'formato': header}))
+                self._journal.write(''.join(line + '\n' for line in lines))
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._entries += len(entries)
+                self._signature = self._disk_signature()
+
+            # Da qui in poi 'data' è lo stato di riferimento: TinyDB non ne conserva
+            # riferimenti, e read() restituisce sempre copie, quindi non verrà mai
+            # modificato sul posto (la compattazione può usarlo senza copiarlo).
+            self._data = data
+
+            if self._entries > self._compact_threshold and self._compactor is None:
+                self._start_compaction()
+                self._signature = self._disk_signature()
+
+    def changed_on_disk(self):
+        """True se il file base o il journal sono stati modificati da qualcun altro dopo
+        l'ultima lettura/scrittura di questo storage (confronto di dimensione e data di modifica)."""
+        with self._lock:
+            return self._disk_signature() != self._signature
+
+    def close(self):
+        """Attende l'eventuale compattazione in corso e chiude il journal."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+        with self._lock:
+            if self._journal is not None and not self._journal.closed:
+                self._journal.close()
+
+    # ----------------------------------------------------------------------
+    # CARICAMENTO E REPLAY
+    # ----------------------------------------------------------------------
+    def _load_base(self):
+        """
+        Legge il file base (formato JSONStorage, eventualmente con schede compatte).
+        Restituisce (dati, True se il file è nel formato compatto); ({}, False) se assente o vuoto.
+        """
+        if not os.path.exists(self._path) or os.path.getsize(self._path) == 0:
+            return {}, False
+
+        with open(self._path, mode='r', encoding=self._encoding) as handle:
+            data = json.load(handle)
+
+        header = data.pop(self.FORMAT_KEY, None)
+        if header is None:
+            return data, False
+
+        self._load_header(header)
+        return self._convert(data, self._codec.decode), True
+
+    def _load_header(self, header):
+        """Passa al codec l'intestazione del formato letta dal file base o dal journal."""
+        self._require_codec().load_header(header)
+
+    def _require_codec(self):
+        if self._codec is None:
+            raise ValueError(f"L'archivio '{self._path}' è nel formato compatto: serve un codec per leggerlo")
+        return self._codec
+
+    @staticmethod
+    def _convert(data, convert):
+        """Applica 'convert' a tutti i documenti di tutte le tabelle."""
+        return {
+            table_name: {doc_id: convert(doc) for doc_id, doc in table.items()}
+            for table_name, table in data.items()
+        }
+
+    def _replay(self, journal_path):
+        """Riapplica le righe di un journal su self._data. Restituisce il numero di righe lette."""
+        if not os.path.exists(journal_path):
+            return 0
+
+        count = 0
+        with open(journal_path, mode='r', encoding=self._encoding) as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Riga troncata da un crash durante l'append: è sempre l'ultima, la ignoriamo
+                    print(f"ATTENZIONE: riga del journal '{journal_path}' illeggibile, ignorata.")
+                    continue
+
+                if entry['op'] == 'formato':
+                    self._load_header(entry['formato'])
+                else:
+                    if isinstance(entry.get('doc'), list):
+                        entry['doc'] = self._require_codec().decode(entry['doc'])
+                    self._apply(self._data, entry)
+                count += 1
+
+        return count
+
+    def _disk_signature(self):
+        """Dimensione e data di modifica (ns) del file base e del journal; None se assenti."""
+        signature = []
+        for path in (self._path, self._journal_path):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    @staticmethod
+    def _apply(data, entry):
+        """Applica una singola operazione del journal allo stato 'data'."""
+        op = entry['op']
+        table_name = entry['t']
+
+        if op == 'set':
+            data.setdefault(table_name, {})[entry['id']] = entry['doc']
+        elif op == 'del':
+            data.get(table_name, {}).pop(entry['id'], None)
+        elif op == 'table':
+            data.setdefault(table_name, {})
+        elif op == 'drop':
+            data.pop(table_name, None)
+
+    @staticmethod
+    def _diff(old, new):
+        """Calcola le operazioni di journal che trasformano 'old' in 'new'."""
+        entries = []
+
+        for table_name, table in new.items():
+            old_table = old.get(table_name)
+            if old_table is None:
+                entries.append({'op': 'table', 't': table_name})
+                old_table = {}
+
+            for doc_id, doc in table.items():
+                if old_table.get(doc_id) != doc:
+                    entries.append({'op': 'set', 't': table_name, 'id': doc_id, 'doc': doc})
+
+            for doc_id in old_table.keys() - table.keys():
+                entries.append({'op': 'del', 't': table_name, 'id': doc_id})
+
+        for table_name in old.keys() - new.keys():
+            entries.append({'op': 'drop', 't': table_name})
+
+        return entries
+
+    def _encode(self, entry):
+        if self._codec is not None and 'doc' in entry:
+            entry = dict(entry, doc=self._codec.encode(entry['doc']))
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+    # ----------------------------------------------------------------------
+    # COMPATTAZIONE IN BACKGROUND
+    # ----------------------------------------------------------------------
+    def _start_compaction(self):
+        """
+        Congela il journal corrente e avvia un thread che riscrive il file base.
+        Va chiamato con self._lock acquisito (o dal costruttore).
+        """
+        # 1. Ruota il journal: le righe già scritte confluiscono in quello "congelato"
+        self._journal_rotate()
+
+        # 2. Lo stato attuale non verrà più modificato sul posto (vedi write()),
+        #    quindi il thread può serializzarlo senza copiarlo.
+        snapshot = self._data
+        self._entries = 0
+
+        self._compactor = threading.Thread(target=self._compact, args=(snapshot,), daemon=True)
+        self._compactor.start()
+
+    def _journal_rotate(self):
+        """Sposta il journal corrente in quello congelato e ne apre uno nuovo, vuoto."""
+        journal = getattr(self, '_journal', None)
+        if journal is not None and not journal.closed:
+            journal.close()
+
+        if os.path.exists(self._journal_path):
+            if os.path.exists(self._compacting_path):
+                # Compattazione precedente interrotta: accodiamo al journal congelato
+                with open(self._journal_path, mode='r', encoding=self._encoding) as src, \
+                        open(self._compacting_path, mode='a', encoding=self._encoding) as dst:
+                    dst.write(src.read())
+                os.remove(self._journal_path)
+            else:
+                os.replace(self._journal_path, self._compacting_path)
+
+        self._journal = open(self._journal_path, mode='a', encoding=self._encoding)
+
+    def _compact(self, snapshot):
+        """Scrive 'snapshot' nel file base in modo atomico e rimuove il journal congelato."""
+        tmp_path = self._path + '.tmp'
+        try:
+            if self._codec is not None:
+                # L'intestazione si legge DOPO la codifica: contiene tutti i codici usati
+                snapshot = self._convert(snapshot, self._codec.encode)
+                snapshot[self.FORMAT_KEY] = self._codec.header()
+
+            with open(tmp_path, mode='w', encoding=self._encoding) as handle:
+                json.dump(snapshot, handle, ensure_ascii=False, separators=(',', ':'))
+                handle.flush()
+                os.fsync(handle.fileno())
+
+            # Sostituzione atomica: in caso di crash resta il vecchio base o il nuovo,
+            # e il replay del journal congelato porta comunque allo stato corretto.
+            with self._lock:
+                os.replace(tmp_path, self._path)
+                os.remove(self._compacting_path)
+                # Il nuovo file base l'abbiamo scritto noi: non è una modifica esterna
+                self._signature = self._disk_signature()
+        except OSError as e:
+            print(f"ERRORE COMPATTAZIONE JOURNAL '{self._path}': {e}")
+        finally:
+            with self._lock:
+                self._compactor = None
+
+
+class WriteBehindMiddleware(CachingMiddleware):
+    """
+    Cache in memoria con scrittura differita per TinyDB.
+
+    Le letture e le scritture lavorano sulla cache; il disco viene aggiornato
+    solo da flush(). Per limitare i dati persi in caso di crash, il flush parte
+    da solo quando le scritture in sospeso raggiungono 'max_pending'.
+    """
+
+    # Numero massimo di scritture (schede salvate/eliminate) tenute solo in memoria
+    DEFAULT_MAX_PENDING = 5
+
+    def __init__(self, storage_cls, max_pending=DEFAULT_MAX_PENDING):
+        super().__init__(storage_cls)
+        self.WRITE_CACHE_SIZE = max_pending
+
+    @property
+    def pending(self):
+        """Numero di scritture non ancora portate su disco."""
+        return self._cache_modified_count
+
+    def doc_ids(self, table_name):
+        """doc_id della tabella in ordine di inserimento, letti dalle chiavi della cache (nessun Document creato)."""
+        table = (self.read() or {}).get(table_name, {})
+        return [int(doc_id) for doc_id in table]
+
+    def flush(self):
+        """Scrive su disco lo stato in cache, se ci sono modifiche in sospeso."""
+        if self._cache_modified_count > 0:
+            # TinyDB modifica i documenti in cache "sul posto": allo storage
+            # sottostante passiamo una copia, che da qui in poi resterà invariata.
+            snapshot = {
+                table_name: {doc_id: dict(doc) for doc_id, doc in table.items()}
+                for table_name, table in (self.cache or {}).items()
+            }
+            self.storage.write(snapshot)
+            self._cache_modified_count = 0
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Schema dichiarativo della degustazione.
+
+Elenca, nell'ordine delle schermate, le fasi (vista, naso, palato, conclusioni)
+e per ogni fase i gruppi di bottoni: campo della scheda, selezione singola o
+multipla, disposizione e opzioni, uguali per tutti i colori o diverse per colore.
+
+Dallo schema vengono generati:
+- le schermate della degustazione (TastingScreen in main.py, un'unica regola KV
+  per le 12 schermate: i gruppi di bottoni sono costruiti dallo schema);
+- l'ordine dei campi a selezione nella scheda salvata (TASTING_FIELDS);
+- le righe del popup di dettaglio delle schede (DETAIL_ROWS);
+- il vocabolario iniziale del formato compatto (vocabulary, vedi record_format).
+
+PER AGGIUNGERE UN'OPZIONE basta aggiungerla qui. PER AGGIUNGERE UN GRUPPO il
+campo va anche accodato a SELECTION_FIELDS in record_format (con la migrazione
+dello schema della scheda), che fissa la posizione del campo su disco.
+"""
+from collections import namedtuple
+
+
+# Colori dei vini, nell'ordine degli archivi (vedi repository.ARCHIVE_FILES)
+WINE_COLORS = ('rosso', 'bianco', 'rosato')
+
+# Disposizione dei bottoni di un gruppo
+ROW = 'riga'  # etichetta e bottoni su una riga
+COLUMNS = 'colonne'  # etichetta e più colonne di bottoni con titolo (es. profumi primari/secondari/terziari)
+COLUMN = 'colonna'  # etichetta e una colonna di bottoni (es. livello di qualità)
+
+# Le etichette più lunghe di LONG_LABEL caratteri usano il font ridotto del gruppo (small_font_size)
+LONG_LABEL = 8
+
+# Stile di ogni colore: classe KV delle etichette, colore del testo dei bottoni e font dei
+# bottoni per i gruppi senza font_size
+Theme = namedtuple('Theme', ('label_class', 'button_color', 'font_size'))
+
+THEMES = {
+    'rosso': Theme('RedWineLabel', (0.6, 0.2, 0.4, 1), 20),  # Viola-Rosso
+    'bianco': Theme('WhiteWineLabel', (0.9, 0.7, 0.1, 1.0), 15),  # Giallo-oro luminoso
+    'rosato': Theme('PinkWineLabel', (0.85, 0.6, 0.8, 1.0), 15),  # Rosa malva
+}
+
+# Fase della degustazione: 'row_height' è l'altezza fissa delle righe (None = le righe si
+# dividono lo spazio della schermata); 'spacing' è la distanza fra i gruppi
+Phase = namedtuple('Phase', ('name', 'groups', 'spacing', 'row_height'))
+
+# Gruppo di bottoni. 'label' è il testo sulla schermata, 'title' il nome del gruppo nel
+# popup del filtro per descrittori. 'options' è una tupla di etichette uguale per tutti i
+# colori oppure un dizionario colore -> tupla; per i gruppi COLUMNS è una tupla di Column.
+# Le larghezze sono size_hint_x relativi di etichetta e bottoni; 'height' è l'altezza dei gruppi
+# COLUMN (quella dei gruppi COLUMNS dipende dal numero di bottoni della colonna più lunga).
+Group = namedtuple('Group', (
+    'field', 'label', 'title', 'multiple', 'layout', 'options',
+    'label_width', 'button_width', 'spacing', 'font_size', 'small_font_size', 'height',
+), defaults=(ROW, (), 0.5, 0.6, 5, None, None, None))
+
+# Colonna di un gruppo COLUMNS: 'part' compone l'ID del BOX (es. 'profumo_primari_rosso_box')
+Column = namedtuple('Column', ('part', 'title', 'options'))
+
+
+PHASES = (
+    Phase('vista', spacing=15, row_height=35, groups=(
+        Group('limpidezza', 'Limpidezza', 'Limpidezza', False, options=('Limpido', 'Torbido')),
+        Group('intensita_vista', 'Intensità', 'Intensità (vista)', False,
+              options=('Pallido', 'Medio', 'Intenso'), label_width=0.8, button_width=0.7, spacing=4),
+        Group('colore', 'Colore', 'Colore', True, options={
+            'rosso': ('Porpora', 'Rubino', 'Granata', 'Mattone', 'Marrone'),
+            'bianco': ('Giallo lime', 'Paglierino', 'Oro', 'Ambrato', 'Marrone'),
+            'rosato': ('Rosa', 'Rosa arancio', 'Arancione'),
+        }, label_width=0.7, button_width=0.5, spacing=2, font_size=11, small_font_size=10),
+    )),
+    Phase('naso', spacing=15, row_height=35, groups=(
+        Group('condizione', 'Condizione', 'Condizione', False, options=('Pulito', 'Non Pulito')),
+        Group('intensita_naso', 'Intensità', 'Intensità (naso)', False,
+              options=('Bassa', 'Media', 'Alta'), label_width=0.8, button_width=0.7, spacing=4),
+        Group('profumo', 'Profumo', 'Profumi', True, COLUMNS, options=(
+            Column('primari', 'Primari', {
+                'rosso': ('Ciliegia', 'Mora', 'Peperone verde', 'Prugna', 'Ribes nero', 'Violetta'),
+                'bianco': ('Albicocca', 'Ananas', 'Banana', 'Limone', 'Mango', 'Pesca', 'Pompelmo'),
+                'rosato': ('Arancia rossa', 'Ciliegia', 'Fragola', 'Lampone', 'Mango', 'Melone', 'Pompelmo rosa'),
+            }),
+            Column('secondari', 'Secondari', {
+                'rosso': ('Burro', 'Lievito', 'Pane tostato'),
+                'bianco': ('Basilico', 'Fiori bianchi', 'Salvia', 'Timo'),
+                'rosato': ('Basilico', 'Menta', 'Rosa', 'Violetta'),
+            }),
+            Column('terzari', 'Terziari', {
+                'rosso': ('Cacao', 'Catrame', 'Cuoio', 'Spezie', 'Tabacco', 'Vaniglia'),
+                'bianco': ('Cannella', 'Note minerali', 'Vaniglia', 'Zafferano'),
+                'rosato': ('Cannella', 'Note minerali', 'Vaniglia'),
+            }),
+        ), label_width=0.4, spacing=2, font_size=11, small_font_size=9),
+    )),
+    Phase('palato', spacing=3, row_height=None, groups=(
+        Group('dolcezza', 'Dolcezza', 'Dolcezza', False, options=('Secco', 'Abboccato', 'Amabile', 'Dolce'),
+              label_width=0.3, button_width=0.17, spacing=2, font_size=11, small_font_size=9),
+        Group('acidita', 'Acidità', 'Acidità', False, options=('Bassa', 'Media', 'Alta'),
+              label_width=0.4, button_width=0.3, spacing=3, font_size=11),
+        Group('tannicita', 'Tannicità', 'Tannicità', False, options=('Bassa', 'Media', 'Alta'),
+              label_width=0.4, button_width=0.3, spacing=3, font_size=11),
+        Group('livello_alcolico', 'Liv.Alcolico', 'Livello alcolico', False, options=('Basso', 'Medio', 'Alto'),
+              label_width=0.4, button_width=0.3, spacing=3, font_size=11),
+        Group('corpo', 'Corpo', 'Corpo', False, options=('Basso', 'Medio', 'Alto'),
+              label_width=0.4, button_width=0.3, spacing=3, font_size=11),
+        Group('sapore', 'Sapore', 'Sapori', True, COLUMNS, options=(
+            Column('primari', 'Primari', {
+                'rosso': ('Ciliegia', 'Mora', 'Peperone verde', 'Prugna', 'Ribes nero'),
+                'bianco': ('Ananas', 'Lime', 'Limone', 'Mela', 'Papaya', 'Pera', 'Pesca', 'Pompelmo'),
+                'rosato': ('Arancia rossa', 'Ciliegia', 'Fragola', 'Lampone', 'Mango', 'Melone', 'Pompelmo rosa'),
+            }),
+            Column('secondari', 'Secondari', {
+                'rosso': ("Caffe'", 'Caramello', 'Ferro', 'Frutta Secca', 'Miele', 'Pane Tostato', 'Pietra'),
+                'bianco': ('Asparagi', 'Erba tagliata', 'Fiori bianchi', 'Foglia pomodoro'),
+                'rosato': ('Basilico', 'Menta', 'Rosa', 'Violetta'),
+            }),
+            Column('terzari', 'Terziari', {
+                'rosso': ('Cacao', 'Foglie Secche', 'Funghi', 'Spezie', 'Tabacco', 'Vaniglia'),
+                'bianco': ('Cannella', 'Noce moscata', 'Note minerali', 'Vaniglia'),
+                'rosato': ('Cannella', 'Note minerali', 'Vaniglia'),
+            }),
+        ), label_width=0.42, spacing=2, font_size=10, small_font_size=8),
+        Group('persistenza', 'Persistenza', 'Persistenza', False, options=('Corta', 'Media', 'Lunga'),
+              label_width=0.4, button_width=0.3, spacing=3, font_size=11),
+    )),
+    Phase('conclusioni', spacing=15, row_height=35, groups=(
+        Group('qualita', 'Livello di Qualità', 'Qualità', False, COLUMN,
+              options=('Difettoso', 'Mediocre', 'Discreto', 'Buono', 'Molto Buono', 'Eccellente'),
+              label_width=0.85, button_width=0.75, spacing=5, font_size=15, height=200),
+    )),
+)
+
+# Nel popup di dettaglio di una scheda: titolo della riga e campi mostrati (separati da " / ")
+DETAIL_ROWS = (
+    ("Vista (Limpidezza / Intensità / Colore):\n", ('limpidezza', 'intensita_vista', 'colore')),
+    ("Olfatto (Condizione / Intensità):\n", ('condizione', 'intensita_naso')),
+    ("Profumi: ", ('profumo',)),
+    ("Palato: ", ('dolcezza',)),
+    ("Corpo / Acidità / Tannini / Alcol:\n", ('corpo', 'acidita', 'tannicita', 'livello_alcolico')),
+    ("Sapori: ", ('sapore',)),
+    ("Persistenza / Qualità:\n", ('persistenza', 'qualita')),
+)
+
+
+# Gruppi per campo e campi a selezione nell'ordine delle schermate
+GROUPS = {group.field: group for phase in PHASES for group in phase.groups}
+TASTING_FIELDS = tuple(GROUPS)
+
+
+def for_color(options, wine_color):
+    """Opzioni (o colonne) per il colore indicato."""
+    return options[wine_color] if isinstance(options, dict) else options
+
+
+def group_columns(group, wine_color):
+    """
+    Colonne di bottoni del gruppo per un colore: lista di (ID del BOX, titolo, etichette).
+    I gruppi ROW e COLUMN hanno una sola colonna senza titolo.
+    """
+    suffix = '_' + wine_color + '_box'
+    if group.layout != COLUMNS:
+        return [(group.field + suffix, None, for_color(group.options, wine_color))]
+    return [(f'{group.field}_{column.part}{suffix}', column.title, for_color(column.options, wine_color))
+            for column in group.options]
+
+
+def group_options(field, wine_color):
+    """Tutte le etichette del gruppo per un colore, nell'ordine delle schermate."""
+    return [label for _, _, labels in group_columns(GROUPS[field], wine_color) for label in labels]
+
+
+def vocabulary():
+    """
+    Etichette di ogni campo a selezione, nell'ordine delle schermate e dei colori
+    (unione dei tre colori): {'limpidezza': ['Limpido', 'Torbido'], ...}.
+    """
+    labels = {field: [] for field in TASTING_FIELDS}
+    for field in TASTING_FIELDS:
+        for wine_color in WINE_COLORS:
+            for label in group_options(field, wine_color):
+                if label not in labels[field]:
+                    labels[field].append(label)
+    return labels
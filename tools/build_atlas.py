@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Crea gli atlanti Kivy delle immagini di materiale/ (materiale/atlas/<gruppo>.atlas + png).
+
+Ogni atlante raccoglie le immagini usate insieme (schermata iniziale, scelta del vino,
+schermate di un colore, bottoni comuni): la prima apertura di una schermata carica e
+invia alla GPU una sola texture invece di un file per immagine, e le immagini della
+stessa schermata condividono la texture.
+
+Nei file KV e nel codice le immagini si indicano con il percorso dell'atlante:
+    'atlas://materiale/atlas/<gruppo>/<nome senza .png>'
+es. 'atlas://materiale/atlas/rosso/base_vista_rosso'.
+
+Non vengono create varianti ridotte: le immagini sono disegnate per la finestra minima
+(320x480, densità 1) e su ogni schermo reale vengono mostrate alla loro dimensione o
+ingrandite, quindi una variante più piccola toglierebbe solo dettaglio.
+
+Le immagini originali restano in materiale/ come sorgenti: dopo averne modificata o
+aggiunta una (aggiungendola anche a ATLAS_GROUPS) si rigenerano gli atlanti.
+
+Uso (dalla cartella del progetto):
+    python tools/build_atlas.py
+    python tools/build_atlas.py --check   # verifica solo i riferimenti atlas:// di kv/ e main.py
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SOURCE_DIR = os.path.join(PROJECT_DIR, 'materiale')
+ATLAS_DIR = os.path.join(SOURCE_DIR, 'atlas')
+
+# Gruppo (nome dell'atlante) -> immagini di materiale/ (senza .png)
+ATLAS_GROUPS = {
+    # Sfondo delle schermate e menu, usati ovunque
+    'comune': (
+        'iniziale_background',
+        'menu_tre_linee', 'menu_tre_linee_cliccato',
+        'menu_archivio_rossi', 'menu_archivio_rossi_cliccato',
+        'menu_archivio_bianchi', 'menu_archivio_bianchi_cliccato',
+        'menu_archivio_rosati', 'menu_archivio_rosati_cliccato',
+        'menu_vai_a_degustazione', 'menu_vai_a_degustazione_cliccato',
+        'menu_esci', 'menu_esci_cliccato',
+    ),
+    # WelcomeScreen
+    'benvenuto': ('iniziale', 'inizia', 'inizia_cliccato'),
+    # WineSelectionScreen
+    'selezione': (
+        'che_vino_stai_degustando', 'rosso_bianco_rosato',
+        'rosso', 'rosso_cliccato', 'bianco', 'bianco_cliccato', 'rosato', 'rosato_cliccato',
+    ),
+    # Schermate di un colore: degustazione, INFO e archivio
+    'rosso': (
+        'scheda_degustazione_rosso', 'base_vista_rosso', 'base_naso_rosso', 'base_palato_rosso',
+        'base_conclusioni_rosso', 'base_info_rosso', 'archivio_rossi_base',
+    ),
+    'bianco': (
+        'scheda_degustazione_bianco', 'base_vista_bianco', 'base_naso_bianco', 'base_palato_bianco',
+        'base_conclusioni_bianco', 'base_info_bianco', 'archivio_bianchi_base',
+    ),
+    'rosato': (
+        'scheda_degustazione_rosato', 'base_vista_rosato', 'base_naso_rosato', 'base_palato_rosato',
+        'base_conclusioni_rosato', 'base_info_rosato', 'archivio_rosati_base',
+    ),
+}
+
+# Dimensioni (pixel, potenze di 2) provate per ogni atlante, dalla più piccola: si usa la prima
+# in cui le immagini entrano in una sola texture
+_SIDES = (128, 256, 512, 1024, 2048)
+ATLAS_SIZES = sorted(((width, height) for width in _SIDES for height in _SIDES),
+                     key=lambda size: (size[0] * size[1], size[1]))
+
+# Riferimenti alle immagini nei file KV e nel codice
+ATLAS_REFERENCE = re.compile(r"atlas://materiale/atlas/(\w+)/(\w+)")
+IMAGE_REFERENCE = re.compile(r"materiale/(?!atlas/)[\w%]+\.png")
+
+
+def build_atlas(group, names):
+    """Crea l'atlante del gruppo nella dimensione più piccola che lo contiene in una sola texture."""
+    from kivy.atlas import Atlas
+
+    filenames = [os.path.join(SOURCE_DIR, name + '.png') for name in names]
+    outname = os.path.join(ATLAS_DIR, group)
+    for size in ATLAS_SIZES:
+        for stale in glob.glob(outname + '-*.png'):
+            os.remove(stale)
+        result = Atlas.create(outname, filenames, size)
+        if result and len(result[1]) == 1:
+            return size
+    raise ValueError(f"Le immagini dell'atlante '{group}' non entrano in una texture %dx%d" % ATLAS_SIZES[-1])
+
+
+def source_files():
+    """File KV e Python che usano le immagini."""
+    return sorted(glob.glob(os.path.join(PROJECT_DIR, 'kv', '**', '*.kv'), recursive=True)) + [
+        os.path.join(PROJECT_DIR, 'main.py')]
+
+
+def check_references():
+    """Errori: riferimenti atlas:// a immagini che non sono negli atlanti, o PNG non in atlante."""
+    available = {}
+    for path in glob.glob(os.path.join(ATLAS_DIR, '*.atlas')):
+        with open(path, encoding='utf-8') as handle:
+            group = os.path.splitext(os.path.basename(path))[0]
+            available[group] = {name for page in json.load(handle).values() for name in page}
+
+    errors = []
+    for path in source_files():
+        with open(path, encoding='utf-8') as handle:
+            text = handle.read()
+        relative = os.path.relpath(path, PROJECT_DIR)
+        for group, name in ATLAS_REFERENCE.findall(text):
+            if name not in available.get(group, ()):
+                errors.append(f"{relative}: immagine '{group}/{name}' assente dagli atlanti")
+        for reference in IMAGE_REFERENCE.findall(text):
+            errors.append(f"{relative}: '{reference}' non usa un atlante")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--check', action='store_true', help='verifica i riferimenti senza rigenerare gli atlanti')
+    args = parser.parse_args()
+
+    if not args.check:
+        os.makedirs(ATLAS_DIR, exist_ok=True)
+        for group, names in ATLAS_GROUPS.items():
+            width, height = build_atlas(group, names)
+            print(f"  {group:10} {len(names):3} immagini -> {width}x{height}")
+
+    errors = check_references()
+    for error in errors:
+        print(error)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
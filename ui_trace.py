@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Tracciamento dei tempi delle interazioni lente dell'interfaccia.
+
+I metodi decorati con @traced (ingresso nelle schermate INFO e archivio, caricamento
+dell'archivio, popup di dettaglio delle schede, modifica e salvataggio di una scheda)
+vengono cronometrati quando il tracciamento è attivo (variabile d'ambiente
+WINEAPP_UI_TRACE). Per ogni chiamata TRACER registra, in un buffer circolare delle
+ultime TRACE_CAPACITY chiamate:
+
+- la durata del metodo;
+- i widget creati durante la chiamata;
+- il tempo fino al frame successivo (il metodo più il layout e il disegno dei widget
+  che ha creato o modificato) e quanti frame sono andati persi rispetto a maxfps.
+
+Con WINEAPP_UI_TRACE_OVERLAY=1 le ultime chiamate vengono mostrate in sovrimpressione
+sulla finestra; alla chiusura dell'app il buffer viene salvato nel formato "Chrome
+trace" (apribile con chrome://tracing o https://ui.perfetto.dev). Con
+WINEAPP_UI_TRACE=1 il file è TRACE_FILE, con un altro valore è il percorso del file:
+
+    WINEAPP_UI_TRACE=tracce/ui.json WINEAPP_UI_TRACE_OVERLAY=1 python main.py
+
+La variabile viene letta all'import: senza tracciamento @traced restituisce il
+metodo originale, senza alcun costo sulle chiamate.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+from kivy.config import Config
+from kivy.core.window import Window
+from kivy.uix.label import Label
+from kivy.uix.widget import Widget
+
+
+# Variabili d'ambiente che abilitano il tracciamento e la sovrimpressione, e file della traccia se vale '1'
+ENV_VAR = 'WINEAPP_UI_TRACE'
+OVERLAY_ENV_VAR = 'WINEAPP_UI_TRACE_OVERLAY'
+TRACE_FILE = 'ui_trace.json'
+
+# Chiamate tenute nel buffer circolare, e mostrate in sovrimpressione
+TRACE_CAPACITY = 256
+OVERLAY_LINES = 6
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').strip().lower() not in ('', '0', 'false', 'no')
+
+
+def trace_path():
+    """File della traccia secondo WINEAPP_UI_TRACE, o None se il tracciamento non è attivo."""
+    value = os.environ.get(ENV_VAR, '').strip()
+    if not _env_flag(ENV_VAR):
+        return None
+    return TRACE_FILE if value.lower() in ('1', 'true', 'yes') else value
+
+
+class UiTracer:
+    """
+    Buffer circolare delle chiamate tracciate. Ogni evento è un dizionario
+    {'nome', 'inizio_ms', 'durata_ms', 'widget', 'frame_ms', 'frame_persi'}, con i tempi in
+    millisecondi dalla creazione del tracer; 'frame_ms' e 'frame_persi' vengono completati
+    al frame successivo alla chiamata (None fino ad allora).
+    """
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.events = deque(maxlen=capacity)
+        self.enabled = False
+        self.show_overlay = False
+        self.widgets_created = 0
+        self._start = time.perf_counter()
+        self._pending = []  # (evento, istante d'inizio) in attesa del frame successivo
+        self._overlay = None
+
+    def enable(self, overlay=False):
+        """Attiva il tracciamento: da qui in poi vengono contati i widget creati."""
+        if self.enabled:
+            return
+        self.enabled = True
+        self.show_overlay = overlay
+
+        # Contatore dei widget: ogni classe di widget passa da Widget.__init__ (con super())
+        widget_init = Widget.__init__
+        tracer = self
+
+        def counting_init(widget, **kwargs):
+            tracer.widgets_created += 1
+            widget_init(widget, **kwargs)
+
+        Widget.__init__ = counting_init
+
+    @contextmanager
+    def span(self, name):
+        """Traccia il blocco with come una chiamata 'name' (niente se il tracciamento non è attivo)."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        widgets = self.widgets_created
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {
+                'nome': name,
+                'inizio_ms': round((start - self._start) * 1000, 3),
+                'durata_ms': round((end - start) * 1000, 3),
+                'widget': self.widgets_created - widgets,
+                'frame_ms': None,
+                'frame_persi': None,
+            }
+            self.events.append(event)
+            # Le chiamate tracciate avvengono sul thread di Kivy: il frame successivo le completa
+            if threading.current_thread() is threading.main_thread():
+                if not self._pending:
+                    Window.bind(on_flip=self._on_flip)
+                self._pending.append((event, start))
+
+    def _on_flip(self, window):
+        now = time.perf_counter()
+        maxfps = Config.getint('graphics', 'maxfps')
+        frame_interval_ms = 1000 / (maxfps if maxfps > 0 else 60)
+        for event, start in self._pending:
+            event['frame_ms'] = round((now - start) * 1000, 3)
+            # Frame che non sono stati disegnati nel tempo della chiamata e del frame che la segue
+            event['frame_persi'] = max(0, math.ceil(event['frame_ms'] / frame_interval_ms) - 1)
+        self._pending = []
+        window.unbind(on_flip=self._on_flip)
+        if self.show_overlay:
+            self._update_overlay(window)
+
+    # ----------------------------------------------------------------------
+    # SOVRIMPRESSIONE
+    # ----------------------------------------------------------------------
+    def _update_overlay(self, window):
+        if self._overlay is None:
+            # Creata fuori dalle chiamate tracciate: non conta fra i loro widget
+            self._overlay = Label(size_hint=(None, None), halign='left', valign='top', font_size=10,
+                                  color=(1, 1, 0.3, 1), outline_width=1, outline_color=(0, 0, 0))
+            self._overlay.bind(texture_size=self._overlay.setter('size'))
+        if self._overlay.parent is None:
+            window.add_widget(self._overlay)
+        events = list(self.events)[-OVERLAY_LINES:]
+        self._overlay.text = '\n'.join(
+            f"{event['nome'][-34:]}  {event['durata_ms']:.1f}/{event['frame_ms']:.1f} ms  "
+            f"w {event['widget']}  persi {event['frame_persi']}" for event in events)
+        self._overlay.texture_update()
+        self._overlay.pos = (2, window.height - self._overlay.height - 2)
+
+    # ----------------------------------------------------------------------
+    # ESPORTAZIONE
+    # ----------------------------------------------------------------------
+    def chrome_trace(self):
+        """Eventi del buffer nel formato "Chrome trace" (eventi completi 'X', tempi in microsecondi)."""
+        return {
+            'displayTimeUnit': 'ms',
+            'traceEvents': [{
+                'name': event['nome'],
+                'cat': 'ui',
+                'ph': 'X',
+                'ts': round(event['inizio_ms'] * 1000),
+                'dur': round(event['durata_ms'] * 1000),
+                'pid': os.getpid(),
+                'tid': 1,
+                'args': {key: event[key] for key in ('widget', 'frame_ms', 'frame_persi')},
+            } for event in self.events],
+        }
+
+    def export_chrome(self, path):
+        """Salva il buffer nel formato "Chrome trace" in 'path'."""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(self.chrome_trace(), handle, ensure_ascii=False)
+        print(f"Traccia dell'interfaccia ({len(self.events)} chiamate) salvata in {path}")
+
+
+# Tracer dell'interfaccia, attivo solo con WINEAPP_UI_TRACE impostata
+TRACER = UiTracer()
+if trace_path() is not None:
+    TRACER.enable(overlay=_env_flag(OVERLAY_ENV_VAR))
+
+
+def traced(detail=None):
+    """
+    Decoratore: traccia le chiamate del metodo come '<Classe>.<metodo>', seguito da
+    detail(*args) se indicata (es. il colore del vino). Senza tracciamento attivo
+    restituisce il metodo originale.
+    """
+    def decorate(func):
+        if not TRACER.enabled:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            name = func.__qualname__ if detail is None else f'{func.__qualname__} {detail(*args)}'
+            with TRACER.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate